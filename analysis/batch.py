@@ -0,0 +1,189 @@
+"""
+Run the kinematics pipeline on every cataloged trial and compare trials.
+
+Each trial with spots and edges exports goes through `kinematics` in a process
+pool (per-edge kinematics, per-track summary, MSD, time-binned velocities,
+summary stats). Per-trial tables go to `<output>/<trial>/`. A trial is
+skipped when its `summary.json` was produced from the same inputs and
+parameters (see `Trial.signature`). All summaries are merged into
+`<output>/comparison.csv`, one row per trial.
+
+Usage:
+    python analysis/batch.py --results results --output results/batch --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from catalog import Trial, discover_trials
+from features import SLUG_CENTROID
+from kinematics import binned_velocity, edge_kinematics, summary_stats, track_msd, track_summary
+from trackmate import read_trackmate_csv
+
+DEFAULT_PARAMS = {
+    "frame_interval": 1.0,
+    "bin_frames": 300,
+    "max_lag": None,
+}
+
+
+def _trial_params(trial: Trial, params: dict) -> dict:
+    """Pipeline parameters for a trial; trial.json metadata overrides the defaults."""
+    out = {**DEFAULT_PARAMS, **params}
+    if trial.frame_interval is not None:
+        out["frame_interval"] = trial.frame_interval
+    out["centroid"] = list(trial.centroid) if trial.centroid is not None else list(SLUG_CENTROID)
+    return out
+
+
+def _is_current(summary_file: Path, signature: str) -> bool:
+    if not summary_file.exists():
+        return False
+    try:
+        return json.loads(summary_file.read_text()).get("SIGNATURE") == signature
+    except (OSError, json.JSONDecodeError):
+        return False
+
+
+def analyze_trial(trial: Trial, output_dir: str | Path, params: dict) -> dict:
+    """
+    Run the pipeline on one trial and write its tables.
+
+    Args:
+        trial: Catalog entry with spots and edges exports
+        output_dir: Folder for this trial's outputs
+        params: Pipeline parameters (see `_trial_params`)
+
+    Returns:
+        Summary dict (also written to `summary.json`)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    spots = read_trackmate_csv(trial.exports["spots"])
+    edges = read_trackmate_csv(trial.exports["edges"])
+
+    kin = edge_kinematics(
+        edges, spots, frame_interval=params["frame_interval"], centroid=tuple(params["centroid"])
+    )
+    tracks = track_summary(kin)
+    msd = track_msd(spots, max_lag=params["max_lag"], frame_interval=params["frame_interval"])
+    bins = binned_velocity(kin, bin_frames=params["bin_frames"])
+
+    kin.to_csv(output_dir / "kinematics.csv", index=False)
+    tracks.to_csv(output_dir / "tracks.csv", index=False)
+    msd.to_csv(output_dir / "msd.csv", index=False)
+    bins.to_csv(output_dir / "binned_velocity.csv", index=False)
+
+    return {"TRIAL": trial.name, **summary_stats(kin, tracks, msd)}
+
+
+def _run_one(trial: Trial, output_dir: str, params: dict, signature: str) -> dict:
+    summary = analyze_trial(trial, output_dir, params)
+    summary["SIGNATURE"] = signature
+    (Path(output_dir) / "summary.json").write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def run_batch(
+    trials: list,
+    output_dir: str | Path,
+    *,
+    workers: int | None = None,
+    force: bool = False,
+    **params,
+) -> pd.DataFrame:
+    """
+    Analyze trials in parallel, skipping those whose inputs are unchanged.
+
+    Args:
+        trials: Catalog entries (see `catalog.discover_trials`)
+        output_dir: Root output folder; each trial writes to `<output_dir>/<name>/`
+        workers: Worker processes (default: one per CPU)
+        force: Re-run every trial
+        **params: Overrides for DEFAULT_PARAMS (frame_interval, bin_frames, max_lag)
+
+    Returns:
+        Comparison table with one row per trial (also written to `comparison.csv`)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    summaries, jobs = [], []
+    for trial in trials:
+        if trial.missing:
+            print(f"  {trial.name}: skipped (missing {', '.join(trial.missing)} export)")
+            continue
+        trial_params = _trial_params(trial, params)
+        signature = trial.signature(**trial_params)
+        summary_file = output_dir / trial.name / "summary.json"
+        if not force and _is_current(summary_file, signature):
+            print(f"  {trial.name}: up to date")
+            summaries.append(json.loads(summary_file.read_text()))
+            continue
+        jobs.append((trial, str(output_dir / trial.name), trial_params, signature))
+
+    if jobs:
+        print(f"Analyzing {len(jobs)} trial(s) with {workers or 'all'} worker(s)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_one, *job): job[0].name for job in jobs}
+            for i, future in enumerate(as_completed(futures)):
+                name = futures[future]
+                try:
+                    summaries.append(future.result())
+                    print(f"  Progress: {i+1}/{len(jobs)} trials ({name} done)")
+                except Exception as e:  # one bad trial should not abort the batch
+                    print(f"  {name}: failed ({type(e).__name__}: {e})")
+
+    comparison = pd.DataFrame(summaries)
+    if len(comparison):
+        comparison = comparison.drop(columns="SIGNATURE", errors="ignore").sort_values("TRIAL")
+    comparison.to_csv(output_dir / "comparison.csv", index=False)
+    print(f"Saved comparison of {len(comparison)} trial(s): {output_dir / 'comparison.csv'}")
+    return comparison
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Run the kinematics/MSD/binned-velocity pipeline on every trial and compare them."
+    )
+    p.add_argument("--results", default="results", help="Folder of trial folders (default: results)")
+    p.add_argument("--data", default="data/subsets", help="Folder of subset movies (default: data/subsets)")
+    p.add_argument("--pattern", default="*", help="Glob for trial folder names (default: *)")
+    p.add_argument("--output", "-o", default="results/batch", help="Output folder (default: results/batch)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    p.add_argument("--force", action="store_true", help="Re-run trials even if their inputs are unchanged")
+    p.add_argument("--frame-interval", type=float, default=1.0, help="Time per frame (default: 1)")
+    p.add_argument("--bin-frames", type=int, default=300, help="Velocity bin width in frames (default: 300)")
+    p.add_argument("--max-lag", type=int, default=None, help="Largest MSD lag in frames")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    output = Path(args.output).resolve()
+    trials = [
+        t for t in discover_trials(args.results, data_dir=args.data, pattern=args.pattern)
+        if Path(t.directory).resolve() != output
+    ]
+    comparison = run_batch(
+        trials,
+        output,
+        workers=args.workers,
+        force=args.force,
+        frame_interval=args.frame_interval,
+        bin_frames=args.bin_frames,
+        max_lag=args.max_lag,
+    )
+    if len(comparison):
+        print(comparison.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
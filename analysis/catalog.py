@@ -0,0 +1,228 @@
+"""
+Catalog of tracking trials: TrackMate exports, source subset movies and metadata.
+
+A trial is a folder under `results/` (e.g. `results/trial_3/`) holding
+TrackMate CSV exports named `<YYYYMMDD_HHMMSS>_<stem>_<kind>.csv`, where kind
+is spots, edges, tracks or branches. When a folder has several exports of one
+kind, the newest timestamp wins.
+
+The source movie is found in this order:
+1. The `movie` entry of an optional `trial.json` in the folder.
+2. A `.tif`/`.zarr` inside the folder.
+3. A subset under `data/subsets/` whose subset tag (e.g. `f1200-end`) matches
+   the exports' stem.
+
+Frame and pixel offsets of the subset are parsed from the
+`subset_f{a}-{b}_x{c}-{d}_y{e}-{f}` tag that `preprocessor.window` writes,
+taken from the movie's name when it has one and otherwise from the exports'
+names (which must agree with each other). `trial.json` can also set
+`pixel_size`, `frame_interval`, `centroid` and any of the offsets.
+
+Usage:
+    python analysis/catalog.py --results results --data data/subsets
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+EXPORT_KINDS = ("spots", "edges", "tracks", "branches")
+MANIFEST = "trial.json"
+
+_EXPORT_RE = re.compile(
+    r"^(?P<stamp>\d{8}_\d{6})_(?P<stem>.*?)_?(?P<kind>spots|edges|tracks|branches)\.csv$"
+)
+_RANGE_RE = re.compile(r"(?:^|_)(?P<axis>[fxy])(?P<start>\d+)-(?P<stop>\d+|end)(?=_|$)")
+
+
+def parse_subset_tag(name: str) -> dict:
+    """
+    Offsets encoded in a `preprocessor.window` file name.
+
+    Returns:
+        Dict with frame_offset, offset_x and offset_y for each range present,
+        e.g. {'frame_offset': 705, 'offset_x': 119, 'offset_y': 382}
+    """
+    keys = {"f": "frame_offset", "x": "offset_x", "y": "offset_y"}
+    return {keys[m["axis"]]: int(m["start"]) for m in _RANGE_RE.finditer(Path(name).stem)}
+
+
+def _subset_tag(name: str) -> str:
+    return "_".join(m.group(0).strip("_") for m in _RANGE_RE.finditer(Path(name).stem))
+
+
+@dataclass
+class Trial:
+    """One trial: its exports, source movie and the metadata needed to analyze it."""
+
+    name: str
+    directory: Path
+    exports: dict = field(default_factory=dict)
+    movie: Path | None = None
+    frame_offset: int = 0
+    offset_x: float = 0.0
+    offset_y: float = 0.0
+    pixel_size: float | None = None
+    frame_interval: float | None = None
+    centroid: tuple | None = None
+
+    @property
+    def missing(self) -> list:
+        """Exports required by the kinematics pipeline that were not found."""
+        return [k for k in ("spots", "edges") if k not in self.exports]
+
+    def signature(self, **params) -> str:
+        """Hash of input files (path, size, mtime), trial metadata and `params`."""
+        inputs = []
+        for path in [*self.exports.values(), self.directory / MANIFEST]:
+            if Path(path).exists():
+                stat = Path(path).stat()
+                inputs.append([str(path), stat.st_size, stat.st_mtime_ns])
+        payload = {"inputs": inputs, "trial": self.to_dict(), "params": params}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["directory"] = str(self.directory)
+        d["movie"] = str(self.movie) if self.movie is not None else None
+        d["exports"] = {k: str(v) for k, v in self.exports.items()}
+        return d
+
+
+def _latest_exports(directory: Path) -> tuple:
+    exports, stems = {}, {}
+    for path in sorted(directory.glob("*.csv")):
+        m = _EXPORT_RE.match(path.name)
+        if m is None:
+            continue
+        kind = m["kind"]
+        # Timestamps sort lexicographically, so the last match is the newest
+        exports[kind] = path
+        stems[kind] = m["stem"]
+    return exports, stems
+
+
+def _find_movie(directory: Path, stems: dict, data_dir: Path | None) -> Path | None:
+    local = sorted(directory.glob("*.tif")) + sorted(directory.glob("*.tiff")) + sorted(directory.glob("*.zarr"))
+    if local:
+        return local[-1]
+    if data_dir is None or not data_dir.exists():
+        return None
+    tags = {_subset_tag(s) for s in stems.values()} - {""}
+    candidates = [
+        p for p in sorted(data_dir.iterdir())
+        if p.suffix in (".tif", ".tiff", ".zarr") and _subset_tag(p.name) in tags
+    ]
+    return candidates[-1] if candidates else None
+
+
+def _subset_offsets(movie: Path | None, stems: dict, manifest: dict) -> dict:
+    """Offsets from the movie's tag, else the exports' tags; trial.json overrides either."""
+    override = {k: manifest[k] for k in ("frame_offset", "offset_x", "offset_y") if k in manifest}
+    # Exports may carry different tags (e.g. edges from an x/y crop, branches from `f1200-end`)
+    seen = {}
+    for tag in {_subset_tag(s) for s in stems.values()} - {""}:
+        for k, v in parse_subset_tag(tag).items():
+            seen.setdefault(k, set()).add(v)
+
+    offsets = parse_subset_tag(movie.name) if movie is not None else {}
+    if offsets:
+        disagree = sorted(k for k in offsets if k not in override and seen.get(k, {offsets[k]}) != {offsets[k]})
+        if disagree:
+            print(f"Export tags disagree with movie {movie.name} on {', '.join(disagree)}; using the movie's")
+    else:
+        unresolved = sorted(k for k, v in seen.items() if len(v) > 1 and k not in override)
+        if unresolved:
+            detail = "; ".join(f"{k}: {sorted(seen[k])}" for k in unresolved)
+            raise ValueError(f"Export subset tags disagree ({detail}); set them in {MANIFEST} or add the movie")
+        offsets = {k: v.pop() for k, v in seen.items() if len(v) == 1}
+    offsets.update(override)
+    return offsets
+
+
+def load_trial(directory: str | Path, *, data_dir: str | Path | None = "data/subsets") -> Trial:
+    """Build the catalog entry for one trial folder."""
+    directory = Path(directory)
+    data_dir = Path(data_dir) if data_dir is not None else None
+    exports, stems = _latest_exports(directory)
+
+    manifest = {}
+    if (directory / MANIFEST).exists():
+        manifest = json.loads((directory / MANIFEST).read_text())
+    for kind in EXPORT_KINDS:
+        if kind in manifest:
+            exports[kind] = (directory / manifest[kind]).resolve()
+
+    movie = manifest.get("movie")
+    movie = (directory / movie).resolve() if movie else _find_movie(directory, stems, data_dir)
+
+    offsets = _subset_offsets(movie, stems, manifest)
+
+    return Trial(
+        name=manifest.get("name", directory.name),
+        directory=directory,
+        exports=exports,
+        movie=movie,
+        pixel_size=manifest.get("pixel_size"),
+        frame_interval=manifest.get("frame_interval"),
+        centroid=tuple(manifest["centroid"]) if "centroid" in manifest else None,
+        **offsets,
+    )
+
+
+def discover_trials(
+    results_dir: str | Path = "results",
+    *,
+    data_dir: str | Path | None = "data/subsets",
+    pattern: str = "*",
+) -> list:
+    """
+    Find every trial folder under `results_dir` that contains TrackMate exports.
+
+    Args:
+        results_dir: Folder holding one subfolder per trial
+        data_dir: Folder of subset movies to match against (None to skip)
+        pattern: Glob for trial folder names (e.g. 'trial_*')
+
+    Returns:
+        List of Trial, sorted by name
+    """
+    results_dir = Path(results_dir)
+    trials = []
+    for directory in sorted(results_dir.glob(pattern)):
+        if not directory.is_dir():
+            continue
+        trial = load_trial(directory, data_dir=data_dir)
+        if trial.exports:
+            trials.append(trial)
+    return trials
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="List tracking trials and their inputs.")
+    p.add_argument("--results", default="results", help="Folder of trial folders (default: results)")
+    p.add_argument("--data", default="data/subsets", help="Folder of subset movies (default: data/subsets)")
+    p.add_argument("--pattern", default="*", help="Glob for trial folder names (default: *)")
+    p.add_argument("--json", default=None, help="Also write the catalog to this JSON file")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    trials = discover_trials(args.results, data_dir=args.data, pattern=args.pattern)
+    for t in trials:
+        missing = f"  (missing: {', '.join(t.missing)})" if t.missing else ""
+        print(f"{t.name}: {', '.join(sorted(t.exports))}; movie={t.movie}{missing}")
+    if args.json:
+        Path(args.json).write_text(json.dumps([t.to_dict() for t in trials], indent=2))
+        print(f"Saved catalog: {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
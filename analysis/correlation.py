@@ -0,0 +1,338 @@
+"""
+Spatial and temporal velocity correlations for collective motion.
+
+Spatial C(r): each frame's velocities (edge midpoints from `edge_kinematics`,
+or a stored flow field) are averaged onto a regular grid. The velocity
+autocorrelation of the grid and of its occupancy mask are computed with
+zero-padded 2D FFTs, a batch of frames at a time. The ratio, binned by lag
+distance, is the mean v(x).v(x + r) over all occupied cell pairs. Pair sums
+are accumulated over a time window before normalising, so C(r) for every
+window of the trial, and its correlation length, come out of one pass. By
+default velocities are taken relative to the frame mean (fluctuations), as is
+usual for collective motion.
+
+Temporal VACF: each track's velocity series is laid on a frame grid with a
+presence mask. The lagged products v(t).v(t + tau) are summed over all tracks
+with batched FFTs on padded arrays (see `kinematics.lag_correlation`).
+
+Usage:
+    python analysis/correlation.py --spots spots.csv --edges edges.csv --output-dir corr/ --window 300
+    python analysis/correlation.py --flow flow.zarr --output-dir corr/ --window 50
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.fft import irfft2, next_fast_len, rfft2
+
+from kinematics import edge_kinematics, lag_correlation
+from trackmate import read_trackmate_csv
+
+
+def _lag_bins(shape, cell_size, r_max):
+    """Radial bin (round(r / cell_size)) of every lag in a padded FFT grid; -1 beyond r_max."""
+    dy = np.fft.fftfreq(shape[0], 1 / shape[0])[:, None]
+    dx = np.fft.fftfreq(shape[1], 1 / shape[1])[None, :]
+    r = np.hypot(dy, dx) * cell_size
+    bins = np.rint(r / cell_size).astype(np.int64)
+    n_bins = int(np.rint(r_max / cell_size)) + 1
+    return np.where(bins < n_bins, bins, -1), n_bins
+
+
+def _radial_sums(vx, vy, mask, bins, n_bins, *, fluctuations=True):
+    """
+    Per-frame radial sums of v.v products and of pair counts.
+
+    Args:
+        vx, vy, mask: (n, ny, nx) gridded velocities and occupancy (1 where a cell has
+            data)
+        bins: Radial bin of each lag on the padded grid (from `_lag_bins`)
+
+    Returns:
+        Tuple of (products, pairs), each (n, n_bins)
+    """
+    n = len(vx)
+    if fluctuations:
+        count = np.maximum(mask.sum(axis=(1, 2)), 1)[:, None, None]
+        vx = vx - (vx * mask).sum(axis=(1, 2))[:, None, None] / count
+        vy = vy - (vy * mask).sum(axis=(1, 2))[:, None, None] / count
+    vx, vy = vx * mask, vy * mask
+
+    shape = bins.shape
+    fx, fy, fm = (rfft2(a, s=shape, axes=(1, 2), workers=-1) for a in (vx, vy, mask))
+    products = irfft2(fx * fx.conj() + fy * fy.conj(), s=shape, axes=(1, 2), workers=-1)
+    pairs = irfft2(fm * fm.conj(), s=shape, axes=(1, 2), workers=-1)
+
+    valid = bins.ravel() >= 0
+    index = (np.arange(n)[:, None] * n_bins + bins.ravel()[valid][None, :]).ravel()
+    size = n * n_bins
+    prod = np.bincount(index, products.reshape(n, -1)[:, valid].ravel(), minlength=size)
+    pair = np.bincount(index, pairs.reshape(n, -1)[:, valid].ravel(), minlength=size)
+    return prod.reshape(n, n_bins), np.rint(pair).reshape(n, n_bins)
+
+
+def grid_edges(kin, *, cell_size=None, extent=None, n_cells=64):
+    """
+    Average each frame's edge velocities onto a regular grid.
+
+    Args:
+        kin: Output of `kinematics.edge_kinematics`
+        cell_size: Grid spacing in position units (default: longer side / n_cells)
+        extent: (x0, x1, y0, y1) covered by the grid (default: data bounds)
+
+    Returns:
+        Tuple of (frames, vx, vy, mask, cell_size) with (T, ny, nx) grids for frames
+        first..last, where `frames` holds the frame number of each grid
+    """
+    x = ((kin["POSITION_X_source"] + kin["POSITION_X_target"]) / 2).to_numpy()
+    y = ((kin["POSITION_Y_source"] + kin["POSITION_Y_target"]) / 2).to_numpy()
+    frame = kin["FRAME_source"].to_numpy(np.int64)
+    if extent is None:
+        extent = (x.min(), x.max(), y.min(), y.max())
+    x0, x1, y0, y1 = extent
+    if cell_size is None:
+        cell_size = max(x1 - x0, y1 - y0) / n_cells or 1.0
+    nx = int((x1 - x0) // cell_size) + 1
+    ny = int((y1 - y0) // cell_size) + 1
+    ix = ((x - x0) // cell_size).astype(np.int64)
+    iy = ((y - y0) // cell_size).astype(np.int64)
+    inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+
+    frames = np.arange(frame.min(), frame.max() + 1)
+    flat = ((frame - frames[0]) * ny + iy) * nx + ix
+    size = len(frames) * ny * nx
+    shape = (len(frames), ny, nx)
+    count = np.bincount(flat[inside], minlength=size).reshape(shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vx = np.bincount(flat[inside], kin["VX"].to_numpy()[inside], minlength=size).reshape(shape) / count
+        vy = np.bincount(flat[inside], kin["VY"].to_numpy()[inside], minlength=size).reshape(shape) / count
+    mask = (count > 0).astype(np.float64)
+    return frames, np.nan_to_num(vx), np.nan_to_num(vy), mask, cell_size
+
+
+def spatial_correlation(
+    frames, vx, vy, mask, *, cell_size=1.0, window=1, r_max=None, fluctuations=True, batch_frames=64
+):
+    """
+    C(r) per time window from gridded velocities.
+
+    Args:
+        frames: Frame number of each grid in `vx`/`vy`/`mask`
+        vx, vy, mask: (T, ny, nx) velocities and occupancy; zarr/memmap arrays are read
+            in batches
+        cell_size: Grid spacing, so R is in position units
+        window: Frames per window; windows start at multiples of `window`
+        r_max: Largest distance (default: half the shorter grid side)
+        fluctuations: Subtract each frame's mean velocity first
+
+    Returns:
+        WINDOW_START, R, C (normalised so C(0) = 1) and N_PAIRS
+    """
+    n_frames, ny, nx = mask.shape
+    if r_max is None:
+        r_max = min(ny, nx) // 2 * cell_size
+    shape = (next_fast_len(2 * ny), next_fast_len(2 * nx))
+    bins, n_bins = _lag_bins(shape, cell_size, r_max)
+
+    frames = np.asarray(frames)
+    window_of = (frames // window) * window
+    starts = np.unique(window_of)
+    products = np.zeros((len(starts), n_bins))
+    pairs = np.zeros((len(starts), n_bins))
+    for b in range(0, n_frames, batch_frames):
+        sl = slice(b, min(b + batch_frames, n_frames))
+        prod, pair = _radial_sums(
+            np.asarray(vx[sl], dtype=np.float64), np.asarray(vy[sl], dtype=np.float64),
+            np.asarray(mask[sl], dtype=np.float64), bins, n_bins, fluctuations=fluctuations,
+        )
+        w = np.searchsorted(starts, window_of[sl])
+        np.add.at(products, w, prod)
+        np.add.at(pairs, w, pair)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c = products / pairs
+        c = c / c[:, :1]
+    return pd.DataFrame({
+        "WINDOW_START": np.repeat(starts, n_bins),
+        "R": np.tile(np.arange(n_bins) * cell_size, len(starts)),
+        "C": c.ravel(),
+        "N_PAIRS": pairs.ravel().astype(np.int64),
+    })
+
+
+def correlation_length(corr, *, threshold=1 / np.e):
+    """
+    Distance at which C(r) first falls below `threshold`, per window.
+
+    Linearly interpolated between grid distances; NaN if C never drops that low.
+    Use threshold=0 for the zero-crossing definition.
+
+    Returns:
+        WINDOW_START, CORR_LENGTH
+    """
+    out = []
+    for start, g in corr.groupby("WINDOW_START"):
+        r, c = g["R"].to_numpy(), g["C"].to_numpy()
+        below = np.flatnonzero(np.nan_to_num(c, nan=np.inf) < threshold)
+        if len(below) == 0 or below[0] == 0:
+            out.append((start, np.nan))
+            continue
+        k = below[0]
+        frac = (c[k - 1] - threshold) / (c[k - 1] - c[k])
+        out.append((start, r[k - 1] + frac * (r[k] - r[k - 1])))
+    return pd.DataFrame(out, columns=["WINDOW_START", "CORR_LENGTH"])
+
+
+def velocity_autocorrelation(kin, *, max_lag=None, frame_interval=1.0, batch_size=256):
+    """
+    Ensemble velocity autocorrelation <v(t).v(t + tau)> over tracks.
+
+    Args:
+        kin: Output of `kinematics.edge_kinematics` (velocity placed at FRAME_source;
+            edges of one track in the same frame are averaged)
+        max_lag: Largest lag in frames (default: longest track span - 1)
+        frame_interval: Time per frame, for the TAU column
+
+    Returns:
+        LAG, TAU, VACF (unnormalised), VACF_NORM (VACF / VACF(0)) and N_PAIRS, for lags
+        0..max_lag
+    """
+    g = kin.groupby(["TRACK_ID", "FRAME_source"], sort=True)[["VX", "VY"]].mean().reset_index()
+    track = g["TRACK_ID"].to_numpy()
+    frame = g["FRAME_source"].to_numpy(np.int64)
+    v = g[["VX", "VY"]].to_numpy(np.float64)
+
+    starts = np.flatnonzero(np.r_[True, track[1:] != track[:-1]])
+    ends = np.r_[starts[1:], len(track)]
+    first = frame[starts]
+    span = np.maximum.reduceat(frame, starts) - first + 1 if len(starts) else np.empty(0, np.int64)
+    if max_lag is None:
+        max_lag = int(span.max()) - 1 if len(span) else 0
+
+    num = np.zeros(max_lag + 1)
+    cnt = np.zeros(max_lag + 1)
+    order = np.argsort(span)
+    for b in range(0, len(order), batch_size):
+        rows = order[b:b + batch_size]
+        width = int(span[rows].max())
+        n_fft = next_fast_len(2 * width)
+        mask = np.zeros((len(rows), width))
+        vel = np.zeros((len(rows), 2, width))
+        for k, r in enumerate(rows):
+            cols = frame[starts[r]:ends[r]] - first[r]
+            mask[k, cols] = 1.0
+            vel[k, :, cols] = v[starts[r]:ends[r]]
+
+        lags = min(max_lag, width - 1) + 1
+        num[:lags] += sum(
+            lag_correlation(vel[:, d], vel[:, d], n_fft)[:, :lags] for d in range(2)
+        ).sum(axis=0)
+        cnt[:lags] += lag_correlation(mask, mask, n_fft)[:, :lags].sum(axis=0)
+
+    cnt = np.rint(cnt).astype(np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vacf = np.where(cnt > 0, num / cnt, np.nan)
+    lag = np.arange(max_lag + 1)
+    return pd.DataFrame({
+        "LAG": lag,
+        "TAU": lag * frame_interval,
+        "VACF": vacf,
+        "VACF_NORM": vacf / vacf[0] if len(vacf) else vacf,
+        "N_PAIRS": cnt,
+    })
+
+
+def flow_correlation(flow, *, window=1, min_speed=0.0, r_max=None, fluctuations=True, batch_frames=64):
+    """
+    C(r) per time window from a stored flow field (see `flow.compute_flow`).
+
+    Cells with speed below `min_speed` are treated as empty. R is in
+    full-resolution pixels.
+    """
+    d = flow.attrs["downsample"] if hasattr(flow, "attrs") else 1
+    start = flow.attrs.get("start_frame", 0) if hasattr(flow, "attrs") else 0
+    n_frames, ny, nx = flow.shape[:3]
+    shape = (next_fast_len(2 * ny), next_fast_len(2 * nx))
+    if r_max is None:
+        r_max = min(ny, nx) // 2 * d
+    bins, n_bins = _lag_bins(shape, d, r_max)
+
+    frames = np.arange(n_frames) + start
+    window_of = (frames // window) * window
+    starts = np.unique(window_of)
+    products = np.zeros((len(starts), n_bins))
+    pairs = np.zeros((len(starts), n_bins))
+    for b in range(0, n_frames, batch_frames):
+        block = np.asarray(flow[b:b + batch_frames], dtype=np.float64)
+        mask = (np.hypot(block[..., 0], block[..., 1]) >= min_speed).astype(np.float64)
+        prod, pair = _radial_sums(block[..., 0], block[..., 1], mask, bins, n_bins, fluctuations=fluctuations)
+        w = np.searchsorted(starts, window_of[b:b + len(block)])
+        np.add.at(products, w, prod)
+        np.add.at(pairs, w, pair)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c = products / pairs
+        c = c / c[:, :1]
+    return pd.DataFrame({
+        "WINDOW_START": np.repeat(starts, n_bins),
+        "R": np.tile(np.arange(n_bins) * d, len(starts)),
+        "C": c.ravel(),
+        "N_PAIRS": pairs.ravel().astype(np.int64),
+    })
+
+
+def _build_parser():
+    p = argparse.ArgumentParser(
+        description="Spatial C(r), correlation length over time and velocity autocorrelation."
+    )
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--edges", "-e", help="Path to TrackMate edges CSV (requires --spots)")
+    src.add_argument("--flow", help="Path to a flow Zarr array from analysis/flow.py")
+    p.add_argument("--spots", "-s", help="Path to TrackMate spots CSV")
+    p.add_argument("--output-dir", "-o", required=True, help="Folder for the output CSVs")
+    p.add_argument("--window", type=int, default=300, help="Frames per C(r) window (default: 300)")
+    p.add_argument("--cell-size", type=float, default=None, help="Grid spacing for edge velocities")
+    p.add_argument("--r-max", type=float, default=None, help="Largest distance for C(r)")
+    p.add_argument("--frame-interval", type=float, default=1.0, help="Time per frame (default: 1)")
+    p.add_argument("--min-speed", type=float, default=0.0, help="Flow: ignore slower cells")
+    p.add_argument("--raw", action="store_true", help="Correlate raw velocities instead of fluctuations")
+    return p
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    out = Path(args.output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    if args.flow:
+        import zarr
+
+        corr = flow_correlation(
+            zarr.open_array(args.flow, mode="r"), window=args.window, min_speed=args.min_speed,
+            r_max=args.r_max, fluctuations=not args.raw,
+        )
+    else:
+        if not args.spots:
+            raise ValueError("--edges requires --spots")
+        kin = edge_kinematics(
+            read_trackmate_csv(args.edges), read_trackmate_csv(args.spots), frame_interval=args.frame_interval
+        )
+        frames, vx, vy, mask, cell_size = grid_edges(kin, cell_size=args.cell_size)
+        corr = spatial_correlation(
+            frames, vx, vy, mask, cell_size=cell_size, window=args.window, r_max=args.r_max,
+            fluctuations=not args.raw,
+        )
+        vacf = velocity_autocorrelation(kin, frame_interval=args.frame_interval)
+        vacf.to_csv(out / "velocity_autocorrelation.csv", index=False)
+
+    corr.to_csv(out / "spatial_correlation.csv", index=False)
+    length = correlation_length(corr)
+    length.to_csv(out / "correlation_length.csv", index=False)
+    print(length.to_string(index=False))
+    print(f"Saved correlations: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""
+Shared geometry for wave- and centroid-relative motion features.
+
+Positions and velocities are in ImageJ pixel coordinates (y points down).
+The wave direction is given in standard mathematical coordinates (y points up),
+matching `pages/analysis.md`, and is flipped internally where needed.
+"""
+import numpy as np
+
+# Unit vector of the cAMP wave travel direction (top-right -> bottom-left), y up
+WAVE_DIRECTION = (-0.875, -0.485)
+
+# Slug centroid in ImageJ coordinates (trial 3)
+SLUG_CENTROID = (270.08, 307.07)
+
+
+def wave_cosine(vx, vy, wave=WAVE_DIRECTION):
+    """
+    Cosine between velocity (image coordinates) and the wave direction.
+
+    +1 means moving with the wave, -1 against it. Zero-length velocities give NaN.
+    """
+    vx = np.asarray(vx, dtype=np.float64)
+    vy = np.asarray(vy, dtype=np.float64)
+    wx, wy = wave
+    speed = np.hypot(vx, vy)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Flip image y (down) to math y (up) before projecting onto the wave
+        cos = (vx * wx - vy * wy) / (speed * np.hypot(wx, wy))
+    return np.where(speed > 0, cos, np.nan)
+
+
+def wave_components(vx, vy, wave=WAVE_DIRECTION):
+    """
+    Decompose velocity into V_parallel (along the wave) and V_orthogonal.
+
+    Returns:
+        Tuple of (v_parallel, v_orthogonal)
+    """
+    vx = np.asarray(vx, dtype=np.float64)
+    vy = -np.asarray(vy, dtype=np.float64)  # image y -> math y
+    wx, wy = np.asarray(wave, dtype=np.float64) / np.hypot(*wave)
+    return vx * wx + vy * wy, -vx * wy + vy * wx
+
+
+def radial_components(x, y, vx, vy, centroid=SLUG_CENTROID):
+    """
+    Decompose velocity relative to a centroid (all in image coordinates).
+
+    `centroid` may be a single (x, y) pair or an array broadcastable against
+    `x`/`y` with a trailing axis of length 2 (e.g. one centroid per frame).
+
+    Returns:
+        Tuple of (r_centroid, v_radial, v_tangential, radial_cosine); radial
+        velocity is negative when moving toward the centroid.
+    """
+    centroid = np.asarray(centroid, dtype=np.float64)
+    dx = np.asarray(x, dtype=np.float64) - centroid[..., 0]
+    dy = np.asarray(y, dtype=np.float64) - centroid[..., 1]
+    vx = np.asarray(vx, dtype=np.float64)
+    vy = np.asarray(vy, dtype=np.float64)
+
+    r = np.hypot(dx, dy)
+    speed = np.hypot(vx, vy)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rx, ry = dx / r, dy / r
+        v_radial = vx * rx + vy * ry
+        v_tangential = -vx * ry + vy * rx
+        radial_cos = v_radial / speed
+    radial_cos = np.where((speed > 0) & (r > 0), radial_cos, np.nan)
+    return r, v_radial, v_tangential, radial_cos
@@ -0,0 +1,566 @@
+"""
+Incremental build of the site figures in `assets/img/` from a trial's tables.
+
+Figures and the intermediate tables they read form a small build graph:
+
+- Sources are the trial's TrackMate exports (spots, edges). Each is keyed by a
+  SHA-256 of its contents. Hashes are memoized by file size and mtime, so an
+  unchanged file is not re-read.
+- Tables (e.g. `kinematics`, `smoothed`) are computed from sources or other
+  tables and cached as pickles under `<output>/.figure_cache/`.
+- Figures declare their input tables and parameters and write one file.
+
+Each table or figure gets a key: a hash of its inputs' keys, its parameters,
+its function's source code and the source files of the analysis modules it
+imports (followed through their own imports). A figure is rebuilt only when its key differs
+from the one recorded in `<output>/.figures.json` or its file is missing.
+Stale nodes run in a process pool, and a node starts as soon as all its
+inputs are ready, so independent figures render in parallel.
+
+Usage:
+    python analysis/figures.py --trial results/trial_3 --output assets/img --workers 4
+    python analysis/figures.py --spots spots.csv --edges edges.csv --only cosine_heatmap.png
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from features import SLUG_CENTROID
+from trackmate import read_trackmate_csv
+
+HERE = Path(__file__).resolve().parent
+SOURCES = ("spots", "edges")
+MANIFEST = ".figures.json"
+CACHE_DIR = ".figure_cache"
+
+
+@dataclass
+class Node:
+    """A table or figure in the build graph."""
+
+    name: str
+    kind: str  # 'table' or 'figure'
+    func: object
+    inputs: tuple
+    params: dict = field(default_factory=dict)
+
+
+TABLES = {}
+FIGURES = {}
+
+
+def table(name: str, inputs: tuple, params: dict | None = None):
+    """Register `func(*inputs, **params) -> DataFrame` as a cached intermediate table."""
+    def register(func):
+        TABLES[name] = Node(name, "table", func, tuple(inputs), dict(params or {}))
+        return func
+    return register
+
+
+def figure(name: str, inputs: tuple, params: dict | None = None):
+    """Register `func(path, *inputs, **params)` as a figure written to `<output>/<name>`."""
+    def register(func):
+        FIGURES[name] = Node(name, "figure", func, tuple(inputs), dict(params or {}))
+        return func
+    return register
+
+
+def _hash(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_hash(path: str | Path, memo: dict | None = None) -> str:
+    """SHA-256 of a file's contents; `memo` maps path -> [size, mtime_ns, hash] to skip re-reading."""
+    path = Path(path)
+    stat = path.stat()
+    key = str(path.resolve())
+    if memo is not None and key in memo and memo[key][:2] == [stat.st_size, stat.st_mtime_ns]:
+        return memo[key][2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if memo is not None:
+        memo[key] = [stat.st_size, stat.st_mtime_ns, digest]
+    return digest
+
+
+def _local_imports(source: str) -> set:
+    """Names of the modules next to this file that `source` imports."""
+    names = set()
+    for stmt in ast.walk(ast.parse(source)):
+        if isinstance(stmt, ast.Import):
+            names.update(a.name.split(".")[0] for a in stmt.names)
+        elif isinstance(stmt, ast.ImportFrom) and stmt.module and not stmt.level:
+            names.add(stmt.module.split(".")[0])
+    return {n for n in names if (HERE / f"{n}.py").exists()}
+
+
+def code_hash(func) -> str:
+    """SHA-256 of a node function's source and of every analysis module it (transitively) imports."""
+    source = inspect.getsource(func)
+    h = hashlib.sha256(source.encode())
+    seen, stack = set(), list(_local_imports(source))
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        stack.extend(_local_imports((HERE / f"{name}.py").read_text()))
+    for name in sorted(seen):
+        h.update(name.encode())
+        h.update((HERE / f"{name}.py").read_bytes())
+    return h.hexdigest()
+
+
+def _node(name: str) -> Node:
+    return TABLES.get(name) or FIGURES[name]
+
+
+def _node_params(node: Node, params: dict) -> dict:
+    return {k: params.get(k, v) for k, v in node.params.items()}
+
+
+def node_keys(sources: dict, params: dict, names: list, memo: dict | None = None) -> dict:
+    """Content-hash key of every source, table and figure needed for `names`."""
+    keys = {}
+
+    def visit(name):
+        if name in keys:
+            return keys[name]
+        if name in SOURCES:
+            keys[name] = file_hash(sources[name], memo)
+            return keys[name]
+        node = _node(name)
+        keys[name] = _hash({
+            "name": name,
+            "inputs": [visit(i) for i in node.inputs],
+            "params": _node_params(node, params),
+            "code": code_hash(node.func),
+        })
+        return keys[name]
+
+    for name in names:
+        visit(name)
+    return keys
+
+
+def _load_input(name: str, path: str):
+    return read_trackmate_csv(path) if name in SOURCES else pd.read_pickle(path)
+
+
+def _run_node(name: str, input_paths: dict, params: dict, output: str) -> str:
+    """Worker: compute one table or render one figure from its input files."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    node = _node(name)
+    args = [_load_input(i, input_paths[i]) for i in node.inputs]
+    if node.kind == "table":
+        node.func(*args, **params).to_pickle(output)
+    else:
+        node.func(Path(output), *args, **params)
+        plt.close("all")
+    return name
+
+
+def build_figures(
+    sources: dict,
+    output_dir: str | Path = "assets/img",
+    *,
+    only: list | None = None,
+    workers: int | None = None,
+    force: bool = False,
+    **params,
+) -> dict:
+    """
+    Rebuild the figures whose inputs, parameters or code changed.
+
+    Args:
+        sources: Paths of the trial's exports, {'spots': ..., 'edges': ...}
+        output_dir: Folder for the figures (and the manifest/cache)
+        only: Figure names to consider (default: all registered figures)
+        workers: Worker processes (default: one per CPU)
+        force: Rebuild everything
+        **params: Overrides for node parameters (e.g. frame_interval, centroid)
+
+    Returns:
+        Dict of figure name -> 'built', 'up to date', 'failed' or 'skipped'
+    """
+    output_dir = Path(output_dir)
+    cache = output_dir / CACHE_DIR
+    cache.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_dir / MANIFEST
+    manifest = json.loads(manifest_file.read_text()) if manifest_file.exists() else {}
+    memo = manifest.get("sources", {})
+    built = manifest.get("figures", {})
+
+    names = list(only) if only else list(FIGURES)
+    unknown = [n for n in names if n not in FIGURES]
+    if unknown:
+        raise ValueError(f"Unknown figure(s) {unknown}, expected some of {sorted(FIGURES)}")
+    keys = node_keys(sources, params, names, memo)
+
+    def output_of(name):
+        if name in SOURCES:
+            return str(sources[name])
+        if name in TABLES:
+            return str(cache / f"{name}-{keys[name][:16]}.pkl")
+        return str(output_dir / name)
+
+    def is_current(name):
+        if name in SOURCES:
+            return True
+        if name in TABLES:
+            return Path(output_of(name)).exists()
+        return not force and built.get(name) == keys[name] and Path(output_of(name)).exists()
+
+    # Stale figures and the missing tables they need
+    status = {n: "up to date" for n in names if is_current(n)}
+    todo, stack = set(), [n for n in names if n not in status]
+    while stack:
+        name = stack.pop()
+        if name in todo or name in SOURCES:
+            continue
+        todo.add(name)
+        stack.extend(i for i in _node(name).inputs if not is_current(i))
+
+    waiting = {n: {i for i in _node(n).inputs if i in todo} for n in todo}
+    dependents = {n: [m for m in todo if n in _node(m).inputs] for n in todo}
+    n_jobs, done = len(todo), 0
+    if todo:
+        print(f"Building {sum(n in FIGURES for n in todo)} figure(s), {sum(n in TABLES for n in todo)} table(s)...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+
+        def submit_ready():
+            for n in [n for n, deps in waiting.items() if not deps]:
+                del waiting[n]
+                node = _node(n)
+                paths = {i: output_of(i) for i in node.inputs}
+                running[pool.submit(_run_node, n, paths, _node_params(node, params), output_of(n))] = n
+
+        submit_ready()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                done += 1
+                try:
+                    future.result()
+                except Exception as e:  # one broken figure should not stop the others
+                    print(f"  {name}: failed ({type(e).__name__}: {e})")
+                    status[name] = "failed"
+                    stack = list(dependents[name])
+                    while stack:  # everything downstream is skipped
+                        m = stack.pop()
+                        if waiting.pop(m, None) is not None:
+                            status[m] = "skipped"
+                            stack.extend(dependents[m])
+                    continue
+                print(f"  Progress: {done}/{n_jobs} nodes ({name} done)")
+                if name in FIGURES:
+                    status[name] = "built"
+                    built[name] = keys[name]
+                for m in dependents[name]:
+                    if m in waiting:
+                        waiting[m].discard(name)
+            submit_ready()
+
+    # Drop cached tables superseded by the current keys
+    for name in (n for n in keys if n in TABLES):
+        for old in cache.glob(f"{name}-*.pkl"):
+            if str(old) != output_of(name):
+                old.unlink()
+    manifest_file.write_text(json.dumps({"sources": memo, "figures": built}, indent=2))
+    return {n: status.get(n, "skipped") for n in names}
+
+
+# --- Tables -----------------------------------------------------------------
+
+@table("kinematics", inputs=("spots", "edges"), params={"frame_interval": 1.0, "centroid": SLUG_CENTROID})
+def _kinematics_table(spots, edges, *, frame_interval, centroid):
+    from kinematics import edge_kinematics
+
+    return edge_kinematics(edges, spots, frame_interval=frame_interval, centroid=tuple(centroid))
+
+
+@table("tracks", inputs=("kinematics",))
+def _tracks_table(kin):
+    from kinematics import track_summary
+
+    return track_summary(kin)
+
+
+@table(
+    "smoothed",
+    inputs=("spots", "edges"),
+    params={"frame_interval": 1.0, "centroid": SLUG_CENTROID, "smoothing": "kalman"},
+)
+def _smoothed_table(spots, edges, *, frame_interval, centroid, smoothing):
+    from smoothing import smooth_tracks
+
+    return smooth_tracks(spots, edges, method=smoothing, frame_interval=frame_interval, centroid=tuple(centroid))
+
+
+# --- Figures ----------------------------------------------------------------
+
+def _save(fig, path: Path):
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+
+
+@figure("v_parallel_and_orthogonal.png", inputs=("kinematics",), params={"bins": 100})
+def _v_parallel_and_orthogonal(path, kin, *, bins):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    for ax, col, color in zip(axes, ("V_PARALLEL", "V_ORTHOGONAL"), ("tab:blue", "tab:orange")):
+        ax.hist(kin[col].dropna(), bins=bins, color=color, alpha=0.8)
+        ax.axvline(0, color="black", linewidth=0.8)
+        ax.set_xlabel(col)
+        ax.set_ylabel("Edge count")
+        ax.set_title(f"Distribution of {col}")
+    _save(fig, path)
+
+
+@figure("cosine_heatmap.png", inputs=("kinematics",), params={"bin_frames": 50, "min_edges": 10})
+def _cosine_heatmap(path, kin, *, bin_frames, min_edges):
+    import matplotlib.pyplot as plt
+
+    counts = kin.groupby("TRACK_ID").size()
+    tracks = counts[counts >= min_edges].index
+    sub = kin[kin["TRACK_ID"].isin(tracks)]
+    first = sub.groupby("TRACK_ID")["FRAME_source"].min().sort_values()
+    row = pd.Series(np.arange(len(first)), index=first.index)
+    col = (sub["FRAME_source"] // bin_frames).astype(int)
+    col = col - col.min()
+    n_rows, n_cols = len(first), int(col.max()) + 1 if len(col) else 1
+    flat = row.loc[sub["TRACK_ID"]].to_numpy() * n_cols + col.to_numpy()
+    total = np.bincount(flat, sub["COS_WAVE"].fillna(0).to_numpy(), minlength=n_rows * n_cols)
+    n = np.bincount(flat, sub["COS_WAVE"].notna().to_numpy(np.float64), minlength=n_rows * n_cols)
+    mean = np.divide(total, n, out=np.full(total.shape, np.nan), where=n > 0).reshape(n_rows, n_cols)
+
+    t0 = kin["FRAME_source"].min() // bin_frames * bin_frames
+    fig, ax = plt.subplots(figsize=(14, 8))
+    im = ax.imshow(mean, aspect="auto", cmap="RdBu_r", vmin=-1, vmax=1, interpolation="nearest",
+                   extent=(t0, t0 + n_cols * bin_frames, n_rows, 0))
+    ax.set_xlabel("Frame")
+    ax.set_ylabel(f"Track (sorted by first frame, >= {min_edges} edges)")
+    ax.set_title("Mean cosine with wave direction per track over time")
+    fig.colorbar(im, ax=ax, label="Mean cosine")
+    _save(fig, path)
+
+
+@figure(
+    "mean_time_vs_mean-velocity_cosine_vs_track_count.png",
+    inputs=("tracks",),
+    params={"n_time_bins": 40, "n_cos_bins": 40},
+)
+def _track_cosine_surface(path, tracks, *, n_time_bins, n_cos_bins):
+    import matplotlib.pyplot as plt
+
+    sub = tracks.dropna(subset=["COS_MEAN_VELOCITY"])
+    time_vals, cos_vals = sub["MEAN_TIME"].to_numpy(), sub["COS_MEAN_VELOCITY"].to_numpy()
+    H, t_edges, c_edges = np.histogram2d(
+        time_vals, cos_vals, bins=[np.linspace(time_vals.min(), time_vals.max(), n_time_bins + 1),
+                                   np.linspace(-1, 1, n_cos_bins + 1)]
+    )
+    T, C = np.meshgrid((t_edges[:-1] + t_edges[1:]) / 2, (c_edges[:-1] + c_edges[1:]) / 2, indexing="ij")
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_subplot(111, projection="3d")
+    surf = ax.plot_surface(T, C, H, cmap="viridis", alpha=0.85, linewidth=0, antialiased=True)
+    ax.set_xlabel("Mean frame per track")
+    ax.set_ylabel("Mean-velocity cosine per track")
+    ax.set_zlabel("Track count")
+    ax.set_title("3D Distribution: Mean Time vs Mean-Velocity Cosine vs Track Count")
+    fig.colorbar(surf, ax=ax, shrink=0.5, aspect=20, pad=0.1, label="Track count")
+    ax.view_init(elev=30, azim=45)
+    _save(fig, path)
+
+
+@figure("radial_velocity_dist.png", inputs=("kinematics",), params={"bins": 100})
+def _radial_velocity_dist(path, kin, *, bins):
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    axes[0].hist(kin["V_RADIAL"].dropna(), bins=bins, color="tab:purple", alpha=0.8)
+    axes[0].axvline(0, color="black", linewidth=0.8)
+    axes[0].set_xlabel("V_RADIAL (negative = toward centroid)")
+    axes[0].set_ylabel("Edge count")
+    axes[1].hist(kin["RADIAL_COS"].dropna(), bins=bins, range=(-1, 1), color="tab:green", alpha=0.8)
+    axes[1].set_xlabel("Radial cosine")
+    fig.suptitle("Velocity relative to the slug centroid")
+    _save(fig, path)
+
+
+@figure("distance_to_centroid_vs_time.png", inputs=("kinematics",), params={"width": 600, "height": 300})
+def _distance_to_centroid(path, kin, *, width, height):
+    import matplotlib.pyplot as plt
+    from utils import plot_raster, rasterize_points
+
+    image, extent = rasterize_points(kin["FRAME_source"], kin["R_CENTROID"], width=width, height=height)
+    fig, ax = plt.subplots(figsize=(14, 6))
+    plot_raster(image, extent, ax=ax, cmap="magma",
+                title="Distance to centroid vs time", xlabel="Frame", ylabel="Distance to centroid",
+                colorbar_label="Edge count", aspect="auto")
+    ax.invert_yaxis()  # distance increases upward
+    binned = kin.groupby(kin["FRAME_source"] // 50 * 50)["R_CENTROID"].median()
+    ax.plot(binned.index, binned.values, color="cyan", linewidth=1.5, label="Median (50-frame bins)")
+    ax.legend(loc="upper right")
+    _save(fig, path)
+
+
+@figure("edge_x_vs_edge_y.png", inputs=("kinematics",), params={"width": 800, "height": 800})
+def _edge_positions(path, kin, *, width, height):
+    import matplotlib.pyplot as plt
+    from utils import plot_raster, rasterize_segments
+
+    image, extent = rasterize_segments(
+        kin["POSITION_X_source"], kin["POSITION_Y_source"], kin["POSITION_X_target"], kin["POSITION_Y_target"],
+        kin["COS_WAVE"], width=width, height=height, reduction="mean",
+    )
+    fig, ax = plt.subplots(figsize=(10, 10))
+    plot_raster(image, extent, ax=ax, cmap="RdBu_r", log=False, title="Edges colored by mean wave cosine",
+                xlabel="X", ylabel="Y", colorbar_label="Mean cosine")
+    _save(fig, path)
+
+
+@figure("radial_accel_vs_time.png", inputs=("smoothed",), params={"width": 600, "height": 300})
+def _radial_accel_vs_time(path, smoothed, *, width, height):
+    import matplotlib.pyplot as plt
+    from utils import plot_raster, rasterize_points
+
+    sub = smoothed.dropna(subset=["SMOOTH_A_RADIAL"])
+    a = sub["SMOOTH_A_RADIAL"]
+    lim = float(np.nanpercentile(np.abs(a), 99)) or 1.0
+    image, extent = rasterize_points(sub["FRAME"], a, width=width, height=height,
+                                     extent=(sub["FRAME"].min(), sub["FRAME"].max(), -lim, lim))
+    fig, ax = plt.subplots(figsize=(14, 6))
+    plot_raster(image, extent, ax=ax, cmap="magma",
+                title="Radial acceleration (smoothed tracks) vs time", xlabel="Frame",
+                ylabel="a_radial (negative = accelerating toward centroid)", colorbar_label="Spot count",
+                aspect="auto")
+    ax.invert_yaxis()
+    ax.axhline(0, color="white", linewidth=0.8)
+    _save(fig, path)
+
+
+@figure(
+    "time_vs_radial_cosine_vs_mean_radial_accel.png",
+    inputs=("smoothed",),
+    params={"n_time_bins": 40, "n_cos_bins": 40},
+)
+def _radial_accel_surface(path, smoothed, *, n_time_bins, n_cos_bins):
+    import matplotlib.pyplot as plt
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos = smoothed["SMOOTH_V_RADIAL"] / smoothed["SMOOTH_SPEED"]
+    sub = smoothed.assign(RADIAL_COS=cos).dropna(subset=["SMOOTH_A_RADIAL", "RADIAL_COS"])
+    t, c, a = sub["FRAME"].to_numpy(), sub["RADIAL_COS"].to_numpy(), sub["SMOOTH_A_RADIAL"].to_numpy()
+    bins = [np.linspace(t.min(), t.max(), n_time_bins + 1), np.linspace(-1, 1, n_cos_bins + 1)]
+    H, t_edges, c_edges = np.histogram2d(t, c, bins=bins)
+    S, _, _ = np.histogram2d(t, c, bins=bins, weights=a)
+    mean = np.divide(S, H, out=np.zeros_like(S), where=H > 0)
+    T, C = np.meshgrid((t_edges[:-1] + t_edges[1:]) / 2, (c_edges[:-1] + c_edges[1:]) / 2, indexing="ij")
+
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_subplot(111, projection="3d")
+    lim = float(np.abs(mean).max()) or 1.0
+    surf = ax.plot_surface(T, C, mean, cmap="RdBu", vmin=-lim, vmax=lim, linewidth=0, antialiased=True)
+    ax.set_xlabel("Frame")
+    ax.set_ylabel("Radial cosine")
+    ax.set_zlabel("Mean radial acceleration")
+    ax.set_title("Time vs Radial Cosine vs Mean Radial Acceleration (smoothed tracks)")
+    fig.colorbar(surf, ax=ax, shrink=0.5, aspect=20, pad=0.1, label="Mean a_radial")
+    ax.view_init(elev=30, azim=45)
+    _save(fig, path)
+
+
+@figure("cosine_vs_time_surface.gif", inputs=("kinematics",), params={"n_time_bins": 60, "n_cos_bins": 60, "frames": 36})
+def _cosine_surface_gif(path, kin, *, n_time_bins, n_cos_bins, frames):
+    import plotly.graph_objects as go
+    from utils import save_gif
+
+    t, c = kin["FRAME_source"].to_numpy(), kin["COS_WAVE"].to_numpy()
+    ok = ~np.isnan(c)
+    H, t_edges, c_edges = np.histogram2d(
+        t[ok], c[ok], bins=[np.linspace(t.min(), t.max(), n_time_bins + 1), np.linspace(-1, 1, n_cos_bins + 1)]
+    )
+    T, C = np.meshgrid((t_edges[:-1] + t_edges[1:]) / 2, (c_edges[:-1] + c_edges[1:]) / 2, indexing="ij")
+    fig = go.Figure(data=[go.Surface(x=T, y=C, z=H, colorscale="Viridis", showscale=False)])
+    fig.update_layout(
+        scene=dict(xaxis_title="Frame", yaxis_title="Cosine", zaxis_title="Edge Count"),
+        width=800, height=600, margin=dict(l=0, r=0, t=0, b=0),
+    )
+    save_gif(fig, path.name, frames=frames, output_dir=path.parent)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Rebuild site figures whose input tables or parameters changed.")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("--trial", help="Trial folder with TrackMate exports (see analysis/catalog.py)")
+    src.add_argument("--spots", "-s", help="Path to TrackMate spots CSV (requires --edges)")
+    p.add_argument("--edges", "-e", help="Path to TrackMate edges CSV")
+    p.add_argument("--output", "-o", default="assets/img", help="Figure folder (default: assets/img)")
+    p.add_argument("--only", nargs="+", default=None, help="Only these figures (file names)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    p.add_argument("--force", action="store_true", help="Rebuild every figure")
+    p.add_argument("--frame-interval", type=float, default=None, help="Time per frame (default: trial.json or 1)")
+    p.add_argument("--smoothing", choices=("savgol", "kalman", "spline"), default="kalman",
+                   help="Track smoother for acceleration figures (default: kalman)")
+    p.add_argument("--list", action="store_true", help="List registered figures and exit")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.list:
+        for name, node in FIGURES.items():
+            print(f"{name}: inputs={', '.join(node.inputs)}")
+        return 0
+    if not (args.trial or args.spots):
+        parser.error("one of the arguments --trial --spots/-s is required")
+
+    params = {"smoothing": args.smoothing}
+    if args.trial:
+        from catalog import load_trial
+
+        trial = load_trial(args.trial)
+        if trial.missing:
+            raise ValueError(f"Trial {trial.name} is missing its {', '.join(trial.missing)} export")
+        sources = {k: trial.exports[k] for k in SOURCES}
+        if trial.frame_interval is not None:
+            params["frame_interval"] = trial.frame_interval
+        if trial.centroid is not None:
+            params["centroid"] = list(trial.centroid)
+    else:
+        if not args.edges:
+            raise ValueError("--spots requires --edges")
+        sources = {"spots": args.spots, "edges": args.edges}
+    if args.frame_interval is not None:
+        params["frame_interval"] = args.frame_interval
+
+    status = build_figures(sources, args.output, only=args.only, workers=args.workers, force=args.force, **params)
+    for name, s in status.items():
+        print(f"  {name}: {s}")
+    return 0 if "failed" not in status.values() else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
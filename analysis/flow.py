@@ -0,0 +1,274 @@
+"""
+Dense optical-flow velocity fields as a tracking-free motion pipeline.
+
+Farneback optical flow is computed between consecutive frames of a TIFF movie,
+block-averaged by `downsample`, and stored as a chunked Zarr array of shape
+(T-1, Y/d, X/d, 2) holding (vx, vy) in pixels/frame (image coordinates).
+Frame pairs are split into chunks aligned with the Zarr chunks and processed
+in parallel worker processes, each of which writes its own chunk.
+
+Reductions (per-frame mean flow, wave-cosine maps, radial flow relative to
+centroids) are vectorized and stream over the stored array chunk by chunk.
+
+Usage:
+    python analysis/flow.py --input movie.tif --output flow.zarr --downsample 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import zarr
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from features import SLUG_CENTROID, WAVE_DIRECTION, radial_components, wave_cosine  # noqa: E402
+from preprocessor.frames import global_range, iter_frames, open_stack, stack_shape, to_uint8  # noqa: E402
+
+FARNEBACK_DEFAULTS = dict(
+    pyr_scale=0.5, levels=3, winsize=15, iterations=3, poly_n=5, poly_sigma=1.2, flags=0
+)
+
+
+def _block_mean(field: np.ndarray, d: int) -> np.ndarray:
+    """Average a (Y, X, 2) field over d x d blocks (remainder rows/cols dropped)."""
+    if d == 1:
+        return field
+    y, x = field.shape[0] // d * d, field.shape[1] // d * d
+    return field[:y, :x].reshape(y // d, d, x // d, d, 2).mean(axis=(1, 3))
+
+
+def _flow_chunk(
+    tiff_file: str,
+    store: str,
+    first: int,
+    last: int,
+    start_frame: int,
+    channel: int,
+    downsample: int,
+    value_range: tuple | None,
+    params: dict,
+) -> int:
+    """Compute flows [first, last) of the store and write them; runs in a worker."""
+    cv2.setNumThreads(1)
+    out = zarr.open_array(store, mode="r+")
+    block = np.empty((last - first,) + out.shape[1:], dtype=np.float32)
+
+    prev = None
+    frames = iter_frames(
+        tiff_file,
+        start_frame=start_frame + first,
+        end_frame=start_frame + last + 1,
+        channel=channel,
+    )
+    for i, (_, frame) in enumerate(frames):
+        frame = to_uint8(frame, value_range)
+        if prev is not None:
+            flow = cv2.calcOpticalFlowFarneback(prev, frame, None, **params)
+            block[i - 1] = _block_mean(flow, downsample)
+        prev = frame
+
+    out[first:last] = block
+    return last - first
+
+
+def compute_flow(
+    tiff_file: str | Path,
+    output_file: str | Path,
+    *,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    channel: int = 0,
+    downsample: int = 4,
+    chunk_frames: int = 64,
+    workers: int | None = None,
+    **farneback,
+):
+    """
+    Compute dense optical flow for consecutive frame pairs and store it on disk.
+
+    Args:
+        tiff_file: Path to input TIFF stack
+        output_file: Path to output Zarr store (e.g. `flow.zarr`)
+        start_frame: First frame to include (default: 0)
+        end_frame: Stop before this frame (default: T)
+        channel: Channel to use for (T, C, Y, X) stacks
+        downsample: Block size d for averaging flow vectors (default: 4)
+        chunk_frames: Frame pairs per Zarr chunk and per worker task
+        workers: Number of worker processes (default: os.cpu_count())
+        **farneback: Overrides for cv2.calcOpticalFlowFarneback parameters
+
+    Returns:
+        Zarr array of shape (T-1, Y/d, X/d, 2), float32 (vx, vy) in pixels/frame
+    """
+    params = {**FARNEBACK_DEFAULTS, **farneback}
+    shape = stack_shape(tiff_file)
+    frames = range(*slice(start_frame, end_frame).indices(shape[0]))
+    n_pairs = len(frames) - 1
+    if n_pairs < 1:
+        raise ValueError(f"Need at least two frames; got window [{start_frame}, {end_frame})")
+
+    out_shape = (n_pairs, shape[-2] // downsample, shape[-1] // downsample, 2)
+    out = zarr.open_array(
+        str(output_file),
+        mode="w",
+        shape=out_shape,
+        chunks=(chunk_frames,) + out_shape[1:],
+        dtype=np.float32,
+    )
+    out.attrs.update(
+        {"downsample": downsample, "start_frame": frames.start, "farneback": params}
+    )
+
+    # Same 8-bit conversion as preprocessor.tiff_to_mov
+    dtype = open_stack(tiff_file).dtype
+    value_range = None if dtype in (np.uint8, np.uint16) else global_range(open_stack(tiff_file))
+
+    tasks = [(a, min(a + chunk_frames, n_pairs)) for a in range(0, n_pairs, chunk_frames)]
+    print(f"Computing flow for {n_pairs} frame pairs in {len(tasks)} chunks -> {out_shape}")
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(
+                _flow_chunk, str(tiff_file), str(output_file), a, b,
+                frames.start, channel, downsample, value_range, params,
+            )
+            for a, b in tasks
+        ]
+        for future in futures:
+            done += future.result()
+            print(f"  Progress: {done}/{n_pairs} frame pairs")
+
+    print(f"Saved flow fields: {output_file}")
+    return out
+
+
+def _iter_blocks(flow, chunk: int):
+    chunk = chunk or flow.shape[0]
+    for a in range(0, flow.shape[0], chunk):
+        yield a, np.asarray(flow[a:a + chunk], dtype=np.float32)
+
+
+def _chunk_len(flow) -> int:
+    return getattr(flow, "chunks", (flow.shape[0],))[0]
+
+
+def mean_flow(flow, *, min_speed: float = 0.0) -> np.ndarray:
+    """
+    Per-frame mean flow vector over vectors with speed >= min_speed.
+
+    Returns:
+        (T-1, 2) array of (mean vx, mean vy); NaN where no vector qualifies
+    """
+    out = np.empty((flow.shape[0], 2), dtype=np.float64)
+    for a, block in _iter_blocks(flow, _chunk_len(flow)):
+        mask = np.hypot(block[..., 0], block[..., 1]) >= min_speed
+        count = mask.sum(axis=(1, 2))
+        sums = (block * mask[..., None]).sum(axis=(1, 2))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[a:a + len(block)] = sums / count[:, None]
+    return out
+
+
+def wave_cosine_map(flow, *, wave=WAVE_DIRECTION, min_speed: float = 0.1) -> np.ndarray:
+    """
+    Cosine between each flow vector and the wave direction.
+
+    Returns:
+        (T-1, Y/d, X/d) float32 array; NaN where speed < min_speed
+    """
+    out = np.empty(flow.shape[:3], dtype=np.float32)
+    for a, block in _iter_blocks(flow, _chunk_len(flow)):
+        cos = wave_cosine(block[..., 0], block[..., 1], wave)
+        speed = np.hypot(block[..., 0], block[..., 1])
+        out[a:a + len(block)] = np.where(speed >= min_speed, cos, np.nan)
+    return out
+
+
+def grid_coordinates(flow):
+    """
+    Pixel-centre (x, y) coordinates of each downsampled flow cell.
+
+    Returns:
+        Tuple of (X, Y) arrays, each of shape (Y/d, X/d)
+    """
+    d = flow.attrs["downsample"] if hasattr(flow, "attrs") else 1
+    ys = np.arange(flow.shape[1]) * d + (d - 1) / 2
+    xs = np.arange(flow.shape[2]) * d + (d - 1) / 2
+    return np.meshgrid(xs, ys)
+
+
+def radial_flow(flow, centroids=SLUG_CENTROID, *, min_speed: float = 0.1):
+    """
+    Radial flow component relative to a centroid (negative = inward).
+
+    Args:
+        flow: Flow array of shape (T-1, Y/d, X/d, 2) as written by compute_flow
+        centroids: Single (x, y) centroid, or (T-1, 2) array with one per frame pair
+        min_speed: Vectors slower than this are reported as NaN
+
+    Returns:
+        Tuple of (v_radial, radial_cosine), each (T-1, Y/d, X/d) float32
+    """
+    gx, gy = grid_coordinates(flow)
+    centroids = np.asarray(centroids, dtype=np.float64)
+    per_frame = centroids.ndim == 2
+
+    v_radial = np.empty(flow.shape[:3], dtype=np.float32)
+    radial_cos = np.empty(flow.shape[:3], dtype=np.float32)
+    for a, block in _iter_blocks(flow, _chunk_len(flow)):
+        c = centroids[a:a + len(block), None, None, :] if per_frame else centroids
+        _, vr, _, rc = radial_components(gx, gy, block[..., 0], block[..., 1], c)
+        slow = np.hypot(block[..., 0], block[..., 1]) < min_speed
+        v_radial[a:a + len(block)] = np.where(slow, np.nan, vr)
+        radial_cos[a:a + len(block)] = np.where(slow, np.nan, rc)
+    return v_radial, radial_cos
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Compute dense Farneback optical flow for a TIFF movie."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
+    p.add_argument("--output", "-o", required=True, help="Path to output Zarr store")
+    p.add_argument("--start-frame", type=int, default=None)
+    p.add_argument("--end-frame", type=int, default=None)
+    p.add_argument("--channel", type=int, default=0, help="Channel for (T,C,Y,X) stacks")
+    p.add_argument(
+        "--downsample", "-d", type=int, default=4,
+        help="Block size for averaging flow vectors (default: 4)",
+    )
+    p.add_argument(
+        "--chunk-frames", type=int, default=64,
+        help="Frame pairs per chunk/worker task (default: 64)",
+    )
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    p.add_argument("--winsize", type=int, default=15, help="Farneback window size (default: 15)")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    compute_flow(
+        args.input,
+        args.output,
+        start_frame=args.start_frame,
+        end_frame=args.end_frame,
+        channel=args.channel,
+        downsample=args.downsample,
+        chunk_frames=args.chunk_frames,
+        workers=args.workers,
+        winsize=args.winsize,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,220 @@
+"""
+Per-trial motion features: edge kinematics, MSD, time-binned velocities, summary stats.
+
+These are the notebook computations (see `pages/analysis.md` and
+`docs/meetings/next_steps.md`) as plain functions over TrackMate tables, so
+the batch runner can apply them to every trial.
+
+Positions stay in the units of the spots table; `frame_interval` converts
+frames to time (e.g. 15 for seconds at one frame per 15 s).
+"""
+import numpy as np
+import pandas as pd
+
+from features import SLUG_CENTROID, WAVE_DIRECTION, radial_components, wave_components, wave_cosine
+from trackmate import merge_edges_with_spots
+
+
+def edge_kinematics(edges, spots, *, frame_interval=1.0, wave=WAVE_DIRECTION, centroid=SLUG_CENTROID):
+    """
+    Per-edge velocity and its wave/centroid decompositions.
+
+    Args:
+        edges: TrackMate edges table
+        spots: TrackMate spots table
+        frame_interval: Time per frame
+        wave: Wave direction (math coordinates, y up)
+        centroid: Aggregation centre in the spots' coordinates
+
+    Returns:
+        The merged edge table plus DT, VX, VY, SPEED_XY, COS_WAVE, V_PARALLEL,
+        V_ORTHOGONAL, R_CENTROID, V_RADIAL, V_TANGENTIAL and RADIAL_COS
+    """
+    kin = merge_edges_with_spots(edges, spots)
+    # Orient every edge forward in time
+    flip = kin["FRAME_source"] > kin["FRAME_target"]
+    for col in ("POSITION_X", "POSITION_Y", "POSITION_T", "FRAME", "RADIUS"):
+        if f"{col}_source" in kin.columns:
+            src, tgt = kin[f"{col}_source"].copy(), kin[f"{col}_target"].copy()
+            kin.loc[flip, f"{col}_source"] = tgt[flip]
+            kin.loc[flip, f"{col}_target"] = src[flip]
+    if "SPOT_SOURCE_ID" in kin.columns:
+        src, tgt = kin["SPOT_SOURCE_ID"].copy(), kin["SPOT_TARGET_ID"].copy()
+        kin.loc[flip, "SPOT_SOURCE_ID"] = tgt[flip]
+        kin.loc[flip, "SPOT_TARGET_ID"] = src[flip]
+
+    kin["DT"] = (kin["FRAME_target"] - kin["FRAME_source"]) * frame_interval
+    kin = kin[kin["DT"] > 0].copy()
+    kin["VX"] = (kin["POSITION_X_target"] - kin["POSITION_X_source"]) / kin["DT"]
+    kin["VY"] = (kin["POSITION_Y_target"] - kin["POSITION_Y_source"]) / kin["DT"]
+    kin["SPEED_XY"] = np.hypot(kin["VX"], kin["VY"])
+    kin["COS_WAVE"] = wave_cosine(kin["VX"], kin["VY"], wave)
+    kin["V_PARALLEL"], kin["V_ORTHOGONAL"] = wave_components(kin["VX"], kin["VY"], wave)
+    mid_x = (kin["POSITION_X_source"] + kin["POSITION_X_target"]) / 2
+    mid_y = (kin["POSITION_Y_source"] + kin["POSITION_Y_target"]) / 2
+    (kin["R_CENTROID"], kin["V_RADIAL"], kin["V_TANGENTIAL"],
+     kin["RADIAL_COS"]) = radial_components(mid_x, mid_y, kin["VX"], kin["VY"], centroid)
+    return kin.reset_index(drop=True)
+
+
+def track_summary(kin, *, wave=WAVE_DIRECTION):
+    """
+    Per-track mean velocity and its wave cosine (the noise-reduced track feature).
+
+    Returns:
+        One row per TRACK_ID: N_EDGES, MEAN_TIME, MEAN_VX, MEAN_VY, MEAN_SPEED,
+        COS_MEAN_VELOCITY, MEAN_RADIAL_COS
+    """
+    g = kin.groupby("TRACK_ID")
+    out = pd.DataFrame({
+        "N_EDGES": g.size(),
+        "MEAN_TIME": g["FRAME_source"].mean(),
+        "MEAN_VX": g["VX"].mean(),
+        "MEAN_VY": g["VY"].mean(),
+        "MEAN_SPEED": g["SPEED_XY"].mean(),
+        "MEAN_RADIAL_COS": g["RADIAL_COS"].mean(),
+    })
+    out["COS_MEAN_VELOCITY"] = wave_cosine(out["MEAN_VX"], out["MEAN_VY"], wave)
+    return out.reset_index()
+
+
+def lag_correlation(a, b, n_fft):
+    """Sum over i of a[i] * b[i + lag] for every row, lags 0..n_fft // 2."""
+    fa = np.fft.rfft(a, n_fft, axis=-1)
+    fb = np.fft.rfft(b, n_fft, axis=-1)
+    return np.fft.irfft(np.conj(fa) * fb, n_fft, axis=-1)
+
+
+def track_msd(spots, *, max_lag=None, frame_interval=1.0, batch_size=256):
+    """
+    Ensemble time-averaged mean squared displacement over all tracks.
+
+    Each track is laid on a frame grid with a presence mask, so gaps are
+    handled exactly. Per lag, the squared displacements over all valid pairs
+    are summed using FFT correlations (|x_j|^2 + |x_i|^2 - 2 x_i.x_j). Tracks
+    are processed in batches of similar length.
+
+    Args:
+        spots: Spots table with TRACK_ID, FRAME, POSITION_X, POSITION_Y
+        max_lag: Largest lag in frames (default: longest track span - 1)
+        frame_interval: Time per frame, for the TAU column
+        batch_size: Tracks per FFT batch
+
+    Returns:
+        LAG (frames), TAU, MSD and N_PAIRS for lags 1..max_lag
+    """
+    df = spots[spots["TRACK_ID"].notna()].sort_values(["TRACK_ID", "FRAME"])
+    track = df["TRACK_ID"].to_numpy()
+    frame = df["FRAME"].to_numpy(np.int64)
+    xy = df[["POSITION_X", "POSITION_Y"]].to_numpy(np.float64)
+
+    starts = np.flatnonzero(np.r_[True, track[1:] != track[:-1]])
+    ends = np.r_[starts[1:], len(track)]
+    first = frame[starts]
+    span = np.maximum.reduceat(frame, starts) - first + 1 if len(starts) else np.empty(0, np.int64)
+    if max_lag is None:
+        max_lag = int(span.max()) - 1 if len(span) else 0
+
+    num = np.zeros(max_lag + 1)
+    cnt = np.zeros(max_lag + 1)
+    order = np.argsort(span)
+    for b in range(0, len(order), batch_size):
+        rows = order[b:b + batch_size]
+        width = int(span[rows].max())
+        n_fft = 1 << int(np.ceil(np.log2(2 * width)))
+        mask = np.zeros((len(rows), width))
+        pos = np.zeros((len(rows), 2, width))
+        for k, r in enumerate(rows):
+            cols = frame[starts[r]:ends[r]] - first[r]
+            mask[k, cols] = 1.0
+            pos[k, :, cols] = xy[starts[r]:ends[r]]
+        sq = (pos ** 2).sum(axis=1) * mask
+
+        lags = min(max_lag, width - 1) + 1
+        pairs = lag_correlation(mask, mask, n_fft)[:, :lags]
+        s = lag_correlation(sq, mask, n_fft)[:, :lags] + lag_correlation(mask, sq, n_fft)[:, :lags]
+        cross = sum(lag_correlation(pos[:, d] * mask, pos[:, d] * mask, n_fft)[:, :lags] for d in range(2))
+        num[:lags] += (s - 2 * cross).sum(axis=0)
+        cnt[:lags] += pairs.sum(axis=0)
+
+    cnt = np.rint(cnt).astype(np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        msd = np.where(cnt > 0, num / cnt, np.nan)
+    lag = np.arange(max_lag + 1)
+    return pd.DataFrame({
+        "LAG": lag[1:],
+        "TAU": lag[1:] * frame_interval,
+        "MSD": np.clip(msd[1:], 0, None),
+        "N_PAIRS": cnt[1:],
+    })
+
+
+def msd_exponent(msd, *, min_lag=1, max_lag=None, min_pairs=10):
+    """
+    Fit MSD = 4 D tau^alpha on a log-log scale.
+
+    Returns:
+        Tuple of (alpha, D); alpha ~1 is diffusive, ~2 directed motion. NaN if
+        fewer than two usable lags
+    """
+    sel = (msd["LAG"] >= min_lag) & (msd["N_PAIRS"] >= min_pairs) & (msd["MSD"] > 0)
+    if max_lag is not None:
+        sel &= msd["LAG"] <= max_lag
+    if sel.sum() < 2:
+        return np.nan, np.nan
+    alpha, intercept = np.polyfit(np.log(msd.loc[sel, "TAU"]), np.log(msd.loc[sel, "MSD"]), 1)
+    return float(alpha), float(np.exp(intercept) / 4)
+
+
+def binned_velocity(kin, *, bin_frames=300, wave=WAVE_DIRECTION):
+    """
+    Velocity statistics in consecutive time bins of `bin_frames` frames.
+
+    Returns:
+        One row per bin: BIN_START, N_EDGES, N_TRACKS, MEAN_SPEED, MEAN_VX,
+        MEAN_VY, COS_MEAN_VELOCITY, MEAN_COS_WAVE, MEAN_V_PARALLEL, MEAN_RADIAL_COS
+    """
+    bins = (kin["FRAME_source"] // bin_frames) * bin_frames
+    g = kin.groupby(bins)
+    out = pd.DataFrame({
+        "N_EDGES": g.size(),
+        "N_TRACKS": g["TRACK_ID"].nunique(),
+        "MEAN_SPEED": g["SPEED_XY"].mean(),
+        "MEAN_VX": g["VX"].mean(),
+        "MEAN_VY": g["VY"].mean(),
+        "MEAN_COS_WAVE": g["COS_WAVE"].mean(),
+        "MEAN_V_PARALLEL": g["V_PARALLEL"].mean(),
+        "MEAN_RADIAL_COS": g["RADIAL_COS"].mean(),
+    })
+    out["COS_MEAN_VELOCITY"] = wave_cosine(out["MEAN_VX"], out["MEAN_VY"], wave)
+    out.index.name = "BIN_START"
+    return out.reset_index()
+
+
+def summary_stats(kin, tracks, msd, *, against_wave=-0.7):
+    """
+    One-row summary of a trial for cross-trial comparison.
+
+    Args:
+        kin: Output of `edge_kinematics`
+        tracks: Output of `track_summary`
+        msd: Output of `track_msd`
+        against_wave: Track mean-velocity cosine below which a track counts as
+            moving against the wave (the notebook classifier's label)
+    """
+    alpha, diffusion = msd_exponent(msd)
+    return {
+        "N_TRACKS": int(kin["TRACK_ID"].nunique()),
+        "N_EDGES": int(len(kin)),
+        "FIRST_FRAME": int(kin["FRAME_source"].min()) if len(kin) else None,
+        "LAST_FRAME": int(kin["FRAME_target"].max()) if len(kin) else None,
+        "MEAN_SPEED": float(kin["SPEED_XY"].mean()),
+        "MEDIAN_SPEED": float(kin["SPEED_XY"].median()),
+        "MEAN_COS_WAVE": float(kin["COS_WAVE"].mean()),
+        "MEAN_V_PARALLEL": float(kin["V_PARALLEL"].mean()),
+        "MEAN_RADIAL_COS": float(kin["RADIAL_COS"].mean()),
+        "MEAN_TRACK_COS": float(tracks["COS_MEAN_VELOCITY"].mean()),
+        "FRAC_TRACKS_AGAINST_WAVE": float((tracks["COS_MEAN_VELOCITY"] < against_wave).mean()),
+        "MSD_ALPHA": alpha,
+        "MSD_D": diffusion,
+    }
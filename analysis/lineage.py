@@ -0,0 +1,560 @@
+"""
+Aggregation lineage: the merge/split DAG of track branches.
+
+TrackMate tracks can merge and split, but `*_branches.csv` rarely records
+predecessors/successors, and cells that touch at the end of a track are often
+left unlinked. `build_lineage` reconstructs the lineage from the spot/edge
+links:
+
+1. Links are oriented forward in time. Each track end (a spot with no outgoing
+   link before the last frame) is linked to the nearest spot of another track
+   within `merge_radius` in the next `max_gap` frames (inferred merges). Each
+   track start is linked the same way to an earlier spot (inferred splits).
+2. Spots are cut into branches (maximal unbranched chains) at every spot with
+   more than one predecessor or successor.
+3. Branches and the links between them form a DAG. Branch attributes are
+   stored in flat arrays, and parents/children in CSR arrays. Branch ids are
+   sorted by start frame, which is a topological order.
+
+Ancestor/descendant queries use interval labels (Agrawal, Borgida & Jagadish,
+1989). Each direction of the DAG gets a spanning forest numbered in preorder
+(Euler-tour entry order), so a branch's tree descendants occupy one contiguous
+interval. The extra paths created by merges are added as a few more intervals.
+"Does a reach b" is then a binary search, "which branches reach b" is a
+handful of array slices, and weighted subtree sizes are prefix-sum
+differences. The merge time of two lineages is the earliest start frame in the
+intersection of their descendant intervals, found with a sparse-table
+range-minimum.
+
+Usage:
+    python analysis/lineage.py --spots spots.csv --edges edges.csv --output lineage.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from trackmate import read_trackmate_csv
+
+# Arrays saved by Lineage.save(); the interval indices are rebuilt on load
+_FIELDS = (
+    "spot_id", "spot_branch", "track_id", "start_frame", "end_frame", "n_spots",
+    "first_spot", "last_spot", "child_ptr", "child_idx", "child_inferred",
+)
+
+
+def _csr(src: np.ndarray, dst: np.ndarray, n: int, *extra: np.ndarray):
+    """Sort (src, dst) links by src and return (ptr, dst, *extra) in CSR form."""
+    order = np.lexsort((dst, src))
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=ptr[1:])
+    return (ptr, dst[order].astype(np.int32)) + tuple(e[order] for e in extra)
+
+
+def _merge_intervals(intervals: list) -> list:
+    intervals.sort()
+    merged = [list(intervals[0])]  # copy: child lists are shared
+    for lo, hi in intervals[1:]:
+        if lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+class _IntervalIndex:
+    """
+    Reachability labels for a DAG given as CSR out-links and a topological order.
+
+    Node u reaches v (or v == u) iff pre[v] lies in one of u's intervals
+    iv_lo/iv_hi[iv_ptr[u]:iv_ptr[u + 1]]; by_pre maps preorder rank -> node.
+    """
+
+    def __init__(self, ptr: np.ndarray, idx: np.ndarray, topo: np.ndarray):
+        n = len(ptr) - 1
+        src = np.repeat(np.arange(n), np.diff(ptr))
+        rank = np.empty(n, dtype=np.int64)
+        rank[topo] = np.arange(n)
+
+        # Spanning forest: every node hangs under its earliest in-neighbour
+        tree_parent = np.full(n, -1, dtype=np.int64)
+        if len(idx):
+            order = np.lexsort((rank[src], idx))
+            first = np.r_[True, idx[order][1:] != idx[order][:-1]]
+            tree_parent[idx[order][first]] = src[order][first]
+        kids_ptr, kids = _csr(tree_parent[tree_parent >= 0], np.flatnonzero(tree_parent >= 0), n)
+
+        # Preorder numbering and subtree sizes of the forest
+        by_pre = np.empty(n, dtype=np.int64)
+        stack = list(topo[tree_parent[topo] < 0][::-1])
+        i = 0
+        while stack:
+            u = stack.pop()
+            by_pre[i] = u
+            i += 1
+            stack.extend(kids[kids_ptr[u]:kids_ptr[u + 1]][::-1].tolist())
+        pre = np.empty(n, dtype=np.int64)
+        pre[by_pre] = np.arange(n)
+        size = np.ones(n, dtype=np.int64)
+        for u in by_pre[::-1]:
+            if tree_parent[u] >= 0:
+                size[tree_parent[u]] += size[u]
+
+        # Interval lists, out-neighbours first: own tree interval plus every child's list
+        lists = [None] * n
+        for u in topo[::-1]:
+            ivs = [[pre[u], pre[u] + size[u] - 1]]
+            for v in idx[ptr[u]:ptr[u + 1]]:
+                ivs.extend(lists[v])
+            lists[u] = _merge_intervals(ivs) if len(ivs) > 1 else ivs
+
+        lengths = np.array([len(l) for l in lists], dtype=np.int64)
+        flat = np.array([iv for l in lists for iv in l], dtype=np.int64).reshape(-1, 2)
+        self.iv_ptr = np.r_[0, np.cumsum(lengths)]
+        self.iv_lo = flat[:, 0]
+        self.iv_hi = flat[:, 1]
+        self.pre = pre
+        self.by_pre = by_pre
+
+    def intervals(self, u: int) -> tuple:
+        s, e = self.iv_ptr[u], self.iv_ptr[u + 1]
+        return self.iv_lo[s:e], self.iv_hi[s:e]
+
+    def reaches(self, u: int, v: int) -> bool:
+        lo, hi = self.intervals(u)
+        k = np.searchsorted(lo, self.pre[v], side="right") - 1
+        return bool(k >= 0 and self.pre[v] <= hi[k])
+
+    def members(self, u: int) -> np.ndarray:
+        lo, hi = self.intervals(u)
+        return np.concatenate([self.by_pre[a:b + 1] for a, b in zip(lo, hi)])
+
+    def total(self, u: int, csum: np.ndarray) -> float:
+        """Sum of a weight over u's reachable set; csum is the prefix sum in preorder."""
+        lo, hi = self.intervals(u)
+        return csum[hi + 1].sum() - csum[lo].sum()
+
+
+class _SparseMin:
+    """O(1) argmin over ranges of a fixed array."""
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        n = len(values)
+        self.table = [np.arange(n, dtype=np.int32)]
+        k = 1
+        while 2 * k <= n:
+            prev = self.table[-1]
+            left, right = prev[:-k], prev[k:]
+            self.table.append(np.where(values[left] <= values[right], left, right))
+            k *= 2
+
+    def argmin(self, lo: int, hi: int) -> int:
+        """Index of the minimum of values[lo:hi + 1]."""
+        j = int(hi - lo + 1).bit_length() - 1
+        a, b = self.table[j][lo], self.table[j][hi - (1 << j) + 1]
+        return int(a if self.values[a] <= self.values[b] else b)
+
+
+class Lineage:
+    """
+    Branch-level merge/split DAG with interval reachability indices.
+
+    Branch arrays (track_id, start_frame, end_frame, n_spots, first_spot,
+    last_spot) are indexed by branch id; children of branch b are
+    child_idx[child_ptr[b]:child_ptr[b + 1]], with child_inferred flagging
+    links added by proximity. "Founders" are branches with no parents, i.e.
+    the original cells.
+    """
+
+    def __init__(self, **arrays):
+        for name in _FIELDS:
+            setattr(self, name, arrays[name])
+        n = len(self.start_frame)
+        src = np.repeat(np.arange(n), np.diff(self.child_ptr))
+        self.parent_ptr, self.parent_idx, self.parent_inferred = _csr(
+            self.child_idx.astype(np.int64), src, n, self.child_inferred
+        )
+        self.n_parents = np.diff(self.parent_ptr)
+        self.n_children = np.diff(self.child_ptr)
+
+        topo = np.arange(n)  # branch ids are sorted by start frame
+        self._down = _IntervalIndex(self.child_ptr, self.child_idx, topo)
+        self._up = _IntervalIndex(self.parent_ptr, self.parent_idx, topo[::-1])
+        self._founder_csum = np.r_[0, np.cumsum((self.n_parents == 0)[self._up.by_pre])]
+        self._spot_csum = {
+            "down": np.r_[0, np.cumsum(self.n_spots[self._down.by_pre])],
+            "up": np.r_[0, np.cumsum(self.n_spots[self._up.by_pre])],
+        }
+        self._first_frame = _SparseMin(self.start_frame[self._down.by_pre])
+
+    def __len__(self) -> int:
+        return len(self.start_frame)
+
+    # --- lookups ---------------------------------------------------------
+
+    def branch_of(self, spot_ids) -> np.ndarray:
+        """Branch id of each spot ID (-1 for spots not in the lineage)."""
+        spot_ids = np.asarray(spot_ids)
+        k = np.clip(np.searchsorted(self.spot_id, spot_ids), 0, len(self.spot_id) - 1)
+        return np.where(self.spot_id[k] == spot_ids, self.spot_branch[k], -1)
+
+    def children(self, b: int) -> np.ndarray:
+        return self.child_idx[self.child_ptr[b]:self.child_ptr[b + 1]]
+
+    def parents(self, b: int) -> np.ndarray:
+        return self.parent_idx[self.parent_ptr[b]:self.parent_ptr[b + 1]]
+
+    # --- reachability ----------------------------------------------------
+
+    def is_ancestor(self, a: int, b: int) -> bool:
+        """True if branch a precedes branch b in the lineage (a != b)."""
+        return a != b and self._down.reaches(a, b)
+
+    def descendants(self, b: int) -> np.ndarray:
+        """All branches that branch b flows into (excluding b)."""
+        out = self._down.members(b)
+        return np.sort(out[out != b])
+
+    def ancestors(self, b: int) -> np.ndarray:
+        """All branches that flow into branch b (excluding b)."""
+        out = self._up.members(b)
+        return np.sort(out[out != b])
+
+    def founders(self, b: int) -> np.ndarray:
+        """Original cells (parentless branches) that ended up in branch b."""
+        out = self._up.members(b)
+        return np.sort(out[self.n_parents[out] == 0])
+
+    def subtree_size(self, b: int, *, direction: str = "ancestors", weight: str = "branches") -> int:
+        """
+        Size of b's lineage in one direction, including b itself.
+
+        Args:
+            b: Branch id
+            direction: 'ancestors' (everything that merged into b) or
+                'descendants' (everything b flows into)
+            weight: 'branches', 'spots', or 'founders' (ancestors only)
+        """
+        if direction not in ("ancestors", "descendants"):
+            raise ValueError(f"direction must be 'ancestors' or 'descendants'; got {direction!r}")
+        index = self._up if direction == "ancestors" else self._down
+        if weight == "branches":
+            lo, hi = index.intervals(b)
+            return int((hi - lo + 1).sum())
+        if weight == "spots":
+            return int(index.total(b, self._spot_csum["up" if direction == "ancestors" else "down"]))
+        if weight == "founders" and direction == "ancestors":
+            return int(index.total(b, self._founder_csum))
+        raise ValueError(f"Unsupported weight {weight!r} for direction {direction!r}")
+
+    def merge_time(self, a: int, b: int) -> tuple:
+        """
+        First point where the lineages of branches a and b join.
+
+        Returns:
+            Tuple of (frame, branch): the earliest-starting branch that both flow
+            into, or (None, None) if they never join
+        """
+        a_lo, a_hi = self._down.intervals(a)
+        b_lo, b_hi = self._down.intervals(b)
+        best = None
+        i = j = 0
+        while i < len(a_lo) and j < len(b_lo):
+            lo, hi = max(a_lo[i], b_lo[j]), min(a_hi[i], b_hi[j])
+            if lo <= hi:
+                k = self._first_frame.argmin(lo, hi)
+                if best is None or self._first_frame.values[k] < self._first_frame.values[best]:
+                    best = k
+            if a_hi[i] < b_hi[j]:
+                i += 1
+            else:
+                j += 1
+        if best is None:
+            return None, None
+        branch = int(self._down.by_pre[best])
+        return int(self.start_frame[branch]), branch
+
+    # --- tables ----------------------------------------------------------
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per branch."""
+        n = len(self)
+        return pd.DataFrame({
+            "BRANCH": np.arange(n),
+            "TRACK_ID": self.track_id,
+            "START_FRAME": self.start_frame,
+            "END_FRAME": self.end_frame,
+            "N_SPOTS": self.n_spots,
+            "FIRST_SPOT": self.first_spot,
+            "LAST_SPOT": self.last_spot,
+            "N_PARENTS": self.n_parents,
+            "N_CHILDREN": self.n_children,
+            "N_FOUNDERS": [self.subtree_size(b, weight="founders") for b in range(n)],
+        })
+
+    def merge_events(self) -> pd.DataFrame:
+        """Branches with two or more parents: where lineages merge."""
+        b = np.flatnonzero(self.n_parents >= 2)
+        csum = np.r_[0, np.cumsum(self.parent_inferred)]
+        inferred = csum[self.parent_ptr[b + 1]] > csum[self.parent_ptr[b]]
+        return pd.DataFrame({
+            "BRANCH": b,
+            "FRAME": self.start_frame[b],
+            "N_PARENTS": self.n_parents[b],
+            "INFERRED": inferred,
+        })
+
+    def split_events(self) -> pd.DataFrame:
+        """Branches with two or more children: where lineages split."""
+        b = np.flatnonzero(self.n_children >= 2)
+        csum = np.r_[0, np.cumsum(self.child_inferred)]
+        inferred = csum[self.child_ptr[b + 1]] > csum[self.child_ptr[b]]
+        return pd.DataFrame({
+            "BRANCH": b,
+            "FRAME": self.end_frame[b],
+            "N_CHILDREN": self.n_children[b],
+            "INFERRED": inferred,
+        })
+
+    def final_aggregates(self, *, min_founders: int = 2) -> pd.DataFrame:
+        """Childless branches with at least `min_founders` original cells, largest first."""
+        sinks = np.flatnonzero(self.n_children == 0)
+        n_founders = np.array([self.subtree_size(b, weight="founders") for b in sinks], dtype=np.int64)
+        keep = n_founders >= min_founders
+        df = pd.DataFrame({
+            "BRANCH": sinks[keep],
+            "TRACK_ID": self.track_id[sinks[keep]],
+            "END_FRAME": self.end_frame[sinks[keep]],
+            "N_FOUNDERS": n_founders[keep],
+        })
+        return df.sort_values("N_FOUNDERS", ascending=False, ignore_index=True)
+
+    # --- persistence -----------------------------------------------------
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **{name: getattr(self, name) for name in _FIELDS})
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "Lineage":
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in _FIELDS})
+
+
+def _infer_links(
+    frame: np.ndarray,
+    xy: np.ndarray,
+    track: np.ndarray,
+    ends: np.ndarray,
+    *,
+    radius: float,
+    max_gap: int,
+    step: int,
+):
+    """
+    Link each spot in `ends` to the nearest spot of another track `step * g`
+    frames away (g = 1..max_gap, nearest gap first) within `radius`.
+    """
+    by_frame = {}
+    order = np.argsort(frame, kind="stable")
+    uniq, starts = np.unique(frame[order], return_index=True)
+    for f, s, e in zip(uniq.tolist(), starts, np.append(starts[1:], len(order))):
+        by_frame[f] = order[s:e]
+
+    src, dst = [], []
+    pending = ends
+    trees = {}
+    for g in range(1, max_gap + 1):
+        if len(pending) == 0:
+            break
+        target = frame[pending] + step * g
+        unmatched = []
+        for f in np.unique(target).tolist():
+            rows = pending[target == f]
+            if f not in by_frame:
+                unmatched.append(rows)
+                continue
+            if f not in trees:
+                trees[f] = cKDTree(xy[by_frame[f]])
+            cand = by_frame[f]
+            # Every spot within radius: a merged track can put many of its own spots there
+            balls = trees[f].query_ball_point(xy[rows], radius)
+            counts = np.fromiter(map(len, balls), dtype=np.int64, count=len(rows))
+            row = np.repeat(np.arange(len(rows)), counts)
+            near = cand[np.fromiter(chain.from_iterable(balls), dtype=np.int64, count=int(counts.sum()))]
+            other = track[near] != track[rows[row]]
+            row, near = row[other], near[other]
+            dist = np.hypot(*(xy[near] - xy[rows[row]]).T)
+            # Nearest spot of another track per row
+            order = np.lexsort((dist, row))
+            row, near = row[order], near[order]
+            first = np.r_[True, row[1:] != row[:-1]] if len(row) else np.zeros(0, dtype=bool)
+            hit = np.zeros(len(rows), dtype=bool)
+            hit[row[first]] = True
+            src.append(rows[row[first]])
+            dst.append(near[first])
+            unmatched.append(rows[~hit])
+        pending = np.concatenate(unmatched) if unmatched else pending[:0]
+
+    src = np.concatenate(src) if src else np.empty(0, dtype=np.int64)
+    dst = np.concatenate(dst) if dst else np.empty(0, dtype=np.int64)
+    return (src, dst) if step > 0 else (dst, src)
+
+
+def build_lineage(
+    spots: pd.DataFrame,
+    edges: pd.DataFrame,
+    *,
+    merge_radius: float | None = None,
+    max_gap: int = 2,
+    infer_merges: bool = True,
+    infer_splits: bool = True,
+) -> Lineage:
+    """
+    Reconstruct the branch merge/split DAG from TrackMate spots and edges.
+
+    Args:
+        spots: TrackMate spots table (ID, TRACK_ID, POSITION_X/Y, FRAME[, RADIUS]);
+            spots without a TRACK_ID are ignored
+        edges: TrackMate edges table (SPOT_SOURCE_ID, SPOT_TARGET_ID)
+        merge_radius: Max distance (table units) for proximity links
+            (default: twice the mean spot RADIUS)
+        max_gap: Look this many frames ahead/behind for proximity links
+        infer_merges: Link track ends to nearby spots of other tracks
+        infer_splits: Link track starts to nearby earlier spots of other tracks
+
+    Returns:
+        Lineage
+    """
+    spots = spots[spots["TRACK_ID"].notna()].sort_values("ID")
+    ids = spots["ID"].to_numpy(np.int64)
+    frame = spots["FRAME"].to_numpy(np.int64)
+    track = spots["TRACK_ID"].to_numpy(np.int64)
+    xy = spots[["POSITION_X", "POSITION_Y"]].to_numpy(np.float64)
+    n = len(ids)
+
+    # Orient links forward in time, dropping links to unknown spots
+    s = np.searchsorted(ids, edges["SPOT_SOURCE_ID"].to_numpy(np.int64)).clip(0, max(n - 1, 0))
+    d = np.searchsorted(ids, edges["SPOT_TARGET_ID"].to_numpy(np.int64)).clip(0, max(n - 1, 0))
+    known = (ids[s] == edges["SPOT_SOURCE_ID"].to_numpy()) & (ids[d] == edges["SPOT_TARGET_ID"].to_numpy())
+    s, d = s[known], d[known]
+    s, d = np.where(frame[s] <= frame[d], s, d), np.where(frame[s] <= frame[d], d, s)
+    forward = frame[s] < frame[d]
+    src, dst = s[forward], d[forward]
+    inferred = np.zeros(len(src), dtype=bool)
+
+    if merge_radius is None:
+        radius = spots["RADIUS"].to_numpy(np.float64) if "RADIUS" in spots.columns else np.ones(n)
+        merge_radius = 2 * float(np.nanmean(radius)) if n else 0.0
+    outdeg = np.bincount(src, minlength=n)
+    indeg = np.bincount(dst, minlength=n)
+    new = []
+    if infer_merges and n:
+        tails = np.flatnonzero((outdeg == 0) & (indeg > 0) & (frame < frame.max()))
+        new.append(_infer_links(frame, xy, track, tails, radius=merge_radius, max_gap=max_gap, step=1))
+    if infer_splits and n:
+        heads = np.flatnonzero((indeg == 0) & (outdeg > 0) & (frame > frame.min()))
+        new.append(_infer_links(frame, xy, track, heads, radius=merge_radius, max_gap=max_gap, step=-1))
+    for a, b in new:
+        src = np.concatenate([src, a])
+        dst = np.concatenate([dst, b])
+        inferred = np.concatenate([inferred, np.ones(len(a), dtype=bool)])
+
+    # Cut into branches: a link is internal when it is the only way out and the only way in
+    outdeg = np.bincount(src, minlength=n)
+    indeg = np.bincount(dst, minlength=n)
+    internal = (outdeg[src] == 1) & (indeg[dst] == 1)
+    head = np.arange(n)
+    head[dst[internal]] = src[internal]
+    while True:  # pointer jumping to each chain's first spot
+        nxt = head[head]
+        if np.array_equal(nxt, head):
+            break
+        head = nxt
+
+    heads, spot_branch = np.unique(head, return_inverse=True)
+    # Renumber branches by start frame so ids are a topological order
+    rank = np.empty(len(heads), dtype=np.int64)
+    rank[np.lexsort((heads, frame[heads]))] = np.arange(len(heads))
+    spot_branch = rank[spot_branch]
+    n_branches = len(heads)
+
+    by_branch = np.lexsort((frame, spot_branch))
+    bounds = np.searchsorted(spot_branch[by_branch], np.arange(n_branches + 1))
+    first, last = by_branch[bounds[:-1]], by_branch[bounds[1:] - 1]
+
+    # Links between branches, deduplicated
+    cross = ~internal
+    pairs = np.column_stack([spot_branch[src[cross]], spot_branch[dst[cross]]])
+    pairs, inv = np.unique(pairs, axis=0, return_inverse=True)
+    pair_inferred = np.zeros(len(pairs), dtype=bool)
+    np.logical_or.at(pair_inferred, inv.ravel(), inferred[cross])
+    child_ptr, child_idx, child_inferred = _csr(pairs[:, 0], pairs[:, 1], n_branches, pair_inferred)
+
+    return Lineage(
+        spot_id=ids,
+        spot_branch=spot_branch.astype(np.int32),
+        track_id=track[first],
+        start_frame=frame[first],
+        end_frame=frame[last],
+        n_spots=np.diff(bounds),
+        first_spot=ids[first],
+        last_spot=ids[last],
+        child_ptr=child_ptr,
+        child_idx=child_idx,
+        child_inferred=child_inferred,
+    )
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Reconstruct the aggregation lineage (merge/split DAG) from TrackMate spots/edges."
+    )
+    p.add_argument("--spots", "-s", required=True, help="Path to TrackMate spots CSV")
+    p.add_argument("--edges", "-e", required=True, help="Path to TrackMate edges CSV")
+    p.add_argument("--output", "-o", required=True, help="Path to output lineage (.npz)")
+    p.add_argument("--branches-csv", default=None, help="Also write one row per branch to this CSV")
+    p.add_argument(
+        "--merge-radius", type=float, default=None,
+        help="Max distance for proximity merges/splits (default: 2x mean spot radius)",
+    )
+    p.add_argument("--max-gap", type=int, default=2, help="Frames to look ahead/behind (default: 2)")
+    p.add_argument("--no-infer", action="store_true", help="Use only the TrackMate links")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    lineage = build_lineage(
+        read_trackmate_csv(args.spots),
+        read_trackmate_csv(args.edges),
+        merge_radius=args.merge_radius,
+        max_gap=args.max_gap,
+        infer_merges=not args.no_infer,
+        infer_splits=not args.no_infer,
+    )
+    print(f"Linked {len(lineage.spot_id)} spots "
+          f"({int(lineage.child_inferred.sum())} branch links inferred by proximity)")
+    lineage.save(args.output)
+    merges, splits = lineage.merge_events(), lineage.split_events()
+    print(f"{len(lineage)} branches, {len(merges)} merges, {len(splits)} splits")
+    print(lineage.final_aggregates().head(10).to_string(index=False))
+    if args.branches_csv:
+        Path(args.branches_csv).parent.mkdir(parents=True, exist_ok=True)
+        lineage.to_frame().to_csv(args.branches_csv, index=False)
+        print(f"Saved branches: {args.branches_csv}")
+    print(f"Saved lineage: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
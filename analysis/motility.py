@@ -0,0 +1,500 @@
+"""
+Stochastic motility models: fit persistent random walks, simulate ensembles.
+
+`analysis/extra.ipynb` finds that regressing on track features explains
+almost nothing, so here motion is modelled as a discrete Langevin (AR(1))
+process for the velocity, one frame per step:
+
+    v[t+1] = phi * v[t] + beta_wave * w + beta_centroid * c(x[t+1]) + noise * xi
+    x[t+1] = x[t] + v[t] * frame_interval
+
+`w` is the unit wave direction and `c(x)` is the unit vector from the cell to
+the centroid (both in image coordinates). `xi` is standard normal per axis.
+`phi` sets the persistence time, tau = -frame_interval / ln(phi). The betas
+are the drift pulls, and beta / (1 - phi) is the terminal drift speed.
+
+Fitting joins consecutive single-frame edges from `edge_kinematics` on their
+shared spot. Both axes are stacked, and the normal equations are accumulated
+per group (track, time window or the whole trial) with `np.bincount`. Every
+group is then solved in one batched `np.linalg.solve`.
+
+Simulation draws per-cell parameters from the fitted groups (weighted by
+their number of pairs). Start positions and velocities come from observed
+track starts. Each chunk is stepped as (n_cells x n_steps) NumPy arrays, and
+chunks can run in parallel. Chunks return only sufficient statistics (MSD
+sums, cosine histograms), so ensembles far larger than memory are fine.
+Drift hypotheses ("wave", "centroid", both, or a pure persistent random walk)
+are compared with the observed MSD and the COS_WAVE / RADIAL_COS
+distributions.
+
+Usage:
+    python analysis/motility.py --spots spots.csv --edges edges.csv --output-dir motility/ --by track
+    python analysis/motility.py --spots spots.csv --edges edges.csv --output-dir motility/ \
+        --by window --window 300 --n-cells 100000 --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import wasserstein_distance
+
+from features import SLUG_CENTROID, WAVE_DIRECTION, radial_components, wave_cosine
+from kinematics import edge_kinematics, lag_correlation, msd_exponent, track_msd
+from trackmate import read_trackmate_csv
+
+DRIFTS = ("wave", "centroid")
+
+# Drift terms kept by each aggregation hypothesis
+HYPOTHESES = {
+    "full": ("wave", "centroid"),
+    "wave": ("wave",),
+    "centroid": ("centroid",),
+    "prw": (),
+}
+
+COS_BINS = np.linspace(-1.0, 1.0, 41)
+
+
+def _wave_unit(wave):
+    """Unit wave direction in image coordinates (y down)."""
+    w = np.array([wave[0], -wave[1]], dtype=np.float64)
+    return w / np.hypot(*w)
+
+
+def _toward(x, y, centroid):
+    """Unit vectors from (x, y) to the centroid; zero at the centroid itself."""
+    dx = centroid[0] - np.asarray(x, dtype=np.float64)
+    dy = centroid[1] - np.asarray(y, dtype=np.float64)
+    r = np.hypot(dx, dy)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(r > 0, dx / r, 0.0), np.where(r > 0, dy / r, 0.0)
+
+
+def velocity_pairs(kin, *, frame_interval=1.0):
+    """
+    Consecutive single-frame velocity pairs (v[t], v[t+1]) along each track.
+
+    Two edges form a pair when the first one's target spot is the second
+    one's source spot. Splits and merges therefore yield every
+    parent/child combination.
+
+    Args:
+        kin: Output of `kinematics.edge_kinematics`
+        frame_interval: Time per frame; only edges spanning exactly one frame are used
+
+    Returns:
+        TRACK_ID, FRAME (of the shared spot), X, Y (shared spot position), VX, VY
+        (incoming edge) and VX_NEXT, VY_NEXT (outgoing edge)
+    """
+    step = kin[np.isclose(kin["DT"], frame_interval)]
+    first = step[["TRACK_ID", "SPOT_TARGET_ID", "FRAME_target", "POSITION_X_target", "POSITION_Y_target", "VX", "VY"]]
+    second = step[["SPOT_SOURCE_ID", "VX", "VY"]].rename(
+        columns={"SPOT_SOURCE_ID": "SPOT_TARGET_ID", "VX": "VX_NEXT", "VY": "VY_NEXT"}
+    )
+    pairs = first.merge(second, on="SPOT_TARGET_ID")
+    return pairs.rename(columns={
+        "FRAME_target": "FRAME", "POSITION_X_target": "X", "POSITION_Y_target": "Y",
+    }).drop(columns="SPOT_TARGET_ID").reset_index(drop=True)
+
+
+def _design(vx, vy, x, y, drift, wave, centroid):
+    """Regressors of shape (n, 2 axes, k): velocity, then the requested drift directions."""
+    n = len(vx)
+    cols = [np.stack([vx, vy], axis=1)]
+    if "wave" in drift:
+        cols.append(np.broadcast_to(_wave_unit(wave), (n, 2)))
+    if "centroid" in drift:
+        cols.append(np.stack(_toward(x, y, centroid), axis=1))
+    return np.stack(cols, axis=-1)
+
+
+def fit_motility(
+    kin, *, by="track", window=300, drift=DRIFTS, frame_interval=1.0,
+    wave=WAVE_DIRECTION, centroid=SLUG_CENTROID, min_pairs=10, ridge=1e-6,
+):
+    """
+    Fit the Langevin velocity model per track, per time window or per trial.
+
+    Args:
+        kin: Output of `kinematics.edge_kinematics`
+        by: Grouping of the velocity pairs: "track", "window" or "all"
+        window: Frames per window when `by="window"`
+        drift: Drift terms to include, a subset of DRIFTS
+        frame_interval: Time per frame
+        wave, centroid: Wave direction (math coordinates, y up) and aggregation centre
+        min_pairs: Groups with fewer velocity pairs are left as NaN
+        ridge: Relative ridge added to the normal equations. It keeps short tracks
+            solvable when the wave and centroid directions are nearly parallel
+
+    Returns:
+        One row per group: the group key (TRACK_ID or WINDOW_START), N_PAIRS, PHI,
+        BETA_WAVE, BETA_CENTROID, NOISE (per-step velocity noise std), PERSISTENCE
+        (time), DRIFT_WAVE, DRIFT_CENTROID (terminal drift speeds), SPEED_SD (stationary
+        per-axis velocity std) and DIFFUSION (long-time SPEED_SD^2 * PERSISTENCE)
+    """
+    unknown = set(drift) - set(DRIFTS)
+    if unknown:
+        raise ValueError(f"Unknown drift terms {sorted(unknown)}; choose from {DRIFTS}")
+    pairs = velocity_pairs(kin, frame_interval=frame_interval)
+    if by == "track":
+        key_name, key = "TRACK_ID", pairs["TRACK_ID"].to_numpy()
+    elif by == "window":
+        key_name, key = "WINDOW_START", pairs["FRAME"].to_numpy(np.int64) // window * window
+    elif by == "all":
+        key_name, key = None, np.zeros(len(pairs), dtype=np.int64)
+    else:
+        raise ValueError(f"Unknown grouping {by!r}; choose 'track', 'window' or 'all'")
+
+    codes, groups = pd.factorize(key, sort=True)
+    n_groups = len(groups)
+    X = _design(pairs["VX"].to_numpy(), pairs["VY"].to_numpy(), pairs["X"].to_numpy(), pairs["Y"].to_numpy(),
+                drift, wave, centroid)
+    y = pairs[["VX_NEXT", "VY_NEXT"]].to_numpy(np.float64)
+    k = X.shape[-1]
+
+    # Per-group normal equations, both axes pooled
+    A = np.empty((n_groups, k, k))
+    for i in range(k):
+        for j in range(i, k):
+            A[:, i, j] = A[:, j, i] = np.bincount(codes, (X[:, :, i] * X[:, :, j]).sum(1), n_groups)
+    b = np.stack([np.bincount(codes, (X[:, :, i] * y).sum(1), n_groups) for i in range(k)], axis=1)
+    yy = np.bincount(codes, (y * y).sum(1), n_groups)
+    n_pairs = np.bincount(codes, minlength=n_groups)
+
+    theta = np.full((n_groups, k), np.nan)
+    ok = n_pairs >= max(min_pairs, k)
+    if ok.any():
+        A_ok = A[ok] + ridge * np.trace(A[ok], axis1=1, axis2=2)[:, None, None] / k * np.eye(k)
+        theta[ok] = np.linalg.solve(A_ok, b[ok][..., None])[..., 0]
+    rss = yy - 2 * (theta * b).sum(1) + np.einsum("gi,gij,gj->g", theta, A, theta)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        noise = np.sqrt(np.maximum(rss, 0) / (2 * n_pairs - k))
+
+    phi = theta[:, 0]
+    col = 1
+    betas = {}
+    for name in DRIFTS:
+        if name in drift:
+            betas[name] = theta[:, col]
+            col += 1
+        else:
+            betas[name] = np.where(ok, 0.0, np.nan)
+
+    stationary = (phi > 0) & (phi < 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        persistence = np.where(stationary, -frame_interval / np.log(np.where(stationary, phi, 0.5)), np.nan)
+        speed_sd = np.where(stationary, noise / np.sqrt(1 - phi ** 2), np.nan)
+        out = pd.DataFrame({
+            "N_PAIRS": n_pairs,
+            "PHI": phi,
+            "BETA_WAVE": betas["wave"],
+            "BETA_CENTROID": betas["centroid"],
+            "NOISE": noise,
+            "PERSISTENCE": persistence,
+            "DRIFT_WAVE": np.where(phi < 1, betas["wave"] / (1 - phi), np.nan),
+            "DRIFT_CENTROID": np.where(phi < 1, betas["centroid"] / (1 - phi), np.nan),
+            "SPEED_SD": speed_sd,
+            "DIFFUSION": speed_sd ** 2 * persistence,
+        })
+    if key_name is not None:
+        out.insert(0, key_name, groups)
+    return out
+
+
+def simulate(phi, beta_wave, beta_centroid, noise, x0, v0, n_steps, *, frame_interval=1.0,
+             wave=WAVE_DIRECTION, centroid=SLUG_CENTROID, seed=None):
+    """
+    Simulate an ensemble of cells as (n_cells x n_steps) arrays.
+
+    Args:
+        phi, beta_wave, beta_centroid, noise: Model parameters (see `fit_motility`),
+            scalars or one per cell
+        x0, v0: (n_cells, 2) start positions and velocities in image coordinates
+        n_steps: Number of one-frame steps
+        frame_interval: Time per frame
+        wave, centroid: Wave direction (math coordinates) and aggregation centre
+        seed: Random seed (int, SeedSequence or Generator)
+
+    Returns:
+        Tuple of (positions, velocities) of shapes (n_cells, n_steps + 1, 2) and
+        (n_cells, n_steps, 2). velocities[:, t] moves positions[:, t] to
+        positions[:, t + 1]
+    """
+    rng = np.random.default_rng(seed)
+    x = np.array(x0, dtype=np.float64)
+    v = np.array(v0, dtype=np.float64)
+    n = len(x)
+    phi, beta_wave, beta_centroid, noise = (
+        np.broadcast_to(np.asarray(p, dtype=np.float64), (n,))[:, None]
+        for p in (phi, beta_wave, beta_centroid, noise)
+    )
+    pull_wave = beta_wave * _wave_unit(wave)
+    xi = rng.standard_normal((n_steps, n, 2))
+
+    pos = np.empty((n, n_steps + 1, 2))
+    vel = np.empty((n, n_steps, 2))
+    pos[:, 0] = x
+    for t in range(n_steps):
+        vel[:, t] = v
+        x = x + v * frame_interval
+        pos[:, t + 1] = x
+        cx, cy = _toward(x[:, 0], x[:, 1], centroid)
+        v = phi * v + pull_wave + beta_centroid * np.stack([cx, cy], axis=1) + noise * xi[t]
+    return pos, vel
+
+
+def _msd_sums(pos, max_lag):
+    """Summed squared displacements and pair counts for lags 0..max_lag of gap-free tracks."""
+    n, T, _ = pos.shape
+    pos = pos - pos[:, :1]  # displacements are translation invariant; keeps the cancellation small
+    n_fft = 1 << int(np.ceil(np.log2(2 * T)))
+    sq = np.concatenate([[0.0], np.cumsum((pos ** 2).sum(axis=(0, 2)))])
+    lags = np.arange(max_lag + 1)
+    # sum_i |x_i|^2 over i < T - lag plus sum_i |x_{i+lag}|^2, minus twice the cross term
+    num = sq[T - lags] + (sq[T] - sq[lags])
+    for d in range(2):
+        num -= 2 * lag_correlation(pos[:, :, d], pos[:, :, d], n_fft)[:, :max_lag + 1].sum(0)
+    return num, n * (T - lags).astype(np.float64)
+
+
+def _simulate_chunk(params, x0, v0, n_steps, frame_interval, wave, centroid, seed, max_lag):
+    """Run one chunk and reduce it to MSD sums and cosine histograms."""
+    pos, vel = simulate(*params, x0, v0, n_steps, frame_interval=frame_interval,
+                        wave=wave, centroid=centroid, seed=seed)
+    num, cnt = _msd_sums(pos, max_lag)
+    vx, vy = vel[..., 0], vel[..., 1]
+    mid = (pos[:, :-1] + pos[:, 1:]) / 2
+    cos_wave = wave_cosine(vx, vy, wave)
+    radial_cos = radial_components(mid[..., 0], mid[..., 1], vx, vy, centroid)[3]
+    return (
+        num, cnt,
+        np.histogram(cos_wave[np.isfinite(cos_wave)], COS_BINS)[0],
+        np.histogram(radial_cos[np.isfinite(radial_cos)], COS_BINS)[0],
+    )
+
+
+def _track_starts(kin):
+    """First edge of every track: start positions and velocities."""
+    first = kin.sort_values("FRAME_source").groupby("TRACK_ID", sort=False).head(1)
+    return (first[["POSITION_X_source", "POSITION_Y_source"]].to_numpy(np.float64),
+            first[["VX", "VY"]].to_numpy(np.float64))
+
+
+def simulate_ensemble(
+    fit, kin, *, n_cells=10000, n_steps=None, max_lag=None, frame_interval=1.0,
+    wave=WAVE_DIRECTION, centroid=SLUG_CENTROID, chunk_size=2000, workers=1, seed=0,
+):
+    """
+    Simulate a large ensemble from fitted parameters in chunks.
+
+    Each cell draws its parameters from a fitted group (weighted by N_PAIRS)
+    and its start from an observed track start. Chunks are seeded from one
+    SeedSequence, so the result does not depend on `workers`.
+
+    Args:
+        fit: Output of `fit_motility`. Rows without a finite NOISE, or whose PHI is not
+            stationary (|PHI| < 1), are skipped and their number reported
+        kin: Output of `kinematics.edge_kinematics`, for the start conditions
+        n_cells: Ensemble size
+        n_steps: Steps per cell (default: median observed track span in frames)
+        max_lag: Largest MSD lag (default: n_steps)
+        frame_interval: Time per frame
+        wave, centroid: Wave direction (math coordinates) and aggregation centre
+        chunk_size: Cells per simulated chunk
+        workers: Worker processes; None uses every CPU, 1 runs serially
+        seed: Random seed
+
+    Returns:
+        Tuple of (msd, cosines): msd has LAG, TAU, MSD and N_PAIRS for lags 1..max_lag.
+        cosines has BIN_LEFT, BIN_RIGHT, COS_WAVE and RADIAL_COS counts over COS_BINS
+    """
+    fitted = np.isfinite(fit["PHI"]) & np.isfinite(fit["NOISE"])
+    stationary = fitted & (fit["PHI"].abs() < 1)
+    if (fitted & ~stationary).any():
+        print(f"Skipping {int((fitted & ~stationary).sum())}/{int(fitted.sum())} fitted groups with |PHI| >= 1")
+    fit = fit[stationary]
+    if fit.empty:
+        raise ValueError("No stationary fitted groups (finite NOISE, |PHI| < 1) to simulate")
+    if n_steps is None:
+        span = kin.groupby("TRACK_ID")["FRAME_target"].max() - kin.groupby("TRACK_ID")["FRAME_source"].min()
+        n_steps = max(int(span.median()), 2)
+    max_lag = n_steps if max_lag is None else min(max_lag, n_steps)
+
+    rng = np.random.default_rng(seed)
+    params = fit[["PHI", "BETA_WAVE", "BETA_CENTROID", "NOISE"]].fillna(0.0).to_numpy()
+    weight = fit["N_PAIRS"].to_numpy(np.float64)
+    rows = rng.choice(len(params), n_cells, p=weight / weight.sum())
+    x_start, v_start = _track_starts(kin)
+    starts = rng.integers(len(x_start), size=n_cells)
+
+    bounds = range(0, n_cells, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    jobs = [
+        (tuple(params[rows[s:s + chunk_size]].T), x_start[starts[s:s + chunk_size]],
+         v_start[starts[s:s + chunk_size]], n_steps, frame_interval, wave, centroid, ss, max_lag)
+        for s, ss in zip(bounds, seeds)
+    ]
+    if workers == 1:
+        results = (_simulate_chunk(*job) for job in jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        results = pool.map(_simulate_chunk, *zip(*jobs))
+
+    num = np.zeros(max_lag + 1)
+    cnt = np.zeros(max_lag + 1)
+    hist_wave = np.zeros(len(COS_BINS) - 1, dtype=np.int64)
+    hist_radial = np.zeros(len(COS_BINS) - 1, dtype=np.int64)
+    try:
+        for i, (n_sum, c_sum, hw, hr) in enumerate(results, 1):
+            num += n_sum
+            cnt += c_sum
+            hist_wave += hw
+            hist_radial += hr
+            print(f"  Progress: {i}/{len(jobs)} chunks")
+    finally:
+        if workers != 1:
+            pool.shutdown()
+
+    lag = np.arange(1, max_lag + 1)
+    msd = pd.DataFrame({
+        "LAG": lag,
+        "TAU": lag * frame_interval,
+        "MSD": num[1:] / cnt[1:],
+        "N_PAIRS": cnt[1:].astype(np.int64),
+    })
+    cosines = pd.DataFrame({
+        "BIN_LEFT": COS_BINS[:-1],
+        "BIN_RIGHT": COS_BINS[1:],
+        "COS_WAVE": hist_wave,
+        "RADIAL_COS": hist_radial,
+    })
+    return msd, cosines
+
+
+def observed_cosines(kin, *, frame_interval=1.0):
+    """COS_WAVE and RADIAL_COS histograms of single-frame edges, binned like `simulate_ensemble`."""
+    step = kin[np.isclose(kin["DT"], frame_interval)]
+    return pd.DataFrame({
+        "BIN_LEFT": COS_BINS[:-1],
+        "BIN_RIGHT": COS_BINS[1:],
+        "COS_WAVE": np.histogram(step["COS_WAVE"].dropna(), COS_BINS)[0],
+        "RADIAL_COS": np.histogram(step["RADIAL_COS"].dropna(), COS_BINS)[0],
+    })
+
+
+def compare_ensemble(sim_msd, sim_cosines, obs_msd, obs_cosines, *, min_pairs=10):
+    """
+    Distances between a simulated ensemble and the observed statistics.
+
+    Returns:
+        MSD_LOG_RMSE (RMS of log10(simulated / observed) MSD over shared lags with at
+        least `min_pairs` observed pairs), ALPHA_OBSERVED and ALPHA_SIMULATED
+        (`kinematics.msd_exponent` over those lags), and the Wasserstein distances
+        COS_WAVE_W1 and RADIAL_COS_W1 between the cosine histograms
+    """
+    both = obs_msd[obs_msd["N_PAIRS"] >= min_pairs].merge(sim_msd, on="LAG", suffixes=("_OBS", "_SIM"))
+    both = both[(both["MSD_OBS"] > 0) & (both["MSD_SIM"] > 0)]
+    rmse = float(np.sqrt(np.mean(np.log10(both["MSD_SIM"] / both["MSD_OBS"]) ** 2))) if len(both) else np.nan
+    max_lag = int(both["LAG"].max()) if len(both) else None
+    centers = (COS_BINS[:-1] + COS_BINS[1:]) / 2
+    out = {
+        "MSD_LOG_RMSE": rmse,
+        "ALPHA_OBSERVED": msd_exponent(obs_msd, max_lag=max_lag, min_pairs=min_pairs)[0],
+        "ALPHA_SIMULATED": msd_exponent(sim_msd, max_lag=max_lag, min_pairs=min_pairs)[0],
+    }
+    for col in ("COS_WAVE", "RADIAL_COS"):
+        w_obs, w_sim = obs_cosines[col].to_numpy(), sim_cosines[col].to_numpy()
+        out[f"{col}_W1"] = (
+            wasserstein_distance(centers, centers, w_obs, w_sim) if w_obs.sum() and w_sim.sum() else np.nan
+        )
+    return out
+
+
+def compare_hypotheses(
+    kin, spots, *, hypotheses=tuple(HYPOTHESES), by="track", window=300, frame_interval=1.0,
+    wave=WAVE_DIRECTION, centroid=SLUG_CENTROID, n_cells=10000, n_steps=None, max_lag=None,
+    chunk_size=2000, workers=1, seed=0,
+):
+    """
+    Fit, simulate and score each drift hypothesis against the observed data.
+
+    Returns:
+        Tuple of (summary, fits, msd, cosines). summary has one row per hypothesis with
+        the `compare_ensemble` distances and median fitted parameters. fits, msd and
+        cosines stack the per-hypothesis tables with a HYPOTHESIS column; msd and
+        cosines also include "observed"
+    """
+    obs_cos = observed_cosines(kin, frame_interval=frame_interval)
+    obs_msd = None
+    rows, fits, msds, coss = [], [], [], []
+    for i, name in enumerate(hypotheses, 1):
+        print(f"Hypothesis {i}/{len(hypotheses)}: {name}")
+        fit = fit_motility(kin, by=by, window=window, drift=HYPOTHESES[name], frame_interval=frame_interval,
+                           wave=wave, centroid=centroid)
+        msd, cos = simulate_ensemble(
+            fit, kin, n_cells=n_cells, n_steps=n_steps, max_lag=max_lag, frame_interval=frame_interval,
+            wave=wave, centroid=centroid, chunk_size=chunk_size, workers=workers, seed=seed,
+        )
+        if obs_msd is None:
+            obs_msd = track_msd(spots, max_lag=int(msd["LAG"].max()), frame_interval=frame_interval)
+        med = fit[["PHI", "PERSISTENCE", "DRIFT_WAVE", "DRIFT_CENTROID", "SPEED_SD"]].median()
+        rows.append({"HYPOTHESIS": name, **compare_ensemble(msd, cos, obs_msd, obs_cos),
+                     **{f"MEDIAN_{c}": v for c, v in med.items()}})
+        fits.append(fit.assign(HYPOTHESIS=name))
+        msds.append(msd.assign(HYPOTHESIS=name))
+        coss.append(cos.assign(HYPOTHESIS=name))
+
+    if obs_msd is not None:
+        msds.insert(0, obs_msd.assign(HYPOTHESIS="observed"))
+    coss.insert(0, obs_cos.assign(HYPOTHESIS="observed"))
+    return pd.DataFrame(rows), pd.concat(fits, ignore_index=True), \
+        pd.concat(msds, ignore_index=True), pd.concat(coss, ignore_index=True)
+
+
+def _build_parser():
+    p = argparse.ArgumentParser(
+        description="Fit persistent random walk / Langevin models and test drift hypotheses by simulation."
+    )
+    p.add_argument("--spots", "-s", required=True, help="Path to TrackMate spots CSV")
+    p.add_argument("--edges", "-e", required=True, help="Path to TrackMate edges CSV")
+    p.add_argument("--output-dir", "-o", required=True, help="Folder for the output CSVs")
+    p.add_argument("--by", choices=("track", "window", "all"), default="track", help="Fit grouping (default: track)")
+    p.add_argument("--window", type=int, default=300, help="Frames per window for --by window (default: 300)")
+    p.add_argument("--hypotheses", nargs="+", choices=tuple(HYPOTHESES), default=list(HYPOTHESES),
+                   help="Drift hypotheses to test (default: all)")
+    p.add_argument("--n-cells", type=int, default=10000, help="Simulated cells per hypothesis (default: 10000)")
+    p.add_argument("--n-steps", type=int, default=None, help="Steps per cell (default: median track span)")
+    p.add_argument("--max-lag", type=int, default=None, help="Largest MSD lag (default: --n-steps)")
+    p.add_argument("--frame-interval", type=float, default=1.0, help="Time per frame (default: 1)")
+    p.add_argument("--chunk-size", type=int, default=2000, help="Cells per simulated chunk (default: 2000)")
+    p.add_argument("--workers", type=int, default=1, help="Worker processes, 0 for all CPUs (default: 1)")
+    p.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    return p
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    out = Path(args.output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    spots = read_trackmate_csv(args.spots)
+    kin = edge_kinematics(read_trackmate_csv(args.edges), spots, frame_interval=args.frame_interval)
+    summary, fits, msd, cosines = compare_hypotheses(
+        kin, spots, hypotheses=args.hypotheses, by=args.by, window=args.window,
+        frame_interval=args.frame_interval, n_cells=args.n_cells, n_steps=args.n_steps, max_lag=args.max_lag,
+        chunk_size=args.chunk_size, workers=args.workers or None, seed=args.seed,
+    )
+    fits.to_csv(out / "motility_fit.csv", index=False)
+    msd.to_csv(out / "motility_msd.csv", index=False)
+    cosines.to_csv(out / "motility_cosines.csv", index=False)
+    summary.to_csv(out / "motility_summary.csv", index=False)
+    print(summary.to_string(index=False))
+    print(f"Saved motility models: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,361 @@
+"""
+Fast track-overlay videos rendered from TrackMate spots/edges tables.
+
+Every edge becomes one trail segment (source -> target position), stored in
+flat arrays sorted by the movie frame in which the segment appears. The trail
+visible at frame t (segments that appeared in the last `trail` frames) is then
+a contiguous slice of those arrays: a sliding window that acts as one ring
+buffer shared by all tracks. This also handles TrackMate's merging and
+splitting tracks, which a per-track point list cannot represent. Segments are
+assigned a palette color (by track, by an edge feature such as SPEED, or by
+`wave_cosine`), and each frame's trails are drawn with one batched
+`cv2.polylines` call per palette color. Finished frames go through a bounded
+queue to a writer thread, so video encoding overlaps with reading and drawing.
+
+Usage:
+    python analysis/overlay.py --input movie.tif --spots spots.csv --edges edges.csv \
+        --output overlay.mp4 --color-by wave_cosine --fps 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import queue
+import sys
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from features import wave_cosine  # noqa: E402
+from preprocessor import profiling  # noqa: E402
+from preprocessor.frames import global_range, iter_frames, open_stack, to_uint8  # noqa: E402
+from trackmate import merge_edges_with_spots, read_trackmate_csv  # noqa: E402
+
+NAN_COLOR = (128, 128, 128)
+# Vertices of the spot marker polygon on the unit circle
+_MARKER = np.stack([np.cos(np.linspace(0, 2 * np.pi, 12, endpoint=False)),
+                    np.sin(np.linspace(0, 2 * np.pi, 12, endpoint=False))], axis=1)
+
+
+def _palette(cmap: str, n_colors: int) -> np.ndarray:
+    """(n_colors + 1, 3) BGR uint8 palette; the last entry is for NaN values."""
+    import matplotlib
+
+    rgba = matplotlib.colormaps[cmap](np.linspace(0, 1, n_colors))
+    bgr = np.rint(rgba[:, 2::-1] * 255).astype(np.uint8)
+    return np.vstack([bgr, np.array(NAN_COLOR, dtype=np.uint8)])
+
+
+def _color_index(values: np.ndarray, n_colors: int, vmin: float | None, vmax: float | None) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if vmin is None:
+        vmin = np.percentile(values[finite], 1) if finite.any() else 0.0
+    if vmax is None:
+        vmax = np.percentile(values[finite], 99) if finite.any() else 1.0
+    scaled = (values - vmin) / max(vmax - vmin, 1e-12)
+    idx = np.clip(np.floor(np.nan_to_num(scaled) * n_colors), 0, n_colors - 1).astype(np.int32)
+    return np.where(finite, idx, n_colors)
+
+
+def build_segments(
+    spots: pd.DataFrame,
+    edges: pd.DataFrame,
+    *,
+    color_by: str = "track",
+    cmap: str | None = None,
+    n_colors: int = 32,
+    vmin: float | None = None,
+    vmax: float | None = None,
+    pixel_size: float = 1.0,
+    offset_x: float = 0.0,
+    offset_y: float = 0.0,
+    frame_offset: int = 0,
+) -> dict:
+    """
+    Pre-index trail segments and spot markers by movie frame.
+
+    Args:
+        spots: TrackMate spots table (ID, TRACK_ID, POSITION_X/Y, FRAME, RADIUS)
+        edges: TrackMate edges table (SPOT_SOURCE_ID, SPOT_TARGET_ID, TRACK_ID, ...)
+        color_by: 'track', 'wave_cosine' or the name of an edge column (e.g. 'SPEED')
+        cmap: Matplotlib colormap (default: 'tab20' for tracks, 'coolwarm' otherwise)
+        n_colors: Palette size; features are quantized to this many colors
+        vmin, vmax: Feature range mapped onto the palette (default: 1st/99th
+            percentile, or [-1, 1] for wave_cosine)
+        pixel_size: Physical units per pixel of the tables (1 if uncalibrated)
+        offset_x, offset_y: Pixel offset of the tracked window inside the movie
+        frame_offset: Movie frame of spot FRAME 0
+
+    Returns:
+        Dict with 'seg_frame' (K,), 'seg_points' (K, 2, 2) int32, 'seg_color' (K,),
+        'spot_frame' (S,), 'spot_xy' (S, 2), 'spot_radius' (S,), 'spot_color' (S,)
+        and 'palette' (n_colors + 1, 3) BGR; segment and spot arrays are sorted by frame
+    """
+    merged = merge_edges_with_spots(edges, spots)
+    sx = merged["POSITION_X_source"].to_numpy(np.float64) / pixel_size + offset_x
+    sy = merged["POSITION_Y_source"].to_numpy(np.float64) / pixel_size + offset_y
+    tx = merged["POSITION_X_target"].to_numpy(np.float64) / pixel_size + offset_x
+    ty = merged["POSITION_Y_target"].to_numpy(np.float64) / pixel_size + offset_y
+    # A segment appears when its later endpoint is reached
+    seg_frame = np.maximum(merged["FRAME_source"], merged["FRAME_target"]).to_numpy(np.int64) + frame_offset
+
+    if color_by == "track":
+        cmap = cmap or "tab20"
+        seg_color = merged["TRACK_ID"].to_numpy(np.int64) % n_colors
+    else:
+        if color_by == "wave_cosine":
+            values = wave_cosine(tx - sx, ty - sy)
+            vmin = -1.0 if vmin is None else vmin
+            vmax = 1.0 if vmax is None else vmax
+        elif color_by in merged.columns:
+            values = merged[color_by].to_numpy(np.float64)
+        else:
+            raise ValueError(f"color_by must be 'track', 'wave_cosine' or an edge column; got {color_by!r}")
+        cmap = cmap or "coolwarm"
+        seg_color = _color_index(values, n_colors, vmin, vmax)
+
+    order = np.argsort(seg_frame, kind="stable")
+    seg_points = np.stack([np.column_stack([sx, sy]), np.column_stack([tx, ty])], axis=1)
+
+    # Spots take the color of the segment that ends on them (track starts: track color or NaN)
+    spot_color = pd.Series(seg_color, index=merged["SPOT_TARGET_ID"].to_numpy())
+    spot_color = spot_color[~spot_color.index.duplicated()]
+    colors = spots["ID"].map(spot_color)
+    if color_by == "track" and "TRACK_ID" in spots.columns:
+        colors = colors.fillna(spots["TRACK_ID"] % n_colors)
+    spot_frame = spots["FRAME"].to_numpy(np.int64) + frame_offset
+    spot_order = np.argsort(spot_frame, kind="stable")
+    radius = spots["RADIUS"].to_numpy(np.float64) if "RADIUS" in spots.columns else np.full(len(spots), 3.0)
+
+    return {
+        "seg_frame": seg_frame[order],
+        "seg_points": np.rint(seg_points[order]).astype(np.int32),
+        "seg_color": seg_color[order].astype(np.int32),
+        "spot_frame": spot_frame[spot_order],
+        "spot_xy": np.column_stack([
+            spots["POSITION_X"].to_numpy(np.float64) / pixel_size + offset_x,
+            spots["POSITION_Y"].to_numpy(np.float64) / pixel_size + offset_y,
+        ])[spot_order],
+        "spot_radius": (radius / pixel_size)[spot_order],
+        "spot_color": colors.fillna(n_colors).to_numpy(np.int32)[spot_order],
+        "palette": _palette(cmap, n_colors),
+    }
+
+
+def _draw_batched(img: np.ndarray, polylines: np.ndarray, color_idx: np.ndarray, palette: np.ndarray,
+                  *, closed: bool, thickness: int) -> None:
+    """Draw (K, V, 2) polylines with one cv2.polylines call per palette color present."""
+    if len(polylines) == 0:
+        return
+    order = np.argsort(color_idx, kind="stable")
+    colors, starts = np.unique(color_idx[order], return_index=True)
+    for c, group in zip(colors, np.split(polylines[order], starts[1:])):
+        cv2.polylines(img, list(group), isClosed=closed,
+                      color=tuple(int(v) for v in palette[c]), thickness=thickness, lineType=cv2.LINE_AA)
+
+
+class _StreamingWriter:
+    """
+    cv2.VideoWriter fed from a bounded queue on a background thread.
+
+    An exception in the thread is kept (the thread keeps draining the queue so
+    producers never block) and re-raised by the next `write` or by `close`.
+    """
+
+    def __init__(self, output_file: Path, fps: float, size: tuple, codec: str, maxsize: int = 16):
+        self.writer = cv2.VideoWriter(str(output_file), cv2.VideoWriter_fourcc(*codec), fps, size, True)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Failed to open video writer for {output_file}")
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while (frame := self.queue.get()) is not None:
+            if self.error is not None:
+                continue
+            try:
+                self.writer.write(frame)
+            except BaseException as exc:
+                self.error = exc
+
+    def _raise(self) -> None:
+        if self.error is not None:
+            raise RuntimeError("Video writer thread failed") from self.error
+
+    def write(self, frame: np.ndarray) -> None:
+        self._raise()
+        self.queue.put(frame)
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.release()
+        self._raise()
+
+
+def render_overlay(
+    tiff_file: str | Path,
+    spots: pd.DataFrame,
+    edges: pd.DataFrame,
+    output_file: str | Path,
+    *,
+    trail: int = 30,
+    fps: float = 60.0,
+    codec: str = "mp4v",
+    color_by: str = "track",
+    cmap: str | None = None,
+    vmin: float | None = None,
+    vmax: float | None = None,
+    thickness: int = 1,
+    draw_spots: bool = True,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    channel: int = 0,
+    pixel_size: float = 1.0,
+    offset_x: float = 0.0,
+    offset_y: float = 0.0,
+    frame_offset: int = 0,
+) -> Path:
+    """
+    Render a movie with track trails (and spot outlines) drawn over it.
+
+    Args:
+        tiff_file: Path to input TIFF stack or Zarr store, (T, Y, X) or (T, C, Y, X)
+        spots, edges: TrackMate spots/edges tables
+        output_file: Path to output video file
+        trail: Number of frames each trail segment stays visible
+        fps: Output frames per second (default: 60)
+        codec: Video codec (default: 'mp4v')
+        color_by: 'track', 'wave_cosine' or an edge column name (see build_segments)
+        cmap, vmin, vmax: Colormap and feature range (see build_segments)
+        thickness: Trail line thickness in pixels
+        draw_spots: Also outline the spots of the current frame
+        start_frame, end_frame: Movie frame range to render
+        channel: Channel for (T, C, Y, X) stacks
+        pixel_size, offset_x, offset_y, frame_offset: Map table coordinates to movie pixels/frames
+
+    Returns:
+        Path to output video file
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    index = build_segments(
+        spots, edges, color_by=color_by, cmap=cmap, vmin=vmin, vmax=vmax, pixel_size=pixel_size,
+        offset_x=offset_x, offset_y=offset_y, frame_offset=frame_offset,
+    )
+    seg_frame, spot_frame, palette = index["seg_frame"], index["spot_frame"], index["palette"]
+    print(f"Indexed {len(seg_frame)} trail segments and {len(spot_frame)} spots")
+
+    stack = open_stack(tiff_file)
+    height, width = stack.shape[-2], stack.shape[-1]
+    value_range = None if stack.dtype in (np.uint8, np.uint16) else global_range(stack)
+    frames = range(*slice(start_frame, end_frame).indices(stack.shape[0]))
+    writer = _StreamingWriter(output_file, fps, (width, height), codec)
+
+    try:
+        for i, (t, frame) in enumerate(iter_frames(
+            tiff_file, start_frame=start_frame, end_frame=end_frame, channel=channel
+        )):
+            with profiling.span("convert"):
+                img = cv2.cvtColor(to_uint8(frame, value_range), cv2.COLOR_GRAY2BGR)
+
+            with profiling.span("draw"):
+                # Segments that appeared in (t - trail, t] form a contiguous slice
+                lo, hi = np.searchsorted(seg_frame, [t - trail + 1, t + 1])
+                _draw_batched(img, index["seg_points"][lo:hi], index["seg_color"][lo:hi], palette,
+                              closed=False, thickness=thickness)
+                if draw_spots:
+                    lo, hi = np.searchsorted(spot_frame, [t, t + 1])
+                    outlines = (index["spot_xy"][lo:hi, None, :]
+                                + index["spot_radius"][lo:hi, None, None] * _MARKER[None])
+                    _draw_batched(img, np.rint(outlines).astype(np.int32), index["spot_color"][lo:hi],
+                                  palette, closed=True, thickness=1)
+
+            with profiling.span("encode"):
+                writer.write(img)
+
+            if (i + 1) % 100 == 0:
+                print(f"  Progress: {i+1}/{len(frames)} frames")
+    finally:
+        writer.close()
+
+    print(f"Saved overlay video: {output_file}")
+    return output_file
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Render track trails from TrackMate spots/edges tables over a movie."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
+    p.add_argument("--spots", "-s", required=True, help="Path to TrackMate spots CSV")
+    p.add_argument("--edges", "-e", required=True, help="Path to TrackMate edges CSV")
+    p.add_argument("--output", "-o", required=True, help="Path to output video file")
+    p.add_argument("--trail", type=int, default=30, help="Trail length in frames (default: 30)")
+    p.add_argument("--fps", type=float, default=60.0, help="Output frames per second (default: 60)")
+    p.add_argument("--codec", default="mp4v", help="Video codec (default: 'mp4v')")
+    p.add_argument(
+        "--color-by", default="track",
+        help="'track', 'wave_cosine' or an edge column such as SPEED (default: track)",
+    )
+    p.add_argument("--cmap", default=None, help="Matplotlib colormap")
+    p.add_argument("--vmin", type=float, default=None)
+    p.add_argument("--vmax", type=float, default=None)
+    p.add_argument("--thickness", type=int, default=1, help="Trail thickness in pixels")
+    p.add_argument("--no-spots", action="store_true", help="Do not outline the current spots")
+    p.add_argument("--start-frame", type=int, default=None)
+    p.add_argument("--end-frame", type=int, default=None)
+    p.add_argument("--channel", type=int, default=0, help="Channel for (T,C,Y,X) stacks")
+    p.add_argument("--pixel-size", type=float, default=1.0)
+    p.add_argument("--offset-x", type=float, default=0.0, help="Window X offset in the movie")
+    p.add_argument("--offset-y", type=float, default=0.0, help="Window Y offset in the movie")
+    p.add_argument("--frame-offset", type=int, default=0, help="Movie frame of spot FRAME 0")
+    p.add_argument(
+        "--profile", default=None, metavar="TRACE_JSON",
+        help="Write a per-stage timing/memory trace (Chrome trace JSON) to this path",
+    )
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    render_overlay(
+        args.input,
+        read_trackmate_csv(args.spots),
+        read_trackmate_csv(args.edges),
+        args.output,
+        trail=args.trail,
+        fps=args.fps,
+        codec=args.codec,
+        color_by=args.color_by,
+        cmap=args.cmap,
+        vmin=args.vmin,
+        vmax=args.vmax,
+        thickness=args.thickness,
+        draw_spots=not args.no_spots,
+        start_frame=args.start_frame,
+        end_frame=args.end_frame,
+        channel=args.channel,
+        pixel_size=args.pixel_size,
+        offset_x=args.offset_x,
+        offset_y=args.offset_y,
+        frame_offset=args.frame_offset,
+    )
+    if args.profile:
+        profiling.write_trace(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,347 @@
+"""
+Trajectory smoothing before derivative features (velocity, acceleration).
+
+Frame-to-frame velocities are noisy, and finite-difference accelerations
+(e.g. `a_radial` in `pages/analysis.md`) mostly amplify that noise. This module
+smooths every track at once and adds smoothed position, velocity and
+acceleration columns to the spots table.
+
+Tracks are first cut into segments. When edges are given, a segment is an
+unbranched chain of linked spots (branches of `lineage.build_lineage`),
+otherwise it is a TRACK_ID. A segment is also cut wherever the frame gap
+exceeds `max_gap`. Smaller gaps are bridged by the smoother. Methods:
+
+- "savgol": Savitzky-Golay local polynomial fits. Fits are weighted by a
+  presence mask, so missing frames and segment ends just shorten the window.
+  All segments are laid end to end (separated by empty frames) and the local
+  moments come from a few 1D correlations over that single array.
+- "kalman": Rauch-Tung-Striebel smoother with a constant-acceleration model,
+  run on padded batches of similar-length segments. The time loop is
+  vectorized over segments and axes; missing frames skip the update step.
+- "spline": robust penalized spline (Whittaker smoother, Eilers 2003; robust
+  weights after Garcia 2010). It uses a difference penalty of order
+  `penalty_order` on the frame grid. All segments go into one sparse banded
+  system, and Tukey bisquare reweighting iterations damp outlier detections.
+
+Positions stay in the units of the spots table. Derivatives are per
+`frame_interval` time units.
+
+Usage:
+    python analysis/smoothing.py --spots spots.csv --edges edges.csv --output smoothed.csv --method kalman
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.ndimage import correlate1d
+from scipy.sparse.linalg import splu
+
+from features import SLUG_CENTROID, radial_components
+from trackmate import read_trackmate_csv
+
+METHODS = ("savgol", "kalman", "spline")
+
+SMOOTH_COLUMNS = (
+    "SEGMENT", "SMOOTH_X", "SMOOTH_Y", "SMOOTH_VX", "SMOOTH_VY", "SMOOTH_AX", "SMOOTH_AY",
+    "SMOOTH_SPEED", "SMOOTH_V_RADIAL", "SMOOTH_A_RADIAL",
+)
+
+
+def _segments(spots, edges, max_gap):
+    """Segment id and frame offset within the segment, for spots sorted by (segment, frame)."""
+    if edges is not None:
+        from lineage import build_lineage
+
+        lin = build_lineage(spots, edges, infer_merges=False, infer_splits=False)
+        chain = lin.branch_of(spots["ID"].to_numpy(np.int64))
+    else:
+        chain = spots["TRACK_ID"].to_numpy(np.int64)
+        if pd.DataFrame({"c": chain, "f": spots["FRAME"].to_numpy()}).duplicated().any():
+            raise ValueError("Tracks have several spots per frame (merges/splits); pass edges to split them")
+
+    frame = spots["FRAME"].to_numpy(np.int64)
+    order = np.lexsort((frame, chain))
+    chain, frame = chain[order], frame[order]
+    new = np.r_[True, (chain[1:] != chain[:-1]) | (np.diff(frame) > max_gap)]
+    seg = np.cumsum(new) - 1
+    starts = np.flatnonzero(new)
+    first = frame[starts]
+    span = frame[np.r_[starts[1:], len(frame)] - 1] - first + 1
+    return order, seg, frame - first[seg], span
+
+
+def _estimate_noise(xy, seg, rel):
+    """Localization noise from second differences of consecutive detections (std per axis)."""
+    if len(xy) < 3:
+        return 1.0
+    ok = (seg[:-2] == seg[2:]) & (rel[2:] - rel[:-2] == 2)
+    if not ok.any():
+        return 1.0
+    d2 = xy[2:][ok] - 2 * xy[1:-1][ok] + xy[:-2][ok]
+    sigma = 1.4826 * np.median(np.abs(d2)) / np.sqrt(6)
+    return float(sigma) if sigma > 0 else 1.0
+
+
+def _segment_gradient(z, first, last):
+    """d/dframe along the last axis of a flat layout; one-sided at segment ends."""
+    nxt = np.concatenate([z[..., 1:], z[..., -1:]], axis=-1)
+    prv = np.concatenate([z[..., :1], z[..., :-1]], axis=-1)
+    g = (nxt - prv) / 2
+    g[..., first] = (nxt - z)[..., first]
+    g[..., last] = (z - prv)[..., last]
+    g[..., first & last] = np.nan
+    return g
+
+
+def _savgol(xy, seg, rel, span, *, window, polyorder):
+    if window % 2 == 0 or window <= polyorder:
+        raise ValueError(f"window must be odd and larger than polyorder, got {window} and {polyorder}")
+    h = window // 2
+    # Segments end to end with h empty frames between them, so windows never mix segments
+    offset = np.r_[0, np.cumsum(span + h)][:-1] + h
+    pos = offset[seg] + rel
+    n = offset[-1] + span[-1] + h
+    mask = np.zeros(n)
+    mask[pos] = 1.0
+    values = np.zeros((2, n))
+    values[:, pos] = xy.T
+
+    k = np.arange(-h, h + 1, dtype=np.float64)
+    d = polyorder
+    s = np.stack([correlate1d(mask, k ** p, mode="constant")[pos] for p in range(2 * d + 1)], axis=1)
+    t = np.stack([correlate1d(values, k ** p, axis=-1, mode="constant")[:, pos].T for p in range(d + 1)], axis=1)
+    a = s[:, np.add.outer(np.arange(d + 1), np.arange(d + 1))]
+
+    out = np.full((len(xy), 3, 2), np.nan)
+    out[:, 0] = xy
+    ok = s[:, 0] >= d + 1  # enough detections in the window for the fit
+    coef = np.linalg.solve(a[ok], t[ok])
+    out[ok, 0] = coef[:, 0]
+    out[ok, 1] = coef[:, 1]
+    if d >= 2:
+        out[ok, 2] = 2 * coef[:, 2]
+    return out
+
+
+def _kalman(xy, seg, rel, span, *, measurement_std, process_std, batch_size):
+    f = np.array([[1.0, 1.0, 0.5], [0.0, 1.0, 1.0], [0.0, 0.0, 1.0]])
+    q = process_std ** 2 * np.array([[1 / 20, 1 / 8, 1 / 6], [1 / 8, 1 / 3, 1 / 2], [1 / 6, 1 / 2, 1.0]])
+    r2 = measurement_std ** 2
+    prior = 1e6 * (r2 + 1.0)
+
+    # Renumber segments by length so each batch pads to a similar width
+    rank = np.empty(len(span), dtype=np.int64)
+    rank[np.argsort(span, kind="stable")] = np.arange(len(span))
+    by_rank = np.argsort(rank[seg], kind="stable")
+    bounds = np.searchsorted(rank[seg][by_rank], np.arange(0, len(span) + batch_size, batch_size))
+    span_sorted = np.sort(span)
+
+    out = np.empty((len(xy), 3, 2))
+    for b in range(0, len(span), batch_size):
+        idx = by_rank[bounds[b // batch_size]:bounds[b // batch_size + 1]]
+        row = rank[seg[idx]] - b
+        lengths = span_sorted[b:b + batch_size]
+        n_rows, width = len(lengths), int(lengths.max())
+        obs = np.zeros((n_rows, width, 2))
+        mask = np.zeros((n_rows, width))
+        obs[row, rel[idx]] = xy[idx]
+        mask[row, rel[idx]] = 1.0
+
+        x = np.zeros((n_rows, 3, 2))
+        p = np.broadcast_to(np.eye(3) * prior, (n_rows, 3, 3)).copy()
+        x_pred = np.empty((n_rows, width, 3, 2))
+        p_pred = np.empty((n_rows, width, 3, 3))
+        x_filt = np.empty((n_rows, width, 3, 2))
+        p_filt = np.empty((n_rows, width, 3, 3))
+        for t in range(width):
+            if t > 0:
+                x = f @ x
+                p = f @ p @ f.T + q
+            x_pred[:, t], p_pred[:, t] = x, p
+            gain = p[:, :, 0] / (p[:, 0, 0] + r2)[:, None] * mask[:, t, None]
+            x = x + gain[:, :, None] * (obs[:, t] - x[:, 0])[:, None, :]
+            p = p - gain[:, :, None] * p[:, None, 0, :]
+            x_filt[:, t], p_filt[:, t] = x, p
+
+        smooth = np.empty_like(x_filt)
+        smooth[:, -1] = x = x_filt[:, -1]
+        for t in range(width - 2, -1, -1):
+            active = (t < lengths - 1)[:, None, None]
+            c = p_filt[:, t] @ f.T @ np.linalg.inv(np.where(active, p_pred[:, t + 1], np.eye(3)))
+            x = np.where(active, x_filt[:, t] + c @ (x - x_pred[:, t + 1]), x_filt[:, t])
+            smooth[:, t] = x
+        out[idx] = smooth[row, rel[idx]]
+    return out
+
+
+def _spline(xy, seg, rel, span, *, lam, penalty_order, robust_iter):
+    offset = np.r_[0, np.cumsum(span)][:-1]
+    pos = offset[seg] + rel
+    n = int(span.sum())
+    seg_flat = np.repeat(np.arange(len(span)), span)
+    values = np.zeros((n, 2))
+    values[pos] = xy
+
+    d = sparse.eye(n, format="csr")
+    for _ in range(penalty_order):
+        d = d[1:] - d[:-1]
+    if n > penalty_order:
+        d = d[seg_flat[:-penalty_order] == seg_flat[penalty_order:]]  # no penalty across segments
+    penalty = lam * (d.T @ d) + 1e-10 * sparse.eye(n)
+
+    weight = np.ones(len(xy))
+    for it in range(robust_iter + 1):
+        w = np.zeros(n)
+        w[pos] = weight
+        z = splu((sparse.diags(w) + penalty).tocsc(), permc_spec="NATURAL").solve(w[:, None] * values)
+        if it == robust_iter:
+            break
+        resid = np.hypot(*(xy - z[pos]).T)
+        scale = np.median(resid) / 1.1774  # median of a 2D Gaussian's radial residual
+        if scale <= 0:
+            break
+        u = resid / (4.685 * scale)
+        # Floored so a rejected spot still pins segments too short for the penalty
+        weight = np.where(u < 1, (1 - u ** 2) ** 2, 0.0).clip(1e-3, None)
+
+    first = np.zeros(n, dtype=bool)
+    first[offset] = True
+    last = np.zeros(n, dtype=bool)
+    last[offset + span - 1] = True
+    vel = _segment_gradient(z.T, first, last)
+    acc = _segment_gradient(vel, first, last)
+    out = np.stack([z[pos], vel.T[pos], acc.T[pos]], axis=1)
+    out[span[seg] <= penalty_order, 1:] = np.nan  # no penalty, so no derivative across holes
+    return out
+
+
+def smooth_tracks(
+    spots,
+    edges=None,
+    *,
+    method="savgol",
+    frame_interval=1.0,
+    max_gap=2,
+    window=7,
+    polyorder=2,
+    measurement_std=None,
+    process_std=None,
+    lam=100.0,
+    penalty_order=3,
+    robust_iter=3,
+    centroid=SLUG_CENTROID,
+    batch_size=256,
+):
+    """
+    Smoothed positions, velocities and accelerations for every tracked spot.
+
+    Args:
+        spots: Spots table with ID, TRACK_ID, FRAME, POSITION_X, POSITION_Y
+        edges: Edges table; tracks are then split into unbranched chains at merges and
+            splits. Required when a track has several spots per frame
+        method: "savgol", "kalman" or "spline"
+        frame_interval: Time per frame; velocities and accelerations are per this unit
+        max_gap: Largest frame difference bridged inside a segment
+        window, polyorder: Savitzky-Golay window (frames, odd) and polynomial order
+        measurement_std: Kalman localization noise per axis (default: estimated from
+            second differences of consecutive detections)
+        process_std: Kalman jerk noise per frame (default: measurement_std / 10)
+        lam: Spline smoothing strength; larger is smoother
+        penalty_order: Spline difference penalty order (3 keeps accelerations smooth)
+        robust_iter: Spline bisquare reweighting iterations (0 for a plain penalized
+            spline)
+        centroid: Centre for the radial velocity/acceleration columns
+
+    Returns:
+        Tracked spots with SEGMENT, SMOOTH_X, SMOOTH_Y, SMOOTH_VX, SMOOTH_VY, SMOOTH_AX,
+        SMOOTH_AY, SMOOTH_SPEED, SMOOTH_V_RADIAL and SMOOTH_A_RADIAL (d V_RADIAL / dt).
+        Derivatives are NaN where a segment is too short
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    out = spots[spots["TRACK_ID"].notna()].copy()
+    if len(out) == 0:
+        return out.assign(**{c: pd.Series(dtype=np.float64) for c in SMOOTH_COLUMNS})
+
+    order, seg, rel, span = _segments(out, edges, max_gap)
+    xy = out[["POSITION_X", "POSITION_Y"]].to_numpy(np.float64)[order]
+    if method == "savgol":
+        res = _savgol(xy, seg, rel, span, window=window, polyorder=polyorder)
+    elif method == "kalman":
+        if measurement_std is None:
+            measurement_std = _estimate_noise(xy, seg, rel)
+        if process_std is None:
+            process_std = measurement_std / 10
+        res = _kalman(
+            xy, seg, rel, span, measurement_std=measurement_std, process_std=process_std, batch_size=batch_size
+        )
+    else:
+        res = _spline(xy, seg, rel, span, lam=lam, penalty_order=penalty_order, robust_iter=robust_iter)
+
+    smoothed = np.empty_like(res)
+    smoothed[order] = res
+    segment = np.empty(len(seg), dtype=np.int64)
+    segment[order] = seg
+    x, y = smoothed[:, 0, 0], smoothed[:, 0, 1]
+    vx, vy = smoothed[:, 1, 0] / frame_interval, smoothed[:, 1, 1] / frame_interval
+    ax, ay = smoothed[:, 2, 0] / frame_interval ** 2, smoothed[:, 2, 1] / frame_interval ** 2
+
+    r, v_radial, v_tangential, _ = radial_components(x, y, vx, vy, centroid)
+    _, a_radial, _, _ = radial_components(x, y, ax, ay, centroid)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # d/dt (v . r_hat) = a . r_hat + v_tangential^2 / r
+        a_radial = a_radial + v_tangential ** 2 / r
+
+    out["SEGMENT"] = segment
+    out["SMOOTH_X"], out["SMOOTH_Y"] = x, y
+    out["SMOOTH_VX"], out["SMOOTH_VY"] = vx, vy
+    out["SMOOTH_AX"], out["SMOOTH_AY"] = ax, ay
+    out["SMOOTH_SPEED"] = np.hypot(vx, vy)
+    out["SMOOTH_V_RADIAL"] = v_radial
+    out["SMOOTH_A_RADIAL"] = a_radial
+    return out
+
+
+def _build_parser():
+    p = argparse.ArgumentParser(description="Smooth all tracks and add position/velocity/acceleration columns.")
+    p.add_argument("--spots", "-s", required=True, help="Path to TrackMate spots CSV")
+    p.add_argument("--edges", "-e", default=None, help="Path to TrackMate edges CSV (splits tracks at merges/splits)")
+    p.add_argument("--output", "-o", required=True, help="Output CSV (spots plus SMOOTH_* columns)")
+    p.add_argument("--method", choices=METHODS, default="savgol", help="Smoother (default: savgol)")
+    p.add_argument("--frame-interval", type=float, default=1.0, help="Time per frame (default: 1)")
+    p.add_argument("--max-gap", type=int, default=2, help="Largest frame gap bridged in a segment (default: 2)")
+    p.add_argument("--window", type=int, default=7, help="Savitzky-Golay window in frames (default: 7)")
+    p.add_argument("--polyorder", type=int, default=2, help="Savitzky-Golay polynomial order (default: 2)")
+    p.add_argument("--measurement-std", type=float, default=None, help="Kalman localization noise")
+    p.add_argument("--process-std", type=float, default=None, help="Kalman jerk noise per frame")
+    p.add_argument("--lam", type=float, default=100.0, help="Spline smoothing strength (default: 100)")
+    p.add_argument("--robust-iter", type=int, default=3, help="Spline reweighting iterations (default: 3)")
+    return p
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    spots = read_trackmate_csv(args.spots)
+    edges = read_trackmate_csv(args.edges) if args.edges else None
+    out = smooth_tracks(
+        spots,
+        edges,
+        method=args.method,
+        frame_interval=args.frame_interval,
+        max_gap=args.max_gap,
+        window=args.window,
+        polyorder=args.polyorder,
+        measurement_std=args.measurement_std,
+        process_std=args.process_std,
+        lam=args.lam,
+        robust_iter=args.robust_iter,
+    )
+    out.to_csv(args.output, index=False)
+    print(f"Smoothed {len(out)} spots in {out['SEGMENT'].nunique()} segments ({args.method})")
+    print(f"Saved: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
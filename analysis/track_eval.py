@@ -0,0 +1,471 @@
+"""
+Tracking accuracy against ground-truth trajectories.
+
+Compares a predicted tracking (TrackMate AKT, `tiff_tracker.py` export, ...)
+to a ground truth, both as TrackMate-schema spots tables with optional edges:
+
+- CLEAR MOT: MOTA, MOTP (mean matched distance), ID switches, mostly
+  tracked/lost. Each frame is matched with a Hungarian assignment on a gated
+  distance matrix, preferring to continue last frame's matches (as in
+  TrackEval).
+- IDF1: the one-to-one identity mapping that maximises the number of frames
+  in which matched identities are within the gate.
+- HOTA: detection/association/localisation accuracy averaged over similarity
+  thresholds alpha = 0.05..0.95, with similarity 1 - distance / max_dist.
+- Merge/split correctness: merge and split events of the two lineages
+  (`lineage.build_lineage`, TrackMate links only) are paired within
+  `event_dist` and `event_frames`. A paired event is correct when its
+  parent (merge) or child (split) branches map, through the IDF1 mapping, to
+  exactly the ground-truth ones.
+
+Identities are lineage branches (unbranched chains) when both edges tables
+are given, so a merge ends the two incoming identities rather than counting
+as a switch. Otherwise identities are TRACK_IDs. Spots without a track are
+single-frame identities.
+
+Long movies are cut into frame chunks for the stateless work, which runs in
+parallel: gated pair statistics (for the HOTA global alignment and IDF1),
+then the per-frame HOTA matching. CLEAR MOT matching depends on the previous
+frame's matches, so it runs in one sequential pass over all frames. The
+results therefore do not depend on the chunk size.
+
+Usage:
+    python analysis/track_eval.py --gt-spots gt_spots.csv --gt-edges gt_edges.csv \
+        --pred-spots pred_spots.csv --pred-edges pred_edges.csv --max-dist 10 --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from lineage import build_lineage
+from trackmate import read_trackmate_csv
+
+HOTA_ALPHAS = np.linspace(0.05, 0.95, 19)
+_EPS = np.finfo(np.float64).eps
+
+
+class _Tracking:
+    """Spots sorted by frame with dense identities, plus the lineage when edges are given."""
+
+    def __init__(self, spots: pd.DataFrame, edges: pd.DataFrame | None, identity: str, scale: float = 1.0):
+        spots = spots.sort_values(["FRAME", "ID"], kind="stable")
+        self.spot_id = spots["ID"].to_numpy(np.int64)
+        self.frame = spots["FRAME"].to_numpy(np.int64)
+        self.xy = spots[["POSITION_X", "POSITION_Y"]].to_numpy(np.float64) * scale
+        self.lineage = build_lineage(spots, edges, infer_merges=False, infer_splits=False) \
+            if edges is not None else None
+
+        if identity == "branch":
+            raw = self.lineage.branch_of(self.spot_id).astype(np.int64)
+        else:
+            track = spots["TRACK_ID"].to_numpy(np.float64)
+            raw = np.where(np.isnan(track), -1, np.nan_to_num(track)).astype(np.int64)
+        lone = raw < 0
+        raw[lone] = raw.max(initial=-1) + 1 + np.arange(lone.sum())
+        self.raw_ids, self.ident = np.unique(raw, return_inverse=True)
+        self.n_ids = len(self.raw_ids)
+
+    def chunk(self, lo: int, hi: int) -> tuple:
+        """(frame, ident, xy) for frames lo <= FRAME < hi."""
+        a, b = np.searchsorted(self.frame, [lo, hi])
+        return self.frame[a:b], self.ident[a:b], self.xy[a:b]
+
+    def position(self, spot_ids) -> np.ndarray:
+        order = np.argsort(self.spot_id)
+        return self.xy[order[np.searchsorted(self.spot_id, spot_ids, sorter=order)]]
+
+    def branch_ident(self, branches) -> np.ndarray:
+        """Dense identity of lineage branches (identity='branch' only)."""
+        return np.searchsorted(self.raw_ids, branches)
+
+
+def _frames(frame: np.ndarray) -> tuple:
+    """Unique frames and their [start, end) row bounds in a frame-sorted array."""
+    values, starts = np.unique(frame, return_index=True)
+    return values, starts, np.r_[starts[1:], len(frame)]
+
+
+def _distances(g_xy: np.ndarray, p_xy: np.ndarray) -> np.ndarray:
+    return np.sqrt(((g_xy[:, None, :] - p_xy[None, :, :]) ** 2).sum(-1))
+
+
+def _pair_stats(gt: tuple, pred: tuple, n_pred: int, max_dist: float) -> tuple:
+    """
+    Gated (gt, pred) identity pairs in a chunk.
+
+    Returns:
+        Tuple of (pair keys gt * n_pred + pred, frames within the gate,
+        summed HOTA alignment terms s / (sum_row s + sum_col s - s))
+    """
+    (g_frame, g_id, g_xy), (p_frame, p_id, p_xy) = gt, pred
+    g_vals, g_lo, g_hi = _frames(g_frame)
+    p_vals, p_lo, p_hi = _frames(p_frame)
+    _, gi, pi = np.intersect1d(g_vals, p_vals, return_indices=True)
+    keys, terms = [], []
+    for a, b in zip(gi, pi):
+        gs, ps = slice(g_lo[a], g_hi[a]), slice(p_lo[b], p_hi[b])
+        sim = np.clip(1 - _distances(g_xy[gs], p_xy[ps]) / max_dist, 0, None)
+        r, c = np.nonzero(sim > 0)
+        if not len(r):
+            continue
+        row, col = sim.sum(1), sim.sum(0)
+        keys.append(g_id[gs][r] * n_pred + p_id[ps][c])
+        terms.append(sim[r, c] / (row[r] + col[c] - sim[r, c]))
+    if not keys:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+    u, inv = np.unique(np.concatenate(keys), return_inverse=True)
+    return u, np.bincount(inv), np.bincount(inv, np.concatenate(terms))
+
+
+def _clear_mot(gt: tuple, pred: tuple, n_gt: int, max_dist: float) -> dict:
+    """
+    Sequential CLEAR MOT matching over all frames.
+
+    Each frame is a Hungarian assignment in which continuing last frame's
+    match outweighs any distance, so the state must flow through every frame
+    in order.
+    """
+    (g_frame, g_id, g_xy), (p_frame, p_id, p_xy) = gt, pred
+    g_vals, g_lo, g_hi = _frames(g_frame)
+    p_vals, p_lo, p_hi = _frames(p_frame)
+    _, gi, pi = np.intersect1d(g_vals, p_vals, return_indices=True)
+
+    prev_pred = np.full(n_gt, -1, dtype=np.int64)
+    prev_frame = np.full(n_gt, np.iinfo(np.int64).min, dtype=np.int64)
+    last_pred = np.full(n_gt, -1, dtype=np.int64)
+    matched = np.zeros(n_gt, dtype=np.int64)
+    tp = switches = 0
+    dist_sum = 0.0
+
+    for a, b in zip(gi, pi):
+        f = g_vals[a]
+        gs, ps = slice(g_lo[a], g_hi[a]), slice(p_lo[b], p_hi[b])
+        gid, pid = g_id[gs], p_id[ps]
+        dist = _distances(g_xy[gs], p_xy[ps])
+        gate = dist < max_dist
+        if not gate.any():
+            continue
+        keep = (prev_frame[gid] == f - 1)[:, None] & (pid[None, :] == prev_pred[gid][:, None])
+        score = np.where(gate, 1000.0 * keep + 1 - dist / max_dist + _EPS, 0.0)
+        r, c = linear_sum_assignment(score, maximize=True)
+        ok = score[r, c] > 0
+        r, c = r[ok], c[ok]
+        mg, mp = gid[r], pid[c]
+        prev_pred[mg], prev_frame[mg] = mp, f
+        tp += len(r)
+        dist_sum += float(dist[r, c].sum())
+        matched[mg] += 1
+        switches += int(((last_pred[mg] >= 0) & (last_pred[mg] != mp)).sum())
+        last_pred[mg] = mp
+    return {"tp": tp, "switches": switches, "dist_sum": dist_sum, "matched": matched}
+
+
+def _hota_chunk(gt: tuple, pred: tuple, n_pred: int, max_dist: float,
+                pair_keys: np.ndarray, alignment: np.ndarray) -> tuple:
+    """
+    Per-frame HOTA matching in a chunk (stateless across frames).
+
+    Returns:
+        Tuple of (matched pair keys, their similarities)
+    """
+    (g_frame, g_id, g_xy), (p_frame, p_id, p_xy) = gt, pred
+    g_vals, g_lo, g_hi = _frames(g_frame)
+    p_vals, p_lo, p_hi = _frames(p_frame)
+    _, gi, pi = np.intersect1d(g_vals, p_vals, return_indices=True)
+    keys, sims = [], []
+    for a, b in zip(gi, pi):
+        gs, ps = slice(g_lo[a], g_hi[a]), slice(p_lo[b], p_hi[b])
+        gid, pid = g_id[gs], p_id[ps]
+        sim = np.clip(1 - _distances(g_xy[gs], p_xy[ps]) / max_dist, 0, None)
+        rr, cc = np.nonzero(sim > 0)
+        if not len(rr):
+            continue
+        # Similarity weighted by the global alignment of the two identities
+        score = np.zeros_like(sim)
+        score[rr, cc] = alignment[np.searchsorted(pair_keys, gid[rr] * n_pred + pid[cc])] * sim[rr, cc]
+        r, c = linear_sum_assignment(score, maximize=True)
+        ok = score[r, c] > 0
+        keys.append(gid[r[ok]] * n_pred + pid[c[ok]])
+        sims.append(sim[r[ok], c[ok]])
+    if not keys:
+        return np.empty(0, np.int64), np.empty(0)
+    return np.concatenate(keys), np.concatenate(sims)
+
+
+def _identity_mapping(keys: np.ndarray, hits: np.ndarray, n_pred: int) -> tuple:
+    """
+    IDF1 mapping: one-to-one gt/pred identities maximising co-located frames.
+
+    The bipartite graph is split into connected components, each solved with
+    a dense Hungarian assignment.
+
+    Returns:
+        Tuple of (IDTP, pred -> gt identity array with -1 for unmapped)
+    """
+    gi, pi = keys // n_pred, keys % n_pred
+    g_u, g_inv = np.unique(gi, return_inverse=True)
+    p_u, p_inv = np.unique(pi, return_inverse=True)
+    n_g = len(g_u)
+    graph = coo_matrix((np.ones(len(keys)), (g_inv, n_g + p_inv)), shape=(n_g + len(p_u),) * 2)
+    _, label = connected_components(graph, directed=False)
+    mapping = np.full(n_pred, -1, dtype=np.int64)
+    idtp = 0
+    order = np.argsort(label[g_inv], kind="stable")
+    bounds = np.flatnonzero(np.diff(np.r_[-1, label[g_inv][order], -2]))
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        e = order[lo:hi]
+        rows, r_inv = np.unique(g_inv[e], return_inverse=True)
+        cols, c_inv = np.unique(p_inv[e], return_inverse=True)
+        w = np.zeros((len(rows), len(cols)))
+        w[r_inv, c_inv] = hits[e]
+        r, c = linear_sum_assignment(w, maximize=True)
+        ok = w[r, c] > 0
+        idtp += int(w[r[ok], c[ok]].sum())
+        mapping[p_u[cols[c[ok]]]] = g_u[rows[r[ok]]]
+    return idtp, mapping
+
+
+def _event_table(track: _Tracking, kind: str) -> pd.DataFrame:
+    """Merge or split events with their position and partner branches."""
+    lin = track.lineage
+    if kind == "merge":
+        ev = lin.merge_events()
+        spot = lin.first_spot[ev["BRANCH"].to_numpy()]
+        partners = [lin.parents(b) for b in ev["BRANCH"]]
+    else:
+        ev = lin.split_events()
+        spot = lin.last_spot[ev["BRANCH"].to_numpy()]
+        partners = [lin.children(b) for b in ev["BRANCH"]]
+    xy = track.position(spot) if len(spot) else np.empty((0, 2))
+    return ev.assign(X=xy[:, 0], Y=xy[:, 1], PARTNERS=partners)
+
+
+def _match_events(gt: _Tracking, pred: _Tracking, mapping: np.ndarray | None, *,
+                  kind: str, event_dist: float, event_frames: int) -> dict:
+    """Pair gt and predicted events in space and time; count those with the right partners."""
+    g, p = _event_table(gt, kind), _event_table(pred, kind)
+    matched = correct = 0
+    if len(g) and len(p):
+        dist = _distances(g[["X", "Y"]].to_numpy(), p[["X", "Y"]].to_numpy())
+        dt = np.abs(g["FRAME"].to_numpy()[:, None] - p["FRAME"].to_numpy()[None, :])
+        gate = (dist <= event_dist) & (dt <= event_frames)
+        score = np.where(gate, 2 * event_dist - dist, 0.0)
+        r, c = linear_sum_assignment(score, maximize=True)
+        ok = gate[r, c]
+        matched = int(ok.sum())
+        if mapping is not None:
+            for i, j in zip(r[ok], c[ok]):
+                want = set(gt.branch_ident(g["PARTNERS"].iat[i]).tolist())
+                got = set(mapping[pred.branch_ident(p["PARTNERS"].iat[j])].tolist())
+                correct += want == got
+    precision = matched / len(p) if len(p) else np.nan
+    recall = matched / len(g) if len(g) else np.nan
+    return {
+        "EVENT": kind,
+        "N_GT": len(g),
+        "N_PRED": len(p),
+        "MATCHED": matched,
+        "CORRECT": correct if mapping is not None else np.nan,
+        "PRECISION": precision,
+        "RECALL": recall,
+        "F1": 2 * matched / (len(g) + len(p)) if len(g) + len(p) else np.nan,
+    }
+
+
+def evaluate_tracking(
+    gt_spots: pd.DataFrame,
+    pred_spots: pd.DataFrame,
+    gt_edges: pd.DataFrame | None = None,
+    pred_edges: pd.DataFrame | None = None,
+    *,
+    max_dist: float | None = None,
+    identity: str | None = None,
+    pred_scale: float = 1.0,
+    chunk_frames: int = 200,
+    workers: int | None = 1,
+    event_dist: float | None = None,
+    event_frames: int = 2,
+) -> tuple:
+    """
+    Score a predicted tracking against ground truth.
+
+    Args:
+        gt_spots, pred_spots: TrackMate spots tables (ID, FRAME, POSITION_X/Y, TRACK_ID)
+        gt_edges, pred_edges: TrackMate edges tables; both are needed for
+            branch identities and merge/split scoring
+        max_dist: Gate distance in ground-truth units (default: mean
+            ground-truth RADIUS)
+        identity: 'branch' (lineage branches; default when both edges tables
+            are given) or 'track' (TRACK_ID)
+        pred_scale: Multiply predicted positions by this, e.g. the pixel size
+            when the prediction is in pixels and the ground truth in microns
+        chunk_frames: Frames per parallel chunk; results do not depend on it
+        workers: Worker processes; None uses every CPU, 1 runs serially
+        event_dist: Max distance between paired merge/split events
+            (default: 2 * max_dist)
+        event_frames: Max frame difference between paired events
+
+    Returns:
+        Tuple of (metrics dict, events DataFrame with one row per event kind)
+    """
+    has_edges = gt_edges is not None and pred_edges is not None
+    identity = identity or ("branch" if has_edges else "track")
+    if identity not in ("branch", "track"):
+        raise ValueError(f"identity must be 'branch' or 'track'; got {identity!r}")
+    if identity == "branch" and not has_edges:
+        raise ValueError("identity='branch' needs both edges tables")
+    if max_dist is None:
+        if "RADIUS" not in gt_spots.columns:
+            raise ValueError("max_dist is required when the ground truth has no RADIUS column")
+        max_dist = float(gt_spots["RADIUS"].mean())
+    event_dist = 2 * max_dist if event_dist is None else event_dist
+
+    gt = _Tracking(gt_spots, gt_edges if has_edges else None, identity)
+    pred = _Tracking(pred_spots, pred_edges if has_edges else None, identity, pred_scale)
+    n_gt, n_pred = gt.n_ids, pred.n_ids
+    first = int(min(gt.frame.min(initial=0), pred.frame.min(initial=0)))
+    last = int(max(gt.frame.max(initial=0), pred.frame.max(initial=0)))
+    bounds = [(lo, min(lo + chunk_frames, last + 1)) for lo in range(first, last + 1, chunk_frames)]
+
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count()) if workers != 1 else None
+    run = pool.map if pool else map
+    try:
+        # Pass 1: gated pair statistics
+        stats = list(run(
+            _pair_stats, [gt.chunk(lo, hi) for lo, hi in bounds], [pred.chunk(lo, hi) for lo, hi in bounds],
+            [n_pred] * len(bounds), [max_dist] * len(bounds),
+        ))
+        keys = np.concatenate([s[0] for s in stats])
+        pair_keys, inv = np.unique(keys, return_inverse=True)
+        hits = np.bincount(inv, np.concatenate([s[1] for s in stats])).astype(np.int64)
+        potential = np.bincount(inv, np.concatenate([s[2] for s in stats]))
+        gt_count = np.bincount(gt.ident, minlength=n_gt)
+        pred_count = np.bincount(pred.ident, minlength=n_pred)
+        gi, pi = pair_keys // n_pred, pair_keys % n_pred
+        alignment = potential / (gt_count[gi] + pred_count[pi] - potential)
+
+        # Pass 2: per-frame HOTA matching in parallel, CLEAR MOT sequentially alongside
+        hota = run(
+            _hota_chunk, [gt.chunk(lo, hi) for lo, hi in bounds], [pred.chunk(lo, hi) for lo, hi in bounds],
+            [n_pred] * len(bounds), [max_dist] * len(bounds), [pair_keys] * len(bounds), [alignment] * len(bounds),
+        )
+        clear = _clear_mot(gt.chunk(first, last + 1), pred.chunk(first, last + 1), n_gt, max_dist)
+        chunks = []
+        for i, result in enumerate(hota, 1):
+            chunks.append(result)
+            print(f"  Progress: {i}/{len(bounds)} chunks")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    # CLEAR MOT
+    n_gt_dets, n_pred_dets = len(gt.ident), len(pred.ident)
+    tp, switches, dist_sum = clear["tp"], clear["switches"], clear["dist_sum"]
+    ratio = clear["matched"] / np.maximum(gt_count, 1)
+
+    # HOTA over similarity thresholds
+    hota_keys = np.concatenate([c[0] for c in chunks])
+    hota_sims = np.concatenate([c[1] for c in chunks])
+    det_a, ass_a, loc_a = [], [], []
+    for alpha in HOTA_ALPHAS:
+        sel = hota_sims >= alpha - _EPS
+        a_tp = int(sel.sum())
+        u, cnt = np.unique(hota_keys[sel], return_counts=True)
+        ass = cnt / (gt_count[u // n_pred] + pred_count[u % n_pred] - cnt)
+        det_a.append(a_tp / max(1, n_gt_dets + n_pred_dets - a_tp))
+        ass_a.append((cnt * ass).sum() / max(1, a_tp))
+        loc_a.append(hota_sims[sel].sum() / max(1, a_tp))
+    det_a, ass_a = np.array(det_a), np.array(ass_a)
+
+    idtp, mapping = _identity_mapping(pair_keys, hits, n_pred)
+    metrics = {
+        "IDENTITY": identity,
+        "MAX_DIST": max_dist,
+        "GT_DETS": n_gt_dets,
+        "PRED_DETS": n_pred_dets,
+        "GT_IDS": n_gt,
+        "PRED_IDS": n_pred,
+        "TP": tp,
+        "FP": n_pred_dets - tp,
+        "FN": n_gt_dets - tp,
+        "ID_SWITCHES": switches,
+        "MOTA": 1 - (n_gt_dets - tp + n_pred_dets - tp + switches) / max(1, n_gt_dets),
+        "MOTP": dist_sum / tp if tp else np.nan,
+        "MOSTLY_TRACKED": int((ratio >= 0.8).sum()),
+        "MOSTLY_LOST": int((ratio < 0.2).sum()),
+        "IDF1": 2 * idtp / max(1, n_gt_dets + n_pred_dets),
+        "IDP": idtp / max(1, n_pred_dets),
+        "IDR": idtp / max(1, n_gt_dets),
+        "HOTA": float(np.sqrt(det_a * ass_a).mean()),
+        "DET_A": float(det_a.mean()),
+        "ASS_A": float(ass_a.mean()),
+        "LOC_A": float(np.mean(loc_a)),
+    }
+
+    events = pd.DataFrame([
+        _match_events(gt, pred, mapping if identity == "branch" else None,
+                      kind=kind, event_dist=event_dist, event_frames=event_frames)
+        for kind in ("merge", "split")
+    ]) if has_edges else pd.DataFrame()
+    return metrics, events
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Score a tracking (TrackMate schema) against ground truth: MOTA, IDF1, HOTA, merges/splits."
+    )
+    p.add_argument("--gt-spots", required=True, help="Ground-truth TrackMate spots CSV")
+    p.add_argument("--gt-edges", default=None, help="Ground-truth TrackMate edges CSV")
+    p.add_argument("--pred-spots", required=True, help="Predicted TrackMate spots CSV")
+    p.add_argument("--pred-edges", default=None, help="Predicted TrackMate edges CSV")
+    p.add_argument("--max-dist", type=float, default=None,
+                   help="Gate distance in ground-truth units (default: mean ground-truth RADIUS)")
+    p.add_argument("--identity", choices=("branch", "track"), default=None,
+                   help="Identities: lineage branches or TRACK_IDs (default: branch when both edges are given)")
+    p.add_argument("--pred-scale", type=float, default=1.0, help="Multiply predicted positions by this (default: 1)")
+    p.add_argument("--chunk-frames", type=int, default=200, help="Frames per parallel chunk (default: 200)")
+    p.add_argument("--workers", type=int, default=1, help="Worker processes, 0 for all CPUs (default: 1)")
+    p.add_argument("--event-frames", type=int, default=2, help="Max frame offset for paired merges/splits")
+    p.add_argument("--output-dir", "-o", default=None, help="Write track_eval.csv and track_eval_events.csv here")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    metrics, events = evaluate_tracking(
+        read_trackmate_csv(args.gt_spots),
+        read_trackmate_csv(args.pred_spots),
+        read_trackmate_csv(args.gt_edges) if args.gt_edges else None,
+        read_trackmate_csv(args.pred_edges) if args.pred_edges else None,
+        max_dist=args.max_dist,
+        identity=args.identity,
+        pred_scale=args.pred_scale,
+        chunk_frames=args.chunk_frames,
+        workers=args.workers or None,
+        event_frames=args.event_frames,
+    )
+    summary = pd.DataFrame([metrics])
+    print(summary.T.to_string(header=False))
+    if len(events):
+        print(events.to_string(index=False))
+    if args.output_dir:
+        out = Path(args.output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        summary.to_csv(out / "track_eval.csv", index=False)
+        events.to_csv(out / "track_eval_events.csv", index=False)
+        print(f"Saved evaluation: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
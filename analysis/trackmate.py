@@ -0,0 +1,54 @@
+"""
+Loaders for TrackMate CSV exports (spots, edges, tracks, branches).
+
+TrackMate writes four header rows: feature keys, full names, short names and
+units. Only the first (feature keys, e.g. POSITION_X) is kept as the header.
+"""
+import pandas as pd
+
+
+def read_trackmate_csv(path, **kwargs):
+    """
+    Read a TrackMate CSV export, keeping the feature-key header row.
+
+    Args:
+        path: Path to a `*_spots.csv`, `*_edges.csv`, `*_tracks.csv` or `*_branches.csv`
+            export
+        **kwargs: Passed through to `pandas.read_csv`
+    """
+    return pd.read_csv(path, header=0, skiprows=[1, 2, 3], **kwargs)
+
+
+def merge_edges_with_spots(edges, spots):
+    """
+    Attach source/target spot positions to each edge.
+
+    Adds POSITION_{X,Y,T}_source and POSITION_{X,Y,T}_target columns
+    (plus FRAME_* and RADIUS_* when present), matching the `merged`
+    table used throughout the analysis notebooks.
+    """
+    cols = [c for c in ("ID", "POSITION_X", "POSITION_Y", "POSITION_T", "FRAME", "RADIUS")
+            if c in spots.columns]
+    spot_pos = spots[cols]
+    merged = edges.merge(
+        spot_pos.add_suffix("_source"), left_on="SPOT_SOURCE_ID", right_on="ID_source"
+    ).merge(
+        spot_pos.add_suffix("_target"), left_on="SPOT_TARGET_ID", right_on="ID_target"
+    )
+    return merged.drop(columns=["ID_source", "ID_target"])
+
+
+def write_trackmate_csv(df, path):
+    """
+    Write a table in the TrackMate CSV layout, readable by `read_trackmate_csv`.
+
+    The three extra header rows (full names, short names, units) are filled
+    with title-cased keys and blank units.
+    """
+    names = [c.replace("_", " ").title() for c in df.columns]
+    with open(path, "w", newline="") as f:
+        f.write(",".join(df.columns) + "\n")
+        f.write(",".join(names) + "\n")
+        f.write(",".join(names) + "\n")
+        f.write("," * (len(df.columns) - 1) + "\n")
+        df.to_csv(f, header=False, index=False)
@@ -7,8 +7,8 @@ import imageio.v2 as imageio
 import numpy as np
 import matplotlib.pyplot as plt
 
-def save_gif(fig, filename, frames=36, duration=0.12, loop=0):
-    frames = []
+def save_gif(fig, filename, frames=36, duration=0.12, loop=0, output_dir="assets/img"):
+    images = []
     # Rotate camera around z-axis to create an animation (36 frames ~ one full turn)
     for angle in np.linspace(0, 360, frames):
         fig.update_layout(
@@ -23,10 +23,10 @@ def save_gif(fig, filename, frames=36, duration=0.12, loop=0):
         # Use Plotly's default engine (Kaleido) without specifying `engine=` to avoid deprecation spam
         img_bytes = fig.to_image(format="png")
         frame = imageio.imread(img_bytes, format="png")
-        frames.append(frame)
+        images.append(frame)
 
-    imageio.mimsave(f"assets/img/{filename}", frames, duration=duration, loop=0)
-    print(f"Saved GIF to assets/img/{filename}")
+    imageio.mimsave(f"{output_dir}/{filename}", images, duration=duration, loop=loop)
+    print(f"Saved GIF to {output_dir}/{filename}")
 
 # Helper function to create 3D distribution plots for any feature combination
 def plot_3d_distribution(feature1_name, feature2_name, data_df, 
@@ -533,4 +533,349 @@ def plot_interactive_acceleration_surface_3d(merged_sorted, n_time_bins=40, n_co
     print(f"Time range: {time_vals.min():.1f} to {time_vals.max():.1f}")
     print(f"Radial cosine range: {cos_vals.min():.3f} to {cos_vals.max():.3f}")
     print(f"Acceleration range: {acc_vals.min():.4f} to {acc_vals.max():.4f} μm/s²")
-    print(f"Mean acceleration per bin range: {H_acc_mean[H > 0].min():.4f} to {H_acc_mean[H > 0].max():.4f} μm/s²")
\ No newline at end of file
+    print(f"Mean acceleration per bin range: {H_acc_mean[H > 0].min():.4f} to {H_acc_mean[H > 0].max():.4f} μm/s²")
+
+# --- Rasterized aggregation for large scatter/trajectory plots -------------
+
+RASTER_REDUCTIONS = ("count", "sum", "mean", "min", "max")
+
+
+def _raster_extent(x, y, extent):
+    if extent is not None:
+        return tuple(float(v) for v in extent)
+    x0, x1, y0, y1 = np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)
+    return (float(x0), float(x1 if x1 > x0 else x0 + 1), float(y0), float(y1 if y1 > y0 else y0 + 1))
+
+
+def _raster_accumulate(acc, index, values, reduction):
+    """Add binned samples to running count/sum/extreme arrays."""
+    acc["count"] += np.bincount(index, minlength=acc["count"].size)
+    if reduction in ("sum", "mean"):
+        acc["sum"] += np.bincount(index, values, minlength=acc["sum"].size)
+    elif reduction == "min":
+        np.minimum.at(acc["ext"], index, values)
+    elif reduction == "max":
+        np.maximum.at(acc["ext"], index, values)
+
+
+def _raster_new(size, reduction):
+    if reduction not in RASTER_REDUCTIONS:
+        raise ValueError(f"Unknown reduction {reduction!r}, expected one of {RASTER_REDUCTIONS}")
+    acc = {"count": np.zeros(size, dtype=np.int64), "sum": np.zeros(size)}
+    acc["ext"] = np.full(size, np.inf if reduction == "min" else -np.inf)
+    return acc
+
+
+def _raster_finish(acc, reduction, shape):
+    count = acc["count"]
+    if reduction == "count":
+        out = count.astype(np.float64)
+    elif reduction == "sum":
+        out = np.where(count > 0, acc["sum"], np.nan)
+    elif reduction == "mean":
+        out = np.divide(acc["sum"], count, out=np.full(count.size, np.nan), where=count > 0)
+    else:
+        out = np.where(count > 0, acc["ext"], np.nan)
+    return out.reshape(shape)
+
+
+def rasterize_points(x, y, values=None, width=800, height=800, extent=None, reduction="count"):
+    """
+    Bin points into a pixel grid with a count/sum/mean/min/max reduction.
+
+    Cost is one pass over the points; the result has a fixed size, so plotting
+    it does not depend on the number of points.
+
+    Parameters
+    ----------
+    x, y : array-like
+        Point coordinates (NaNs are dropped).
+    values : array-like, optional
+        Per-point values for sum/mean/min/max (ignored for count).
+    width, height : int
+        Output resolution in pixels.
+    extent : tuple, optional
+        (x0, x1, y0, y1) covered by the grid. Default: data bounds.
+    reduction : str
+        'count', 'sum', 'mean', 'min' or 'max'. Empty pixels are 0 for count, NaN otherwise.
+
+    Returns
+    -------
+    image : ndarray
+        (height, width) array; row 0 is y0, so y increases downward as in ImageJ.
+    extent : tuple
+        The (x0, x1, y0, y1) used.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    extent = _raster_extent(x, y, extent)
+    x0, x1, y0, y1 = extent
+    ix = np.floor((x - x0) / (x1 - x0) * width)
+    iy = np.floor((y - y0) / (y1 - y0) * height)
+    # Points exactly on the far edge belong to the last pixel
+    ix[x == x1] = width - 1
+    iy[y == y1] = height - 1
+    keep = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+    vals = None
+    if reduction != "count":
+        vals = np.asarray(values, dtype=np.float64)
+        keep &= ~np.isnan(vals)
+        vals = vals[keep]
+
+    acc = _raster_new(width * height, reduction)
+    _raster_accumulate(acc, iy[keep].astype(np.int64) * width + ix[keep].astype(np.int64), vals, reduction)
+    return _raster_finish(acc, reduction, (height, width)), extent
+
+
+def rasterize_segments(x0, y0, x1, y1, values=None, width=800, height=800, extent=None,
+                       reduction="count", chunk_size=2_000_000):
+    """
+    Draw line segments into a pixel grid with a count/sum/mean/min/max reduction.
+
+    Each segment is traversed exactly through the grid: it is cut where it
+    crosses pixel boundaries, and every pixel containing a piece of nonzero
+    length gets the segment counted once. Touching a pixel only at a corner
+    does not count. For count, each pixel holds the number of segments
+    crossing it. For mean, it holds the mean value of those segments.
+    Segments are processed in chunks of about `chunk_size` pixel crossings to
+    bound memory.
+
+    Parameters
+    ----------
+    x0, y0, x1, y1 : array-like
+        Segment endpoints (e.g. POSITION_X_source ... POSITION_Y_target).
+    values : array-like, optional
+        Per-segment values for sum/mean/min/max.
+    width, height, extent, reduction :
+        As in `rasterize_points`; the default extent covers all endpoints.
+
+    Returns
+    -------
+    image : ndarray
+        (height, width) array, row 0 at y0.
+    extent : tuple
+        The (x0, x1, y0, y1) used.
+    """
+    sx0, sy0, sx1, sy1 = (np.asarray(a, dtype=np.float64) for a in (x0, y0, x1, y1))
+    extent = _raster_extent(np.r_[sx0, sx1], np.r_[sy0, sy1], extent)
+    ex0, ex1, ey0, ey1 = extent
+    vals = np.zeros(len(sx0)) if reduction == "count" else np.asarray(values, dtype=np.float64)
+    keep = ~(np.isnan(sx0) | np.isnan(sy0) | np.isnan(sx1) | np.isnan(sy1) | np.isnan(vals))
+
+    # Pixel coordinates
+    px0 = (sx0[keep] - ex0) / (ex1 - ex0) * width
+    py0 = (sy0[keep] - ey0) / (ey1 - ey0) * height
+    dpx = (sx1[keep] - ex0) / (ex1 - ex0) * width - px0
+    dpy = (sy1[keep] - ey0) / (ey1 - ey0) * height - py0
+    vals = vals[keep]
+    # Grid lines crossed along each axis; a segment visits nx + ny + 1 pixels
+    fx0, fy0 = np.floor(px0), np.floor(py0)
+    nx = np.abs(np.floor(px0 + dpx) - fx0).astype(np.int64)
+    ny = np.abs(np.floor(py0 + dpy) - fy0).astype(np.int64)
+    n = nx + ny + 2  # cut points: both ends plus every crossing
+
+    acc = _raster_new(width * height, reduction)
+    ends = np.cumsum(n)
+    bounds = np.searchsorted(ends, np.arange(0, ends[-1] if len(ends) else 0, chunk_size), side="right")
+    bounds = np.unique(np.r_[0, bounds, len(n)])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        counts = n[a:b]
+        seg = np.repeat(np.arange(a, b), counts)
+        j = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts)
+        # Cut parameters t in [0, 1]: j = 0 and j = n - 1 are the ends, then x crossings, then y crossings
+        kx, ky = j - 1, j - 1 - nx[seg]
+        bx = np.where(dpx[seg] > 0, fx0[seg] + 1 + kx, fx0[seg] - kx)
+        by = np.where(dpy[seg] > 0, fy0[seg] + 1 + ky, fy0[seg] - ky)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(kx < nx[seg], (bx - px0[seg]) / dpx[seg], (by - py0[seg]) / dpy[seg])
+        t = np.where(j == 0, 0.0, np.where(j == n[seg] - 1, 1.0, t))
+        order = np.lexsort((t, seg))
+        seg, t = seg[order], t[order]
+        # Each piece between consecutive cuts lies in one pixel; classify it by its midpoint
+        piece = (seg[1:] == seg[:-1]) & ((t[1:] - t[:-1] > 1e-12) | (n[seg[1:]] == 2))
+        s_idx = seg[1:][piece]
+        mid = (t[1:][piece] + t[:-1][piece]) / 2
+        mx = px0[s_idx] + mid * dpx[s_idx]
+        my = py0[s_idx] + mid * dpy[s_idx]
+        # Pieces lying on the far edge of the extent belong to the last pixel
+        ix = np.where(mx == width, width - 1, np.floor(mx))
+        iy = np.where(my == height, height - 1, np.floor(my))
+        flat = (iy * width + ix).astype(np.int64)
+        first = np.r_[True, (s_idx[1:] != s_idx[:-1]) | (flat[1:] != flat[:-1])]
+        inside = first & (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+        _raster_accumulate(acc, flat[inside], vals[s_idx[inside]], reduction)
+    return _raster_finish(acc, reduction, (height, width)), extent
+
+
+def plot_raster(image, extent, ax=None, cmap="viridis", log=None, title="", xlabel="X", ylabel="Y",
+                colorbar_label="Count", aspect="equal", filename=None):
+    """
+    Render a rasterized aggregate with matplotlib, keeping ImageJ orientation (y down).
+
+    Parameters
+    ----------
+    image, extent :
+        Output of `rasterize_points` / `rasterize_segments`.
+    ax : matplotlib Axes, optional
+        Draw into this axes instead of a new figure (no plt.show()).
+    log : bool, optional
+        Log color scale. Default: True for non-negative images (counts).
+    aspect : str or float
+        Passed to `imshow`; "equal" for spatial maps, "auto" when the axes
+        have different units (e.g. frame vs distance).
+    filename : str, optional
+        Save the figure to this path.
+    """
+    from matplotlib.colors import LogNorm
+
+    finite = image[np.isfinite(image)]
+    if log is None:
+        log = finite.size > 0 and finite.min() >= 0
+    shown = np.where(image > 0, image, np.nan) if log else image
+    norm = LogNorm(vmin=max(np.nanmin(shown), 1e-12), vmax=np.nanmax(shown)) if log and np.isfinite(shown).any() else None
+
+    own = ax is None
+    if own:
+        fig, ax = plt.subplots(figsize=(10, 10 * image.shape[0] / image.shape[1]))
+    x0, x1, y0, y1 = extent
+    im = ax.imshow(shown, extent=(x0, x1, y1, y0), origin="upper", cmap=cmap, norm=norm,
+                   interpolation="nearest", aspect=aspect)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.figure.colorbar(im, ax=ax, shrink=0.8, label=colorbar_label)
+    if filename:
+        ax.figure.savefig(filename, dpi=150, bbox_inches="tight")
+        print(f"Saved raster plot to {filename}")
+    if own:
+        plt.tight_layout()
+        plt.show()
+    return ax
+
+
+def plot_edge_positions_raster(merged, color_by=None, reduction="mean", width=1000, height=1000,
+                               extent=None, cmap="viridis", filename=None):
+    """
+    Edge positions (EDGE_X vs EDGE_Y) as a density or mean-value image.
+
+    Raster replacement for the edge_x_vs_edge_y scatter; each pixel shows the
+    edge count or, with `color_by`, the `reduction` of that column.
+    """
+    if "EDGE_X" in merged.columns:
+        x, y = merged["EDGE_X"].values, merged["EDGE_Y"].values
+    else:
+        x = ((merged["POSITION_X_source"] + merged["POSITION_X_target"]) / 2).values
+        y = ((merged["POSITION_Y_source"] + merged["POSITION_Y_target"]) / 2).values
+    values = merged[color_by].values if color_by else None
+    reduction = reduction if color_by else "count"
+    image, extent = rasterize_points(x, y, values, width=width, height=height, extent=extent, reduction=reduction)
+    label = f"{reduction} {color_by}" if color_by else "Edge count"
+    plot_raster(image, extent, cmap=cmap, title=f"Edge positions ({label})", xlabel="EDGE_X", ylabel="EDGE_Y",
+                colorbar_label=label, filename=filename)
+    print(f"Edges: {len(merged)}, pixels with data: {np.sum(np.isfinite(image) & (image != 0))} / {image.size}")
+    return image, extent
+
+
+def plot_trajectories_raster(merged, color_by=None, reduction="mean", width=1000, height=1000,
+                             extent=None, cmap="viridis", filename=None):
+    """
+    Colored-trajectory map drawn as a raster of all source->target segments.
+
+    Each pixel shows how many edges cross it or, with `color_by`
+    (e.g. 'cosine'), the `reduction` of that column over the crossing edges.
+    """
+    values = merged[color_by].values if color_by else None
+    reduction = reduction if color_by else "count"
+    image, extent = rasterize_segments(
+        merged["POSITION_X_source"].values, merged["POSITION_Y_source"].values,
+        merged["POSITION_X_target"].values, merged["POSITION_Y_target"].values,
+        values, width=width, height=height, extent=extent, reduction=reduction,
+    )
+    label = f"{reduction} {color_by}" if color_by else "Edges crossing pixel"
+    plot_raster(image, extent, cmap=cmap, title=f"Trajectories ({label})", xlabel="POSITION_X",
+                ylabel="POSITION_Y", colorbar_label=label, filename=filename)
+    print(f"Edges: {len(merged)}, pixels covered: {np.sum(np.isfinite(image) & (image != 0))} / {image.size}")
+    return image, extent
+
+
+def decimate_points(x, y, max_points=50_000, seed=0):
+    """
+    Level-of-detail subset of points for interactive plots.
+
+    Points are snapped to the finest quadtree level (of a 4096 x 4096 grid over
+    the data) that has at most `max_points` occupied cells. One random point is
+    kept per cell, so sparse regions keep all their points while dense regions
+    are thinned.
+
+    Returns
+    -------
+    ndarray
+        Sorted indices of the kept points (all points if there are few enough).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if len(valid) <= max_points:
+        return valid
+    x0, x1, y0, y1 = _raster_extent(x[valid], y[valid], None)
+    levels = 12
+    ix = np.minimum(((x[valid] - x0) / (x1 - x0) * (1 << levels)).astype(np.int64), (1 << levels) - 1)
+    iy = np.minimum(((y[valid] - y0) / (y1 - y0) * (1 << levels)).astype(np.int64), (1 << levels) - 1)
+    order = np.random.default_rng(seed).permutation(len(valid))
+    ix, iy = ix[order], iy[order]
+
+    # Binary search for the finest level whose occupied cells fit the budget
+    lo, hi = 0, levels
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if len(np.unique(((ix >> mid) << levels) | (iy >> mid))) <= max_points:
+            hi = mid
+        else:
+            lo = mid + 1
+    _, first = np.unique(((ix >> lo) << levels) | (iy >> lo), return_index=True)
+    return np.sort(valid[order[first]])
+
+
+def plot_interactive_raster(x, y, values=None, reduction="count", width=400, height=400, max_points=20_000,
+                            hover=None, title="", xlabel="X", ylabel="Y"):
+    """
+    Interactive Plotly view of a large point set: aggregated heatmap plus a
+    decimated point layer (see `decimate_points`) for hover inspection.
+
+    Parameters
+    ----------
+    x, y, values, reduction, width, height :
+        As in `rasterize_points`; width/height set the heatmap resolution.
+    max_points : int
+        Budget of individual points drawn on top of the heatmap (0 for none).
+    hover : dict, optional
+        Extra per-point arrays shown on hover, e.g. {'TRACK_ID': ...}.
+    """
+    image, (x0, x1, y0, y1) = rasterize_points(x, y, values, width=width, height=height, reduction=reduction)
+    if reduction == "count":
+        image = np.where(image > 0, np.log10(np.where(image > 0, image, 1)), np.nan)
+        colorbar = "log10(count)"
+    else:
+        colorbar = reduction
+    xc = x0 + (np.arange(width) + 0.5) * (x1 - x0) / width
+    yc = y0 + (np.arange(height) + 0.5) * (y1 - y0) / height
+
+    traces = [go.Heatmap(x=xc, y=yc, z=image, colorscale="Viridis", colorbar=dict(title=colorbar),
+                         hoverongaps=False)]
+    if max_points:
+        keep = decimate_points(x, y, max_points=max_points)
+        hover = hover or {}
+        custom = np.column_stack([np.asarray(v)[keep] for v in hover.values()]) if hover else None
+        template = "".join(f"{k}: %{{customdata[{i}]}}<br>" for i, k in enumerate(hover))
+        traces.append(go.Scattergl(
+            x=np.asarray(x)[keep], y=np.asarray(y)[keep], mode="markers",
+            marker=dict(size=3, color="white", opacity=0.35), customdata=custom,
+            hovertemplate=f"x: %{{x:.1f}}<br>y: %{{y:.1f}}<br>{template}<extra></extra>", name="points",
+        ))
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(title=title, xaxis_title=xlabel, yaxis_title=ylabel, width=900, height=800)
+    fig.update_yaxes(autorange="reversed", scaleanchor="x")  # ImageJ orientation
+    fig.show()
+    print(f"Points: {len(np.asarray(x))}, drawn individually: {len(keep) if max_points else 0}")
+    return fig
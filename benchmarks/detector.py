@@ -0,0 +1,170 @@
+"""
+Compare the PyTorch and ONNX Runtime YOLO detectors on the same frames.
+
+Both backends see identical uint8 BGR frames (prepared as in `tiff_tracker`).
+The script reports per-backend fps (inference only, after warm-up) and how
+well the ONNX detections agree with the PyTorch ones. Boxes are matched
+one-to-one per frame by IoU (Hungarian assignment, IoU >= threshold), and
+agreement is summarised as precision/recall of the ONNX boxes against the
+PyTorch boxes plus the mean IoU of the matched pairs.
+
+Usage:
+    python -m benchmarks.detector --input path/to/movie.tif --model yolo26n.pt --threads 8 --int8
+    python -m benchmarks.detector --synthetic 100x512x512
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from benchmarks.run import REPO_ROOT, _import_path
+from preprocessor.frames import global_range, iter_frames, open_stack, to_uint8
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, *, iou_threshold: float = 0.5) -> np.ndarray:
+    """IoUs of one-to-one matched boxes (Hungarian on IoU, pairs below threshold dropped)."""
+    if len(reference) == 0 or len(candidate) == 0:
+        return np.empty(0)
+    iou = box_iou(reference[:, :4], candidate[:, :4])
+    rows, cols = linear_sum_assignment(-iou)
+    matched = iou[rows, cols]
+    return matched[matched >= iou_threshold]
+
+
+def _load_frames(movie: str | Path, n_frames: int) -> list:
+    stack = open_stack(movie)
+    value_range = None if stack.dtype in (np.uint8, np.uint16) else global_range(stack)
+    frames = []
+    for _, frame in iter_frames(movie, end_frame=min(n_frames, stack.shape[0])):
+        frames.append(cv2.cvtColor(to_uint8(frame, value_range), cv2.COLOR_GRAY2BGR))
+    return frames
+
+
+def _timed(detect, frames: list, warmup: int) -> tuple:
+    for frame in frames[:warmup]:
+        detect(frame)
+    detections, elapsed = [], 0.0
+    for frame in frames:
+        t0 = time.perf_counter()
+        det = detect(frame)
+        elapsed += time.perf_counter() - t0
+        detections.append(det)
+    return detections, len(frames) / elapsed
+
+
+def compare_backends(
+    movie: str | Path,
+    model_path: str = "yolo26n.pt",
+    *,
+    n_frames: int = 100,
+    threads: int | None = None,
+    int8: bool = False,
+    iou_threshold: float = 0.5,
+    warmup: int = 5,
+) -> dict:
+    """
+    Run both detectors on the first `n_frames` frames and compare speed and output.
+
+    Args:
+        movie: Path to input TIFF stack or Zarr store (single channel)
+        model_path: Path to YOLO `.pt` model
+        n_frames: Number of frames to compare
+        threads: CPU threads for both backends
+        int8: Use the int8-quantized ONNX export
+        iou_threshold: Minimum IoU for two boxes to count as the same detection
+        warmup: Untimed frames run first on each backend
+
+    Returns:
+        Dict with fps per backend, speedup, detection counts, precision, recall and mean IoU
+    """
+    import torch
+    from ultralytics import YOLO
+
+    backend = _import_path(
+        "onnx_backend", REPO_ROOT / "ultralytics-trackers" / "models" / "onnx_backend.py"
+    )
+    frames = _load_frames(movie, n_frames)
+
+    if threads:
+        torch.set_num_threads(threads)
+    torch_model = YOLO(model_path)
+    torch_det, torch_fps = _timed(
+        lambda f: torch_model.predict(f, verbose=False)[0].boxes.data.cpu().numpy(), frames, warmup
+    )
+    onnx_model = backend.OnnxYOLO(model_path, threads=threads, int8=int8)
+    onnx_det, onnx_fps = _timed(onnx_model.detect, frames, warmup)
+
+    ious = [match_detections(a, b, iou_threshold=iou_threshold) for a, b in zip(torch_det, onnx_det)]
+    n_torch = sum(len(d) for d in torch_det)
+    n_onnx = sum(len(d) for d in onnx_det)
+    n_matched = sum(len(m) for m in ious)
+    return {
+        "frames": len(frames),
+        "torch_fps": torch_fps,
+        "onnx_fps": onnx_fps,
+        "speedup": onnx_fps / torch_fps,
+        "torch_detections": n_torch,
+        "onnx_detections": n_onnx,
+        "precision": n_matched / n_onnx if n_onnx else 1.0,
+        "recall": n_matched / n_torch if n_torch else 1.0,
+        "mean_iou": float(np.concatenate(ious).mean()) if n_matched else float("nan"),
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Compare fps and detection agreement of the PyTorch and ONNX Runtime YOLO backends."
+    )
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", "-i", help="Path to input TIFF movie or Zarr store")
+    src.add_argument("--synthetic", metavar="TxYxX", help="Generate a synthetic movie of this size")
+    p.add_argument("--model", "-m", default="yolo26n.pt", help="Path to YOLO model (default: yolo26n.pt)")
+    p.add_argument("--frames", type=int, default=100, help="Frames to compare (default: 100)")
+    p.add_argument("--threads", type=int, default=None, help="CPU threads for both backends")
+    p.add_argument("--int8", action="store_true", help="Use the int8-quantized ONNX export")
+    p.add_argument("--iou", type=float, default=0.5, help="IoU threshold for matching (default: 0.5)")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        movie = args.input
+        if args.synthetic:
+            from benchmarks.synthetic import make_dataset
+
+            t, y, x = (int(v) for v in args.synthetic.lower().split("x"))
+            movie = make_dataset(tmp, n_frames=t, height=y, width=x)["movie"]
+        r = compare_backends(
+            movie, args.model, n_frames=args.frames, threads=args.threads,
+            int8=args.int8, iou_threshold=args.iou,
+        )
+    print(f"Frames compared: {r['frames']}")
+    print(f"  torch: {r['torch_fps']:8.1f} fps  {r['torch_detections']} detections")
+    print(f"  onnx:  {r['onnx_fps']:8.1f} fps  {r['onnx_detections']} detections  ({r['speedup']:.2f}x)")
+    print(
+        f"  agreement @ IoU {args.iou}: precision {r['precision']:.3f}  recall {r['recall']:.3f}"
+        f"  mean IoU {r['mean_iou']:.3f}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
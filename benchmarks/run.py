@@ -0,0 +1,542 @@
+"""
+Benchmark the preprocessing, tracking and analysis stages on synthetic movies.
+
+For each movie size a synthetic trial (movie + spots/edges CSVs) is generated
+once, then every registered stage runs in its own fresh process so wall time,
+CPU time and peak RSS are measured in isolation. Results are appended to a
+JSON history (one entry per run, tagged with the git commit) and compared with
+the previous entry for the same stage and size.
+
+Usage:
+    python -m benchmarks.run --sizes small medium
+    python -m benchmarks.run --sizes 500x1024x1024 --only window tiff_to_video
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from queue import Empty
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_HISTORY = REPO_ROOT / "benchmarks" / "history.json"
+
+# (T, Y, X)
+SIZES = {
+    "small": (50, 128, 128),
+    "medium": (200, 512, 512),
+    "large": (1000, 1024, 1024),
+}
+
+BENCHMARKS = {}
+CHECKS = {}
+
+
+def benchmark(name: str, unit: str):
+    """Register `func(data, workdir) -> n_units processed` as a benchmark stage."""
+    def register(func):
+        BENCHMARKS[name] = (func, unit)
+        return func
+    return register
+
+
+def check(name: str):
+    """Register `func(data, workdir)`, raising on failure, as an untimed correctness check of a stage."""
+    def register(func):
+        CHECKS[name] = func
+        return func
+    return register
+
+
+def _import_path(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _analysis_module(name: str):
+    sys.path.insert(0, str(REPO_ROOT / "analysis"))
+    return importlib.import_module(name)
+
+
+@benchmark("window", "frames")
+def _bench_window(data, workdir):
+    from preprocessor.window import extract_window
+
+    t, y, x = data["shape"]
+    extract_window(
+        data["movie"], workdir / "window.tif",
+        start_frame=t // 4, end_frame=t, start_row=y // 4, end_row=y, start_col=x // 4, end_col=x,
+    )
+    return t - t // 4
+
+
+@benchmark("tiff_to_video", "frames")
+def _bench_tiff_to_video(data, workdir):
+    from preprocessor.tiff_to_mov import tiff_to_video
+
+    tiff_to_video(data["movie"], workdir / "movie.mp4", fps=30)
+    return data["shape"][0]
+
+
+@benchmark("to_zarr", "frames")
+def _bench_to_zarr(data, workdir):
+    from preprocessor.to_zarr import tiff_to_zarr
+
+    tiff_to_zarr(data["movie"], workdir / "movie.zarr")
+    return data["shape"][0]
+
+
+@benchmark("kymograph", "frames")
+def _bench_kymograph(data, workdir):
+    from preprocessor.kymograph import extract_kymographs
+
+    t, y, x = data["shape"]
+    lines = [[(0, 0), (x - 1, y - 1)], [(0, y - 1), (x // 2, y // 2), (x - 1, 0)]] * 4
+    extract_kymographs(data["movie"], lines)
+    return t
+
+
+@benchmark("background", "frames")
+def _bench_background(data, workdir):
+    from preprocessor.background import subtract_background
+
+    subtract_background(data["movie"], workdir / "bgsub.tif", window=21)
+    return data["shape"][0]
+
+
+@benchmark("track_tiff", "frames")
+def _bench_track_tiff(data, workdir):
+    tracker = _import_path(
+        "tiff_tracker", REPO_ROOT / "ultralytics-trackers" / "models" / "tiff_tracker.py"
+    )
+    tracker.track_tiff(data["movie"], show_display=False)
+    return data["shape"][0]
+
+
+@benchmark("track_tiff_onnx", "frames")
+def _bench_track_tiff_onnx(data, workdir):
+    tracker = _import_path(
+        "tiff_tracker", REPO_ROOT / "ultralytics-trackers" / "models" / "tiff_tracker.py"
+    )
+    tracker.track_tiff(data["movie"], show_display=False, backend="onnx")
+    return data["shape"][0]
+
+
+@benchmark("yolo_dataset", "frames")
+def _bench_yolo_dataset(data, workdir):
+    # Imported by name so worker processes can unpickle its tile writer
+    sys.path.insert(0, str(REPO_ROOT / "ultralytics-trackers" / "models"))
+    builder = importlib.import_module("yolo_dataset")
+    trackmate = _analysis_module("trackmate")
+
+    summary = builder.build_dataset(
+        data["movie"], trackmate.read_trackmate_csv(data["spots"]), workdir / "yolo", tile=256, overlap=32
+    )
+    return sum(s["frames"] for s in summary.values())
+
+
+@benchmark("spot_intensity", "spots")
+def _bench_spot_intensity(data, workdir):
+    intensity = _analysis_module("intensity")
+    trackmate = _analysis_module("trackmate")
+
+    spots = trackmate.read_trackmate_csv(data["spots"])
+    intensity.sample_spot_intensity(spots, data["movie"])
+    return len(spots)
+
+
+@benchmark("track_overlay", "frames")
+def _bench_track_overlay(data, workdir):
+    overlay = _analysis_module("overlay")
+    trackmate = _analysis_module("trackmate")
+
+    overlay.render_overlay(
+        data["movie"],
+        trackmate.read_trackmate_csv(data["spots"]),
+        trackmate.read_trackmate_csv(data["edges"]),
+        workdir / "overlay.mp4",
+        color_by="wave_cosine",
+    )
+    return data["shape"][0]
+
+
+@benchmark("lineage", "spots")
+def _bench_lineage(data, workdir):
+    lineage = _analysis_module("lineage")
+    trackmate = _analysis_module("trackmate")
+
+    spots = trackmate.read_trackmate_csv(data["spots"])
+    lin = lineage.build_lineage(spots, trackmate.read_trackmate_csv(data["edges"]))
+    for b in lin.final_aggregates(min_founders=1)["BRANCH"]:
+        lin.founders(b)
+    return len(spots)
+
+
+@benchmark("velocity_correlation", "edges")
+def _bench_velocity_correlation(data, workdir):
+    correlation = _analysis_module("correlation")
+    kinematics = _analysis_module("kinematics")
+    trackmate = _analysis_module("trackmate")
+
+    edges = trackmate.read_trackmate_csv(data["edges"])
+    kin = kinematics.edge_kinematics(edges, trackmate.read_trackmate_csv(data["spots"]))
+    frames, vx, vy, mask, cell_size = correlation.grid_edges(kin)
+    corr = correlation.spatial_correlation(frames, vx, vy, mask, cell_size=cell_size, window=25)
+    correlation.correlation_length(corr)
+    correlation.velocity_autocorrelation(kin)
+    return len(edges)
+
+
+@benchmark("smooth_tracks", "spots")
+def _bench_smooth_tracks(data, workdir):
+    smoothing = _analysis_module("smoothing")
+    trackmate = _analysis_module("trackmate")
+
+    spots = trackmate.read_trackmate_csv(data["spots"])
+    edges = trackmate.read_trackmate_csv(data["edges"])
+    for method in smoothing.METHODS:
+        smoothing.smooth_tracks(spots, edges, method=method)
+    return len(spots) * len(smoothing.METHODS)
+
+
+@benchmark("motility_ensemble", "edges")
+def _bench_motility_ensemble(data, workdir):
+    kinematics = _analysis_module("kinematics")
+    motility = _analysis_module("motility")
+    trackmate = _analysis_module("trackmate")
+
+    kin = kinematics.edge_kinematics(
+        trackmate.read_trackmate_csv(data["edges"]), trackmate.read_trackmate_csv(data["spots"])
+    )
+    fit = motility.fit_motility(kin, by="track")
+    motility.simulate_ensemble(fit, kin, n_cells=len(kin), n_steps=100)
+    return len(kin)
+
+
+def _track_eval_inputs(data):
+    import numpy as np
+
+    trackmate = _analysis_module("trackmate")
+    spots = trackmate.read_trackmate_csv(data["spots"])
+    edges = trackmate.read_trackmate_csv(data["edges"])
+    # Jittered copy with some detections dropped as the "prediction"
+    rng = np.random.default_rng(0)
+    pred = spots.sample(frac=0.95, random_state=0)
+    pred[["POSITION_X", "POSITION_Y"]] += rng.normal(0, 1.0, (len(pred), 2))
+    pred_edges = edges[edges["SPOT_SOURCE_ID"].isin(pred["ID"]) & edges["SPOT_TARGET_ID"].isin(pred["ID"])]
+    return spots, pred, edges, pred_edges
+
+
+@benchmark("track_eval", "spots")
+def _bench_track_eval(data, workdir):
+    track_eval = _analysis_module("track_eval")
+
+    spots, pred, edges, pred_edges = _track_eval_inputs(data)
+    track_eval.evaluate_tracking(spots, pred, edges, pred_edges, chunk_frames=25)
+    return len(spots)
+
+
+@check("track_eval")
+def _check_track_eval(data, workdir):
+    import numpy as np
+
+    track_eval = _analysis_module("track_eval")
+
+    # Chunking only controls parallelism; the scores must match a single chunk
+    inputs = _track_eval_inputs(data)
+    chunked, _ = track_eval.evaluate_tracking(*inputs, chunk_frames=25)
+    whole, _ = track_eval.evaluate_tracking(*inputs, chunk_frames=data["shape"][0])
+    differ = [k for k in whole if whole[k] != chunked[k]
+              and not (isinstance(whole[k], float) and np.isclose(whole[k], chunked[k], equal_nan=True))]
+    if differ:
+        raise RuntimeError(f"track_eval results depend on chunk size: {differ}")
+
+
+@benchmark("plot_3d_distribution", "edges")
+def _bench_plot_3d_distribution(data, workdir):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    utils = _analysis_module("utils")
+    trackmate = _analysis_module("trackmate")
+
+    edges = trackmate.read_trackmate_csv(data["edges"])
+    utils.plot_3d_distribution("EDGE_TIME", "SPEED", edges)
+    return len(edges)
+
+
+@benchmark("plot_trajectories_raster", "edges")
+def _bench_plot_trajectories_raster(data, workdir):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    utils = _analysis_module("utils")
+    trackmate = _analysis_module("trackmate")
+    features = _analysis_module("features")
+
+    merged = trackmate.merge_edges_with_spots(
+        trackmate.read_trackmate_csv(data["edges"]), trackmate.read_trackmate_csv(data["spots"])
+    )
+    merged["cosine"] = features.wave_cosine(
+        merged["POSITION_X_target"] - merged["POSITION_X_source"],
+        merged["POSITION_Y_target"] - merged["POSITION_Y_source"],
+    )
+    utils.plot_trajectories_raster(merged, color_by="cosine", filename=workdir / "trajectories.png")
+    utils.plot_edge_positions_raster(merged, filename=workdir / "edge_positions.png")
+    utils.decimate_points(merged["POSITION_X_source"], merged["POSITION_Y_source"], max_points=1000)
+    return len(merged)
+
+
+@benchmark("site_figures", "figures")
+def _bench_site_figures(data, workdir):
+    figures = _analysis_module("figures")
+
+    names = [n for n in figures.FIGURES if not n.endswith(".gif")]  # GIFs need Kaleido
+    sources = {"spots": data["spots"], "edges": data["edges"]}
+    figures.build_figures(sources, workdir / "figures", only=names)
+    figures.build_figures(sources, workdir / "figures", only=names)  # no-op rebuild
+    return len(names)
+
+
+@benchmark("plot_mean_velocity_cosine_3d", "edges")
+def _bench_plot_mean_velocity_cosine_3d(data, workdir):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    utils = _analysis_module("utils")
+    trackmate = _analysis_module("trackmate")
+    features = _analysis_module("features")
+
+    merged = trackmate.merge_edges_with_spots(
+        trackmate.read_trackmate_csv(data["edges"]), trackmate.read_trackmate_csv(data["spots"])
+    )
+    merged["VX"] = merged["POSITION_X_target"] - merged["POSITION_X_source"]
+    merged["VY"] = merged["POSITION_Y_target"] - merged["POSITION_Y_source"]
+    track_mean_vel = merged.groupby("TRACK_ID")[["VX", "VY"]].mean()
+    track_mean_vel["cos_mean_velocity"] = features.wave_cosine(
+        track_mean_vel["VX"], track_mean_vel["VY"]
+    )
+    utils.plot_mean_velocity_cosine_3d(track_mean_vel, merged)
+    return len(merged)
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _run_case(name: str, data: dict, workdir: str, queue) -> None:
+    """Run one benchmark in this (fresh) process and report its measurements."""
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+    func, unit = BENCHMARKS[name]
+    baseline = _peak_rss_mb()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            wall0, cpu0 = time.perf_counter(), time.process_time()
+            n = func(data, Path(workdir))
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    except ImportError as e:
+        queue.put({"status": "skipped", "reason": f"{type(e).__name__}: {e}"})
+        return
+    except Exception as e:  # report failures instead of aborting the whole run
+        queue.put({"status": "error", "reason": f"{type(e).__name__}: {e}"})
+        return
+    result = {
+        "status": "ok",
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline,
+        "units": n,
+        "unit": unit,
+        "throughput": n / wall if wall > 0 else None,
+    }
+    # Checks run after the measurements are taken, so they do not count
+    if name in CHECKS:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                CHECKS[name](data, Path(workdir))
+        except Exception as e:
+            result = {"status": "error", "reason": f"check failed: {type(e).__name__}: {e}"}
+    queue.put(result)
+
+
+def run_benchmark(name: str, data: dict, workdir: Path) -> dict:
+    """Run a registered benchmark in a spawned process so peak RSS is isolated."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(name, data, str(workdir), queue))
+    proc.start()
+    try:
+        # A child killed before reporting (OOM, native crash) must not hang the suite
+        while True:
+            try:
+                return queue.get(timeout=1.0)
+            except Empty:
+                if not proc.is_alive():
+                    break
+        try:  # its result may still be in the pipe
+            return queue.get(timeout=1.0)
+        except Empty:
+            proc.join()
+            return {"status": "error", "reason": f"worker exited with code {proc.exitcode}"}
+    finally:
+        proc.join()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_size(text: str):
+    if text in SIZES:
+        return text, SIZES[text]
+    try:
+        t, y, x = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a preset {list(SIZES)} or TxYxX; got {text!r}")
+    return text, (t, y, x)
+
+
+def _previous_results(history: list) -> dict:
+    previous = {}
+    for entry in history:
+        for r in entry["results"]:
+            if r.get("status") == "ok":
+                previous[(r["name"], r["size"], r["dtype"])] = r
+    return previous
+
+
+def run_suite(
+    sizes,
+    *,
+    only=None,
+    dtype: str = "uint16",
+    history_file: str | Path = DEFAULT_HISTORY,
+    data_dir: str | Path | None = None,
+) -> dict:
+    """
+    Generate synthetic data for each size, run each benchmark and append to the history.
+
+    Args:
+        sizes: Iterable of (label, (T, Y, X)) pairs
+        only: Optional list of benchmark names to run (default: all)
+        dtype: Synthetic movie dtype
+        history_file: JSON history to append to
+        data_dir: Where to keep generated data (default: a temporary directory)
+
+    Returns:
+        The history entry written for this run
+    """
+    from benchmarks.synthetic import make_dataset
+
+    history_file = Path(history_file)
+    history = json.loads(history_file.read_text()) if history_file.exists() else []
+    previous = _previous_results(history)
+    names = only or list(BENCHMARKS)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(data_dir or tmp)
+        for label, (t, y, x) in sizes:
+            print(f"Generating synthetic trial {label} ({t}x{y}x{x}, {dtype})...")
+            data = make_dataset(root / label, n_frames=t, height=y, width=x, dtype=dtype)
+            data = {k: str(v) if isinstance(v, Path) else v for k, v in data.items()}
+            data["shape"] = (t, y, x)
+
+            for name in names:
+                workdir = root / label / name
+                workdir.mkdir(parents=True, exist_ok=True)
+                r = run_benchmark(name, data, workdir)
+                r.update({"name": name, "size": label, "shape": [t, y, x], "dtype": dtype})
+                results.append(r)
+
+                if r["status"] != "ok":
+                    print(f"  {name:30s} {r['status']}: {r['reason']}")
+                    continue
+                line = (
+                    f"  {name:30s} {r['wall_s']:8.3f} s  {r['throughput']:10.1f} {r['unit']}/s"
+                    f"  peak {r['peak_rss_mb']:8.1f} MB"
+                )
+                prev = previous.get((name, label, dtype))
+                if prev:
+                    line += f"  ({r['wall_s'] / prev['wall_s']:.2f}x vs {prev.get('commit') or 'previous'})"
+                print(line)
+
+    commit = _git_commit()
+    for r in results:
+        r["commit"] = commit
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    history.append(entry)
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    history_file.write_text(json.dumps(history, indent=2))
+    print(f"Appended results to {history_file}")
+    return entry
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Benchmark pipeline stages on synthetic Dicty movies."
+    )
+    p.add_argument(
+        "--sizes", nargs="+", type=_parse_size, default=[_parse_size("small")],
+        help=f"Presets {list(SIZES)} or TxYxX (default: small)",
+    )
+    p.add_argument(
+        "--only", nargs="+", choices=sorted(BENCHMARKS), default=None,
+        help="Run only these benchmarks",
+    )
+    p.add_argument("--dtype", default="uint16", help="Synthetic movie dtype (default: uint16)")
+    p.add_argument(
+        "--history", default=str(DEFAULT_HISTORY),
+        help="JSON history file to append to (default: benchmarks/history.json)",
+    )
+    p.add_argument("--data-dir", default=None, help="Keep generated data here instead of a temp dir")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    run_suite(
+        args.sizes,
+        only=args.only,
+        dtype=args.dtype,
+        history_file=args.history,
+        data_dir=args.data_dir,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+"""
+Synthetic Dicty movies and TrackMate-style tables for benchmarking.
+
+Cells are Gaussian blobs that drift toward a few aggregation centres (so they
+merge as they converge) with random-walk noise, while a dark band travels
+across the field from the top-right to the bottom-left, darkening the cells it
+passes, like the Flamindo2/cAMP wave. The ground-truth trajectories are written
+as spots/edges CSVs in TrackMate's export format (four header rows), so they
+load with `analysis/trackmate.read_trackmate_csv`.
+
+Usage:
+    python -m benchmarks.synthetic --output-dir /tmp/synth --frames 200 --height 512 --width 512
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+import tifffile as tif
+from scipy.ndimage import gaussian_filter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "analysis"))
+
+from trackmate import write_trackmate_csv  # noqa: E402
+
+# Direction of wave travel in image coordinates (x right, y down): top-right -> bottom-left
+_WAVE_DIR = np.array([-0.875, 0.485]) / np.hypot(-0.875, 0.485)
+
+
+def simulate_positions(
+    n_frames: int,
+    height: int,
+    width: int,
+    *,
+    n_cells: int = 200,
+    n_centers: int = 6,
+    speed: float = 0.6,
+    noise: float = 0.8,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Simulate cell centres drifting toward the nearest aggregation centre.
+
+    Returns:
+        (T, n_cells, 2) array of (x, y) positions in pixels
+    """
+    rng = np.random.default_rng(seed)
+    size = np.array([width, height], dtype=np.float64)
+    centers = rng.uniform(0.2, 0.8, size=(n_centers, 2)) * size
+    pos = rng.uniform(0, 1, size=(n_cells, 2)) * (size - 1)
+
+    out = np.empty((n_frames, n_cells, 2))
+    for t in range(n_frames):
+        out[t] = pos
+        d = centers[None, :, :] - pos[:, None, :]
+        dist = np.hypot(d[..., 0], d[..., 1])
+        nearest = dist.argmin(axis=1)
+        step = d[np.arange(n_cells), nearest]
+        norm = np.maximum(dist[np.arange(n_cells), nearest], 1e-9)
+        # Move at `speed` toward the centre but never overshoot it
+        pos = pos + step / norm[:, None] * np.minimum(speed, norm)[:, None]
+        pos = np.clip(pos + rng.normal(0, noise, size=pos.shape), 0, size - 1)
+    return out
+
+
+def render_frame(
+    positions: np.ndarray,
+    t: int,
+    height: int,
+    width: int,
+    *,
+    cell_sigma: float = 3.0,
+    band_period: float = 60.0,
+    band_width: float = 0.15,
+    band_speed: float = 4.0,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Render one float frame in [0, ~1]: blurred cell impulses, darkened inside the band.
+    """
+    img = np.zeros((height, width), dtype=np.float32)
+    xy = np.rint(positions).astype(np.int64)
+    np.add.at(img, (xy[:, 1], xy[:, 0]), 1.0)
+    img = gaussian_filter(img, cell_sigma) * (2 * np.pi * cell_sigma ** 2) * 0.8
+
+    # Travelling band: phase of each pixel along the wave direction
+    yy, xx = np.mgrid[0:height, 0:width]
+    proj = xx * _WAVE_DIR[0] + yy * _WAVE_DIR[1]
+    phase = ((proj - band_speed * t) / band_period) % 1.0
+    dark = 1.0 - 0.7 * (phase < band_width)
+
+    img = img * dark + 0.1
+    if rng is not None:
+        img += rng.normal(0, 0.02, size=img.shape).astype(np.float32)
+    return np.clip(img, 0, 1)
+
+
+def _scale(img: np.ndarray, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return (img * np.iinfo(dtype).max).astype(dtype)
+    return img.astype(dtype)
+
+
+def write_synthetic_movie(
+    output_file: str | Path,
+    positions: np.ndarray,
+    height: int,
+    width: int,
+    *,
+    dtype="uint16",
+    seed: int = 0,
+) -> Path:
+    """
+    Render and stream a (T, Y, X) movie to a TIFF, one frame at a time.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with tif.TiffWriter(output_file, bigtiff=True) as writer:
+        for t in range(len(positions)):
+            frame = render_frame(positions[t], t, height, width, rng=rng)
+            writer.write(_scale(frame, dtype), contiguous=True)
+    return output_file
+
+
+def tracks_to_tables(
+    positions: np.ndarray, *, radius: float = 5.0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert (T, n_cells, 2) ground-truth positions to TrackMate spots/edges tables.
+    One track per cell; spot IDs are t * n_cells + cell.
+    """
+    n_frames, n_cells, _ = positions.shape
+    frame = np.repeat(np.arange(n_frames), n_cells)
+    cell = np.tile(np.arange(n_cells), n_frames)
+    ids = frame * n_cells + cell
+    x = positions[..., 0].ravel()
+    y = positions[..., 1].ravel()
+
+    spots = pd.DataFrame({
+        "LABEL": [f"ID{i}" for i in ids],
+        "ID": ids,
+        "TRACK_ID": cell,
+        "QUALITY": 1.0,
+        "POSITION_X": x,
+        "POSITION_Y": y,
+        "POSITION_Z": 0.0,
+        "POSITION_T": frame.astype(float),
+        "FRAME": frame,
+        "RADIUS": radius,
+    })
+
+    src = ids[:-n_cells] if n_frames > 1 else ids[:0]
+    tgt = src + n_cells
+    dx = x[tgt] - x[src]
+    dy = y[tgt] - y[src]
+    disp = np.hypot(dx, dy)
+    edges = pd.DataFrame({
+        "LABEL": [f"ID{s} → ID{t}" for s, t in zip(src, tgt)],
+        "TRACK_ID": src % n_cells,
+        "SPOT_SOURCE_ID": src,
+        "SPOT_TARGET_ID": tgt,
+        "LINK_COST": disp ** 2,
+        "SPEED": disp,
+        "DISPLACEMENT": disp,
+        "EDGE_TIME": src // n_cells + 0.5,
+        "EDGE_X_LOCATION": (x[src] + x[tgt]) / 2,
+        "EDGE_Y_LOCATION": (y[src] + y[tgt]) / 2,
+        "EDGE_Z_LOCATION": 0.0,
+    })
+    return spots, edges
+
+
+def make_dataset(
+    output_dir: str | Path,
+    *,
+    n_frames: int = 100,
+    height: int = 256,
+    width: int = 256,
+    n_cells: int | None = None,
+    dtype="uint16",
+    seed: int = 0,
+) -> dict:
+    """
+    Write `movie.tif`, `spots.csv` and `edges.csv` for one synthetic trial.
+
+    Args:
+        output_dir: Directory to write into
+        n_frames, height, width: Movie size (T, Y, X)
+        n_cells: Number of cells (default: scales with field area)
+        dtype: Movie dtype, e.g. 'uint8', 'uint16', 'float32'
+        seed: Random seed
+
+    Returns:
+        Dict with paths 'movie', 'spots', 'edges' and counts 'n_spots', 'n_edges'
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if n_cells is None:
+        n_cells = max(10, height * width // 1500)
+
+    positions = simulate_positions(n_frames, height, width, n_cells=n_cells, seed=seed)
+    movie = write_synthetic_movie(
+        output_dir / "movie.tif", positions, height, width, dtype=dtype, seed=seed
+    )
+    spots, edges = tracks_to_tables(positions)
+    write_trackmate_csv(spots, output_dir / "spots.csv")
+    write_trackmate_csv(edges, output_dir / "edges.csv")
+
+    return {
+        "movie": movie,
+        "spots": output_dir / "spots.csv",
+        "edges": output_dir / "edges.csv",
+        "n_spots": len(spots),
+        "n_edges": len(edges),
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Generate a synthetic Dicty movie with TrackMate-style spots/edges CSVs."
+    )
+    p.add_argument("--output-dir", "-o", required=True, help="Directory to write into")
+    p.add_argument("--frames", type=int, default=100)
+    p.add_argument("--height", type=int, default=256)
+    p.add_argument("--width", type=int, default=256)
+    p.add_argument("--cells", type=int, default=None, help="Number of cells (default: scales with area)")
+    p.add_argument("--dtype", default="uint16", help="Movie dtype (default: uint16)")
+    p.add_argument("--seed", type=int, default=0)
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    info = make_dataset(
+        args.output_dir,
+        n_frames=args.frames,
+        height=args.height,
+        width=args.width,
+        n_cells=args.cells,
+        dtype=args.dtype,
+        seed=args.seed,
+    )
+    print(f"Wrote {info['movie']} ({info['n_spots']} spots, {info['n_edges']} edges)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,191 @@
+"""
+Remove slow intensity trends (e.g. the Flamindo2/cAMP wave band) from a
+multi-frame TIFF movie with a rolling per-pixel temporal percentile filter.
+
+The background of frame t is the per-pixel percentile (median by default) of
+the `window` frames centred on t (shifted inward at the start/end of the
+movie). Frames are streamed into a (window, Y, X) ring buffer, so memory is
+O(window x frame) and every output frame costs one buffer write plus one
+fixed-size partial sort, independent of movie length. Output frames are
+written as they are produced, so thresholding downstream sees flattened frames.
+
+Expected TIFF shapes:
+- (T, Y, X)
+- (T, C, Y, X)  (one channel is processed; output is (T, Y, X))
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+import tifffile as tif
+
+from preprocessor.frames import iter_frames, open_stack, stack_shape
+
+
+def rolling_background(
+    frames: Iterator[Tuple[int, np.ndarray]],
+    n_frames: int,
+    *,
+    window: int = 41,
+    percentile: float = 50.0,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stream (frame, background) pairs using a ring buffer of `window` frames.
+
+    Args:
+        frames: Iterator of (frame index, 2D frame) pairs, e.g. from iter_frames
+        n_frames: Number of frames the iterator will yield
+        window: Number of frames in the temporal window (clipped to n_frames)
+        percentile: Per-pixel percentile used as background (50 = median)
+
+    Yields:
+        Tuples of (original frame, float32 background estimate), in frame order
+    """
+    if window < 1:
+        raise ValueError(f"window must be >= 1; got {window}")
+    if not (0.0 <= percentile <= 100.0):
+        raise ValueError(f"percentile must be in [0, 100]; got {percentile}")
+
+    window = min(window, n_frames)
+    half = window // 2
+    rank = int(round(percentile / 100.0 * (window - 1)))
+
+    buffer = None
+    scratch = None
+    background = None
+    loaded = 0  # frames [0, loaded) have been pushed into the ring buffer
+    last_lo = -1
+
+    for t in range(n_frames):
+        # Window [lo, lo + window) covers t and slides only once fully inside the movie
+        lo = min(max(t - half, 0), n_frames - window)
+        while loaded < lo + window:
+            _, frame = next(frames)
+            if buffer is None:
+                buffer = np.empty((window,) + frame.shape, dtype=np.float32)
+                scratch = np.empty_like(buffer)
+            buffer[loaded % window] = frame
+            loaded += 1
+
+        if lo != last_lo:
+            scratch[...] = buffer
+            scratch.partition(rank, axis=0)
+            background = scratch[rank].copy()
+            last_lo = lo
+
+        # Copy: the ring buffer slot is overwritten `window` frames later
+        yield buffer[t % window].copy(), background
+
+
+def subtract_background(
+    tiff_file: str | Path,
+    output_file: str | Path | None = None,
+    *,
+    window: int = 41,
+    percentile: float = 50.0,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    channel: int = 0,
+    offset: float | None = None,
+) -> Path:
+    """
+    Write a background-flattened copy of a TIFF stack.
+
+    Args:
+        tiff_file: Path to input TIFF stack
+        output_file: Path to output TIFF (default: `<input stem>_bgsub.tif` next to input)
+        window: Temporal window in frames (default: 41, ~10 minutes at 15 s/frame)
+        percentile: Per-pixel background percentile (default: 50, the median)
+        start_frame: First frame to process (default: 0)
+        end_frame: Stop before this frame (default: T)
+        channel: Channel to process for (T, C, Y, X) stacks
+        offset: Constant added after subtraction to keep values positive
+            (default: mean of the first background frame)
+
+    Returns:
+        Path to output TIFF
+    """
+    tiff_file = Path(tiff_file)
+    if output_file is None:
+        output_file = tiff_file.with_name(f"{tiff_file.stem}_bgsub.tif")
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    shape = stack_shape(tiff_file)
+    n_frames = len(range(*slice(start_frame, end_frame).indices(shape[0])))
+    if n_frames == 0:
+        raise ValueError(f"Empty frame window: [{start_frame}, {end_frame}) for T={shape[0]}")
+    dtype = open_stack(tiff_file).dtype
+
+    frames = iter_frames(
+        tiff_file, start_frame=start_frame, end_frame=end_frame, channel=channel
+    )
+    print(f"Subtracting rolling p{percentile:g} background (window={window}) from {n_frames} frames...")
+
+    with tif.TiffWriter(output_file, bigtiff=True) as writer:
+        for i, (frame, background) in enumerate(
+            rolling_background(frames, n_frames, window=window, percentile=percentile)
+        ):
+            if offset is None:
+                offset = float(background.mean())
+            flat = frame - background + offset
+            if np.issubdtype(dtype, np.integer):
+                info = np.iinfo(dtype)
+                flat = np.clip(np.rint(flat), info.min, info.max).astype(dtype)
+            writer.write(flat, contiguous=True)
+
+            if (i + 1) % 100 == 0:
+                print(f"  Progress: {i+1}/{n_frames} frames")
+
+    print(f"Saved background-subtracted stack: {output_file}")
+    return output_file
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Remove slow intensity trends with a rolling temporal percentile filter."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
+    p.add_argument(
+        "--output", "-o", default=None,
+        help="Path to output TIFF movie (default: <input>_bgsub.tif)",
+    )
+    p.add_argument(
+        "--window", "-w", type=int, default=41,
+        help="Temporal window in frames (default: 41)",
+    )
+    p.add_argument(
+        "--percentile", "-p", type=float, default=50.0,
+        help="Per-pixel background percentile (default: 50, the median)",
+    )
+    p.add_argument("--start-frame", type=int, default=None)
+    p.add_argument("--end-frame", type=int, default=None)
+    p.add_argument("--channel", type=int, default=0, help="Channel for (T,C,Y,X) stacks")
+    p.add_argument(
+        "--offset", type=float, default=None,
+        help="Constant added after subtraction (default: mean of first background)",
+    )
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    subtract_background(
+        args.input,
+        args.output,
+        window=args.window,
+        percentile=args.percentile,
+        start_frame=args.start_frame,
+        end_frame=args.end_frame,
+        channel=args.channel,
+        offset=args.offset,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+"""
+Streaming frame access for multi-frame TIFF and Zarr movies.
+
+`open_stack` is the reader abstraction every preprocessor accepts: it returns
+a lazily indexed, array-like (T, ...) movie for
+- Zarr stores written by `preprocessor.to_zarr` (only the chunks a slice
+  touches are read and decompressed),
+- uncompressed TIFFs (memory map), and
+- compressed TIFFs (page-wise decode through tifffile's Zarr interface).
+
+`iter_frames` streams frames one at a time on top of it, reading chunked
+stores a whole time-chunk at a time so each chunk is decompressed once.
+
+Expected shapes:
+- (T, Y, X)
+- (T, C, Y, X)
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+import tifffile as tif
+import zarr
+
+
+def _check_shape(shape: Tuple[int, ...]) -> None:
+    if len(shape) not in (3, 4):
+        raise ValueError(f"Expected stack shape (T,Y,X) or (T,C,Y,X); got shape={shape}")
+
+
+def is_zarr(path: str | Path) -> bool:
+    """True if `path` is a Zarr store (v2 or v3) rather than a TIFF file."""
+    path = Path(path)
+    return path.suffix == ".zarr" or (
+        path.is_dir() and any((path / f).exists() for f in ("zarr.json", ".zarray"))
+    )
+
+
+def open_stack(path: str | Path):
+    """
+    Open a TIFF or Zarr movie lazily.
+
+    Returns:
+        Array-like supporting `.shape`, `.dtype`, `.ndim` and NumPy-style slicing
+    """
+    path = Path(path)
+    if is_zarr(path):
+        return zarr.open_array(str(path), mode="r")
+    try:
+        return tif.memmap(path, mode="r")
+    except ValueError:
+        # Compressed or non-contiguous data cannot be memory-mapped
+        return zarr.open(tif.imread(path, aszarr=True), mode="r")
+
+
+def stack_shape(path: str | Path) -> Tuple[int, ...]:
+    """
+    Return the shape of a movie without reading pixel data.
+    """
+    if is_zarr(path):
+        shape = tuple(zarr.open_array(str(path), mode="r").shape)
+    else:
+        with tif.TiffFile(path) as f:
+            shape = tuple(f.series[0].shape)
+    _check_shape(shape)
+    return shape
+
+
+def global_range(stack, block: int = 64) -> Tuple[float, float]:
+    """
+    Min/max over a whole (lazily opened) stack, read `block` frames at a time.
+    """
+    lo, hi = np.inf, -np.inf
+    for t in range(0, stack.shape[0], block):
+        data = np.asarray(stack[t:t + block])
+        lo, hi = min(lo, data.min()), max(hi, data.max())
+    return lo, hi
+
+
+def to_uint8(frame: np.ndarray, value_range: Tuple[float, float] | None = None) -> np.ndarray:
+    """
+    Convert a frame to uint8 for video codecs / YOLO.
+
+    16-bit frames are divided by 256 when `value_range` is None; otherwise the
+    frame is rescaled linearly from `value_range` (e.g. from global_range) to 0-255.
+    """
+    if frame.dtype == np.uint8:
+        return np.ascontiguousarray(frame)
+    if value_range is None:
+        # 16-bit -> 8-bit
+        return (frame / 256).astype(np.uint8)
+    stack_min, stack_max = value_range
+    if stack_max > stack_min:
+        return ((frame - stack_min) / (stack_max - stack_min) * 255).astype(np.uint8)
+    return np.zeros(frame.shape, dtype=np.uint8)
+
+
+def iter_frames(
+    path,
+    *,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    channel: int | None = 0,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (frame_index, frame) pairs for a TIFF or Zarr movie in a single streaming pass.
+
+    Args:
+        path: Path to input TIFF stack or Zarr store, or a stack already opened
+            with `open_stack` (e.g. a pyramid level)
+        start_frame: First frame to yield (default: 0)
+        end_frame: Stop before this frame (default: T)
+        channel: Channel to read for (T, C, Y, X) stacks (ignored for (T, Y, X));
+            None yields each frame with all its channels, as stored
+
+    Yields:
+        Tuples of (frame index, frame array); 2D (Y, X) unless channel is None
+    """
+    if isinstance(path, (str, Path)):
+        stack, chunked = open_stack(path), is_zarr(path)
+    else:
+        stack, chunked = path, isinstance(path, zarr.Array)
+    _check_shape(stack.shape)
+    frames = range(*slice(start_frame, end_frame).indices(stack.shape[0]))
+
+    # Read whole time-chunks from chunked stores; single frames from TIFFs
+    chunks = getattr(stack, "chunks", None)
+    block = chunks[0] if chunked and chunks else 1
+
+    t = frames.start
+    while t < frames.stop:
+        stop = min((t // block + 1) * block, frames.stop)
+        data = stack[t:stop] if stack.ndim == 3 or channel is None else stack[t:stop, channel]
+        data = np.asarray(data)
+        for i in range(stop - t):
+            yield t + i, data[i]
+        t = stop
@@ -0,0 +1,202 @@
+"""
+Extract kymographs (space-time projections) along line or polyline ROIs.
+
+Each ROI is sampled at unit arc-length spacing with bilinear interpolation.
+Interpolation indices and weights for all ROIs are computed once and reused
+for every frame, so all kymographs come out of a single streaming read of
+the movie. Each output image has shape (T, L): one row per frame, one column
+per sample along the line.
+
+Expected TIFF shapes:
+- (T, Y, X)
+- (T, C, Y, X)
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import tifffile as tif
+
+from preprocessor.frames import iter_frames, open_stack, stack_shape
+
+Polyline = Sequence[Tuple[float, float]]
+
+
+def _sample_polyline(vertices: Polyline, spacing: float = 1.0) -> np.ndarray:
+    """
+    Return (L, 2) array of (x, y) sample points spaced `spacing` pixels apart
+    along the polyline, starting at the first vertex. Column i of a kymograph
+    is therefore at distance i * spacing; the last vertex is sampled only when
+    the length is a multiple of `spacing`.
+    """
+    pts = np.asarray(vertices, dtype=np.float64)
+    if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < 2:
+        raise ValueError(f"A line ROI needs at least two (x, y) vertices; got {vertices!r}")
+
+    seg_len = np.hypot(*np.diff(pts, axis=0).T)
+    cum_len = np.concatenate([[0.0], np.cumsum(seg_len)])
+    if cum_len[-1] == 0:
+        raise ValueError(f"Line ROI has zero length: {vertices!r}")
+
+    n_samples = int(np.floor(cum_len[-1] / spacing)) + 1
+    s = np.arange(n_samples) * spacing
+    x = np.interp(s, cum_len, pts[:, 0])
+    y = np.interp(s, cum_len, pts[:, 1])
+    return np.column_stack([x, y])
+
+
+def _bilinear_indices(
+    points: np.ndarray, height: int, width: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Precompute flat pixel indices (4, L) and bilinear weights (4, L) for points.
+    Points are clamped to the image so edge samples stay valid.
+    """
+    x = np.clip(points[:, 0], 0, width - 1)
+    y = np.clip(points[:, 1], 0, height - 1)
+
+    x0 = np.minimum(np.floor(x).astype(np.int64), width - 2 if width > 1 else 0)
+    y0 = np.minimum(np.floor(y).astype(np.int64), height - 2 if height > 1 else 0)
+    x1 = np.minimum(x0 + 1, width - 1)
+    y1 = np.minimum(y0 + 1, height - 1)
+    fx = x - x0
+    fy = y - y0
+
+    idx = np.stack([y0 * width + x0, y0 * width + x1, y1 * width + x0, y1 * width + x1])
+    weights = np.stack(
+        [(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy]
+    ).astype(np.float32)
+    return idx, weights
+
+
+def extract_kymographs(
+    tiff_file: str | Path,
+    lines: Sequence[Polyline],
+    *,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    channel: int = 0,
+    spacing: float = 1.0,
+) -> List[np.ndarray]:
+    """
+    Sample intensity along each line ROI for every frame in one pass.
+
+    Args:
+        tiff_file: Path to input TIFF stack
+        lines: Line/polyline ROIs, each a sequence of (x, y) vertices in pixels
+        start_frame: First frame to include (default: 0)
+        end_frame: Stop before this frame (default: T)
+        channel: Channel to sample for (T, C, Y, X) stacks
+        spacing: Distance in pixels between samples along each line
+
+    Returns:
+        List of float32 kymographs, one (T, L) array per line
+    """
+    shape = stack_shape(tiff_file)
+    n_total, height, width = shape[0], shape[-2], shape[-1]
+    frames = range(*slice(start_frame, end_frame).indices(n_total))
+    if len(frames) == 0:
+        raise ValueError(f"Empty frame window: [{start_frame}, {end_frame}) for T={n_total}")
+
+    # Precompute one gather for all lines; split back per line after sampling
+    samples = [_sample_polyline(line, spacing) for line in lines]
+    offsets = np.cumsum([0] + [len(s) for s in samples])
+    idx, weights = _bilinear_indices(np.concatenate(samples), height, width)
+
+    out = np.empty((len(frames), offsets[-1]), dtype=np.float32)
+    for row, (t, frame) in enumerate(
+        iter_frames(tiff_file, start_frame=start_frame, end_frame=end_frame, channel=channel)
+    ):
+        flat = frame.reshape(-1)
+        np.sum(flat[idx] * weights, axis=0, out=out[row])
+
+        if (row + 1) % 100 == 0:
+            print(f"  Progress: {row+1}/{len(frames)} frames")
+
+    return [out[:, offsets[i]:offsets[i + 1]] for i in range(len(samples))]
+
+
+def save_kymographs(
+    tiff_file: str | Path,
+    lines: Sequence[Polyline],
+    output_dir: str | Path | None = None,
+    **kwargs,
+) -> List[Path]:
+    """
+    Extract kymographs and write each one as a (T, L) TIFF named
+    `<input stem>_kymo<i>.tif`. Integer inputs keep their dtype.
+
+    Returns:
+        Paths to the written kymograph files
+    """
+    tiff_file = Path(tiff_file)
+    output_dir = Path(output_dir) if output_dir is not None else tiff_file.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    dtype = open_stack(tiff_file).dtype
+
+    paths = []
+    for i, kymo in enumerate(extract_kymographs(tiff_file, lines, **kwargs)):
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            kymo = np.clip(np.rint(kymo), info.min, info.max).astype(dtype)
+        path = output_dir / f"{tiff_file.stem}_kymo{i}.tif"
+        tif.imwrite(path, kymo)
+        print(f"Saved kymograph {i}: shape={kymo.shape} -> {path}")
+        paths.append(path)
+    return paths
+
+
+def _parse_line(text: str) -> List[Tuple[float, float]]:
+    values = [float(v) for v in text.split(",")]
+    if len(values) < 4 or len(values) % 2:
+        raise argparse.ArgumentTypeError(
+            f"Expected 'x0,y0,x1,y1[,x2,y2,...]'; got {text!r}"
+        )
+    return list(zip(values[0::2], values[1::2]))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Extract kymographs along line/polyline ROIs from a TIFF movie."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
+    p.add_argument(
+        "--output-dir", "-o", default=None,
+        help="Directory for kymograph TIFFs (default: next to the input)",
+    )
+    p.add_argument(
+        "--line", "-l", action="append", required=True, type=_parse_line,
+        help="Polyline ROI as 'x0,y0,x1,y1[,...]' in pixels (repeatable)",
+    )
+
+    p.add_argument("--start-frame", type=int, default=None)
+    p.add_argument("--end-frame", type=int, default=None)
+    p.add_argument("--channel", type=int, default=0, help="Channel for (T,C,Y,X) stacks")
+    p.add_argument(
+        "--spacing", type=float, default=1.0,
+        help="Sample spacing along each line in pixels (default: 1.0)",
+    )
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    save_kymographs(
+        args.input,
+        args.line,
+        args.output_dir,
+        start_frame=args.start_frame,
+        end_frame=args.end_frame,
+        channel=args.channel,
+        spacing=args.spacing,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+"""
+Lightweight per-stage timing and memory instrumentation.
+
+Code wraps stages in named spans:
+
+    from preprocessor import profiling
+
+    with profiling.span("decode") as s:
+        frame = stack[i]
+        s.add(bytes_read=frame.nbytes)
+
+Each span records wall time, CPU time, bytes read/written, the tracemalloc
+peak inside the span and the process peak RSS at exit. Spans nest. When
+profiling is disabled (the default) `span()` returns a shared no-op object,
+so instrumented loops pay only a function call and an attribute check.
+
+`write_trace()` writes the spans in Chrome trace-event format (open in
+chrome://tracing or https://ui.perfetto.dev), with a per-name summary under
+"summary".
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "counters", "mem_peak", "_t0", "_c0")
+
+    def __init__(self, profiler: "Profiler", name: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.counters = {"bytes_read": 0, "bytes_written": 0}
+        self.mem_peak = 0
+
+    def add(self, **counters) -> None:
+        """Accumulate counters such as bytes_read / bytes_written."""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        if self.profiler.trace_memory:
+            # Fold the peak so far into the parent before resetting it for this span
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self._c0 = time.process_time_ns()
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter_ns()
+        c1 = time.process_time_ns()
+        stack = self.profiler._stack
+        stack.pop()
+
+        event_args = {**self.args, **self.counters, "cpu_ms": (c1 - self._c0) / 1e6}
+        if self.profiler.trace_memory:
+            self.mem_peak = max(self.mem_peak, tracemalloc.get_traced_memory()[1])
+            event_args["tracemalloc_peak_bytes"] = self.mem_peak
+            if stack:
+                stack[-1].mem_peak = max(stack[-1].mem_peak, self.mem_peak)
+            tracemalloc.reset_peak()
+        event_args["peak_rss_bytes"] = _peak_rss_bytes()
+
+        self.profiler._record(self.name, self._t0, t1, event_args)
+        return False
+
+
+class Profiler:
+    """Collects spans; disabled until `enable()` is called."""
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.events = []
+        self._stack = []
+        self._origin_ns = time.perf_counter_ns()
+
+    def enable(self, *, trace_memory: bool = True) -> None:
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._origin_ns = time.perf_counter_ns()
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _record(self, name: str, t0: int, t1: int, args: dict) -> None:
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": (t0 - self._origin_ns) / 1e3,
+            "dur": (t1 - t0) / 1e3,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def summary(self) -> dict:
+        """Aggregate spans by name: count, total wall/CPU ms, bytes, max memory peaks."""
+        out = defaultdict(lambda: defaultdict(float))
+        for e in self.events:
+            s = out[e["name"]]
+            s["count"] += 1
+            s["wall_ms"] += e["dur"] / 1e3
+            s["cpu_ms"] += e["args"]["cpu_ms"]
+            s["bytes_read"] += e["args"].get("bytes_read", 0)
+            s["bytes_written"] += e["args"].get("bytes_written", 0)
+            for key in ("tracemalloc_peak_bytes", "peak_rss_bytes"):
+                if e["args"].get(key) is not None:
+                    s[key] = max(s[key], e["args"][key])
+        return {name: dict(s) for name, s in out.items()}
+
+    def write_trace(self, path: str | Path) -> Path:
+        """Write spans as a Chrome trace-event JSON file and print a summary."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        path.write_text(json.dumps(
+            {"traceEvents": self.events, "displayTimeUnit": "ms", "summary": summary}
+        ))
+
+        print(f"{'span':24s} {'count':>7s} {'wall ms':>10s} {'cpu ms':>10s} {'MB read':>9s} {'MB written':>10s}")
+        for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["wall_ms"]):
+            print(
+                f"{name:24s} {int(s['count']):7d} {s['wall_ms']:10.1f} {s['cpu_ms']:10.1f}"
+                f" {s['bytes_read'] / 2**20:9.1f} {s['bytes_written'] / 2**20:10.1f}"
+            )
+        print(f"Saved profile trace: {path}")
+        return path
+
+
+PROFILER = Profiler()
+
+
+def enable(*, trace_memory: bool = True) -> None:
+    """Enable the process-wide profiler."""
+    PROFILER.enable(trace_memory=trace_memory)
+
+
+def span(name: str, **args):
+    """Return a span context manager on the process-wide profiler (no-op if disabled)."""
+    if not PROFILER.enabled:
+        return _NULL_SPAN
+    return _Span(PROFILER, name, args)
+
+
+def write_trace(path: str | Path) -> Path:
+    """Write the process-wide profiler's trace to `path`."""
+    return PROFILER.write_trace(path)
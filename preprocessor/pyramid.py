@@ -0,0 +1,310 @@
+"""
+Multi-resolution pyramid cache for fast movie browsing and ROI selection.
+
+The movie is streamed once and 2x/4x/8x block-averaged levels are written to a
+Zarr group next to it (`<movie>.pyramid.zarr`). Spatial levels are built as a
+cascade (4x from 2x, 8x from 4x); with `temporal=True` level d also averages
+groups of d frames. The cache records the source size and mtime (for a Zarr
+store, of every file in it) and is rebuilt only when the movie changes.
+
+`preview()` serves any frame range / ROI from the coarsest level that still
+has at least `max_size` pixels along the ROI's longer side (and, for temporal
+pyramids, at least `max_frames` frames), falling back to full resolution.
+
+Expected shapes:
+- (T, Y, X)
+- (T, C, Y, X)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+from pathlib import Path
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+import zarr
+
+from preprocessor.frames import open_stack, to_uint8
+
+DEFAULT_FACTORS = (2, 4, 8)
+
+
+def default_cache_path(movie: str | Path) -> Path:
+    movie = Path(movie)
+    return movie.with_name(movie.name + ".pyramid.zarr")
+
+
+def _source_signature(movie: Path) -> dict:
+    if not movie.is_dir():
+        stat = movie.stat()
+        return {"source": movie.name, "size": stat.st_size, "mtime": stat.st_mtime}
+    # A Zarr store's directory mtime does not change when chunks are rewritten,
+    # so sign every file in it (metadata and chunks)
+    files = sorted(p for p in movie.rglob("*") if p.is_file())
+    stats = [p.stat() for p in files]
+    listing = hashlib.sha256()
+    for path, stat in zip(files, stats):
+        listing.update(f"{path.relative_to(movie)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return {
+        "source": movie.name,
+        "size": sum(st.st_size for st in stats),
+        "mtime": max((st.st_mtime for st in stats), default=0.0),
+        "files": listing.hexdigest(),
+    }
+
+
+def _spatial_halve(block: np.ndarray) -> np.ndarray:
+    """Average 2x2 blocks over the last two axes (odd trailing row/col dropped)."""
+    h, w = block.shape[-2] // 2 * 2, block.shape[-1] // 2 * 2
+    lead = block.shape[:-2]
+    return block[..., :h, :w].reshape(*lead, h // 2, 2, w // 2, 2).mean(axis=(-3, -1))
+
+
+def _temporal_mean(block: np.ndarray, factor: int) -> np.ndarray:
+    """Average groups of `factor` frames along axis 0 (last group may be shorter)."""
+    if factor == 1:
+        return block
+    starts = np.arange(0, len(block), factor)
+    counts = np.diff(np.append(starts, len(block)))
+    sums = np.add.reduceat(block, starts, axis=0)
+    return sums / counts.reshape((-1,) + (1,) * (block.ndim - 1))
+
+
+def _cast(block: np.ndarray, dtype) -> np.ndarray:
+    if np.issubdtype(dtype, np.integer):
+        return np.rint(block).astype(dtype)
+    return block.astype(dtype)
+
+
+def build_pyramid(
+    movie: str | Path,
+    cache: str | Path | None = None,
+    *,
+    factors: Sequence[int] = DEFAULT_FACTORS,
+    temporal: bool = False,
+    block_frames: int = 32,
+    force: bool = False,
+) -> Path:
+    """
+    Stream a movie once and write block-averaged pyramid levels.
+
+    Args:
+        movie: Path to input TIFF stack or Zarr store
+        cache: Output Zarr group (default: `<movie>.pyramid.zarr`)
+        factors: Downsampling factors, each a power of two (default: 2, 4, 8)
+        temporal: Also average groups of `factor` frames in each level
+        block_frames: Frames read per step; rounded up to a multiple of max(factors)
+        force: Rebuild even if the cache matches the source
+
+    Returns:
+        Path to the pyramid cache
+    """
+    movie = Path(movie)
+    cache = Path(cache) if cache is not None else default_cache_path(movie)
+    factors = sorted(set(int(f) for f in factors))
+    if any(f < 2 or f & (f - 1) for f in factors):
+        raise ValueError(f"Pyramid factors must be powers of two >= 2; got {factors}")
+
+    signature = _source_signature(movie)
+    if not force and is_current(movie, cache, factors=factors, temporal=temporal):
+        print(f"Pyramid cache is up to date: {cache}")
+        return cache
+
+    stack = open_stack(movie)
+    if stack.ndim not in (3, 4):
+        raise ValueError(f"Expected stack shape (T,Y,X) or (T,C,Y,X); got shape={stack.shape}")
+    n_frames = stack.shape[0]
+    lead = stack.shape[1:-2]
+    print(f"Building pyramid {factors} (temporal={temporal}) for shape={stack.shape}...")
+
+    root = zarr.open_group(str(cache), mode="w")
+    levels = {}
+    for f in factors:
+        t = -(-n_frames // f) if temporal else n_frames
+        shape = (t,) + lead + (stack.shape[-2] // f, stack.shape[-1] // f)
+        chunks = (min(16, t),) + (1,) * len(lead) + tuple(min(256, s) for s in shape[-2:])
+        levels[f] = root.zeros(name=str(f), shape=shape, chunks=chunks, dtype=stack.dtype)
+
+    # Blocks must hold whole temporal groups for every level
+    step = -(-block_frames // factors[-1]) * factors[-1]
+    for t0 in range(0, n_frames, step):
+        t1 = min(t0 + step, n_frames)
+        level = np.asarray(stack[t0:t1], dtype=np.float32)
+        current = 1
+        for f in factors:
+            while current < f:
+                level = _spatial_halve(level)
+                current *= 2
+            out = _temporal_mean(level, f) if temporal else level
+            o0 = t0 // f if temporal else t0
+            levels[f][o0:o0 + len(out)] = _cast(out, stack.dtype)
+        print(f"  Progress: {t1}/{n_frames} frames")
+
+    root.attrs.update({
+        **signature,
+        "shape": list(stack.shape),
+        "factors": factors,
+        "temporal": temporal,
+    })
+    print(f"Saved pyramid cache: {cache}")
+    return cache
+
+
+def is_current(
+    movie: str | Path,
+    cache: str | Path | None = None,
+    *,
+    factors: Sequence[int] | None = None,
+    temporal: bool | None = None,
+) -> bool:
+    """True if `cache` exists and was built from the current version of `movie`."""
+    movie = Path(movie)
+    cache = Path(cache) if cache is not None else default_cache_path(movie)
+    if not cache.exists():
+        return False
+    try:
+        attrs = dict(zarr.open_group(str(cache), mode="r").attrs)
+    except Exception:
+        return False
+    sig = _source_signature(movie)
+    if any(attrs.get(k) != v for k, v in sig.items()):
+        return False
+    if factors is not None and sorted(attrs.get("factors", [])) != sorted(factors):
+        return False
+    if temporal is not None and attrs.get("temporal") != temporal:
+        return False
+    return True
+
+
+def open_pyramid(movie: str | Path, cache: str | Path | None = None, **build_kwargs) -> dict:
+    """
+    Open (building or refreshing if needed) the pyramid for a movie.
+
+    Returns:
+        Dict mapping factor -> lazily indexed array; factor 1 is the source movie
+    """
+    movie = Path(movie)
+    cache = Path(cache) if cache is not None else default_cache_path(movie)
+    if not is_current(movie, cache):
+        build_pyramid(movie, cache, **build_kwargs)
+    root = zarr.open_group(str(cache), mode="r")
+    levels = {1: open_stack(movie)}
+    levels.update({int(f): root[str(f)] for f in root.attrs["factors"]})
+    return levels
+
+
+def select_level(
+    levels: dict,
+    extent: int,
+    *,
+    max_size: int,
+    n_frames: int | None = None,
+    max_frames: int | None = None,
+    temporal: bool = False,
+) -> int:
+    """Coarsest factor that keeps >= max_size pixels (and >= max_frames frames if temporal)."""
+    best = 1
+    for f in sorted(levels):
+        if extent // f < max_size:
+            break
+        if temporal and max_frames is not None and n_frames is not None and -(-n_frames // f) < max_frames:
+            break
+        best = f
+    return best
+
+
+def preview(
+    movie: str | Path,
+    *,
+    start_frame: int | None = None,
+    end_frame: int | None = None,
+    roi: Tuple[int, int, int, int] | None = None,
+    max_size: int = 512,
+    max_frames: int | None = None,
+    cache: str | Path | None = None,
+) -> Tuple[np.ndarray, int]:
+    """
+    Read a frame range / ROI from the coarsest adequate pyramid level.
+
+    Args:
+        movie: Path to input TIFF stack or Zarr store
+        start_frame, end_frame: Frame range in full-resolution frames
+        roi: (start_row, end_row, start_col, end_col) in full-resolution pixels
+        max_size: Minimum output size along the ROI's longer side
+        max_frames: Minimum number of output frames (temporal pyramids only)
+        cache: Pyramid cache path (default: `<movie>.pyramid.zarr`)
+
+    Returns:
+        Tuple of (array, factor); the array is (T', [C,] Y', X') at 1/factor scale
+    """
+    levels = open_pyramid(movie, cache)
+    full = levels[1]
+    temporal = False
+    if len(levels) > 1:
+        temporal = bool(zarr.open_group(
+            str(Path(cache) if cache is not None else default_cache_path(movie)), mode="r"
+        ).attrs.get("temporal", False))
+
+    frames = range(*slice(start_frame, end_frame).indices(full.shape[0]))
+    r0, r1, c0, c1 = roi if roi is not None else (0, full.shape[-2], 0, full.shape[-1])
+    f = select_level(
+        levels, max(r1 - r0, c1 - c0),
+        max_size=max_size, n_frames=len(frames), max_frames=max_frames, temporal=temporal,
+    )
+
+    level = levels[f]
+    tf = f if temporal else 1
+    t0, t1 = frames.start // tf, -(-frames.stop // tf)
+    rows = slice(r0 // f, -(-r1 // f))
+    cols = slice(c0 // f, -(-c1 // f))
+    index = (slice(t0, t1),) + (slice(None),) * (level.ndim - 3) + (rows, cols)
+    return np.asarray(level[index]), f
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Build a 2x/4x/8x pyramid cache for a movie and write quick-look snapshots."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
+    p.add_argument("--cache", default=None, help="Pyramid cache path (default: <input>.pyramid.zarr)")
+    p.add_argument(
+        "--factors", type=int, nargs="+", default=list(DEFAULT_FACTORS),
+        help="Downsampling factors (default: 2 4 8)",
+    )
+    p.add_argument("--temporal", action="store_true", help="Also downsample in time")
+    p.add_argument("--force", action="store_true", help="Rebuild even if the cache is up to date")
+    p.add_argument(
+        "--snapshot", nargs=2, metavar=("FRAME", "PNG"), default=None,
+        help="Write one frame at preview resolution to a PNG (for ROI selection)",
+    )
+    p.add_argument(
+        "--max-size", type=int, default=512,
+        help="Minimum snapshot size along the longer side (default: 512)",
+    )
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    build_pyramid(
+        args.input, args.cache, factors=args.factors, temporal=args.temporal, force=args.force
+    )
+    if args.snapshot is not None:
+        frame, png = int(args.snapshot[0]), args.snapshot[1]
+        data, f = preview(
+            args.input, start_frame=frame, end_frame=frame + 1,
+            max_size=args.max_size, cache=args.cache,
+        )
+        img = data[0] if data.ndim == 3 else data[0, 0]
+        # Stretch contrast for viewing
+        value_range = (img.min(), img.max())
+        cv2.imwrite(png, to_uint8(img, value_range))
+        print(f"Saved snapshot of frame {frame} at 1/{f} scale: {png} (multiply pixel coords by {f})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
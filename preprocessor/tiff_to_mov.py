@@ -11,7 +11,10 @@ from pathlib import Path
 
 import cv2
 import numpy as np
-import tifffile as tif
+
+from preprocessor import profiling
+from preprocessor.frames import global_range, iter_frames, open_stack, to_uint8
+from preprocessor.pyramid import open_pyramid, select_level
 
 
 def tiff_to_video(
@@ -21,16 +24,22 @@ def tiff_to_video(
     fps: float = 1.0 / 15.0,  # 15 seconds per frame
     codec: str = "mp4v",
     normalize_16bit: bool = True,
+    preview_size: int | None = None,
 ) -> Path:
     """
     Convert a multi-frame TIFF stack to a video file (MP4/MOV).
 
     Args:
-        tiff_file: Path to input TIFF stack
+        tiff_file: Path to input TIFF stack or Zarr store
         output_file: Path to output video file
         fps: Frames per second (default: 1/15 ≈ 0.067 fps, based on README)
         codec: Video codec (default: 'mp4v', alternatives: 'avc1', 'h264', 'XVID')
         normalize_16bit: If True, normalize 16-bit images to 8-bit for video codecs
+        preview_size: If set, render a quick-look video from the coarsest pyramid
+            level (see preprocessor.pyramid) with at least this many pixels along
+            the longer side, building the pyramid cache if needed. With a
+            temporal pyramid, fps is divided by the level's factor so the
+            video keeps the original duration
 
     Returns:
         Path to output video file
@@ -39,8 +48,16 @@ def tiff_to_video(
     output_file = Path(output_file)
     output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # Read TIFF stack
-    stack = tif.imread(tiff_file)
+    # Open TIFF stack (or Zarr store) lazily; frames are converted one at a time
+    stack = open_stack(tiff_file)
+    if preview_size is not None:
+        levels = open_pyramid(tiff_file)
+        factor = select_level(levels, max(stack.shape[-2:]), max_size=preview_size)
+        if levels[factor].shape[0] < stack.shape[0]:
+            # Temporal pyramid: each frame averages `factor` source frames, so keep the duration
+            fps = fps / factor
+        stack = levels[factor]
+        print(f"Using 1/{factor} pyramid level for preview")
     print(f"Loaded TIFF: shape={stack.shape}, dtype={stack.dtype}")
 
     # Handle different stack shapes
@@ -61,18 +78,15 @@ def tiff_to_video(
     else:
         raise ValueError(f"Expected 3D or 4D stack, got shape={stack.shape}")
 
-    # Normalize 16-bit to 8-bit if needed
+    # Normalize 16-bit to 8-bit if needed; other dtypes are rescaled by the global range
     if normalize_16bit and stack.dtype == np.uint16:
         print("Normalizing 16-bit to 8-bit...")
-        stack = (stack / 256).astype(np.uint8)
+        value_range = None
     elif stack.dtype != np.uint8:
-        # Convert other dtypes to uint8
-        stack_min = stack.min()
-        stack_max = stack.max()
-        if stack_max > stack_min:
-            stack = ((stack - stack_min) / (stack_max - stack_min) * 255).astype(np.uint8)
-        else:
-            stack = np.zeros_like(stack, dtype=np.uint8)
+        with profiling.span("global_range"):
+            value_range = global_range(stack)
+    else:
+        value_range = None
 
     # Initialize video writer
     fourcc = cv2.VideoWriter_fourcc(*codec)
@@ -83,30 +97,35 @@ def tiff_to_video(
     if not video_writer.isOpened():
         raise RuntimeError(f"Failed to open video writer for {output_file}")
 
-    # Write frames
+    # Write frames, streaming whole time-chunks from chunked stores
     print(f"Writing {n_frames} frames at {fps} fps...")
+    frames = iter_frames(stack, channel=None)
     for i in range(n_frames):
-        if stack.ndim == 3:
-            frame = stack[i]
-        elif stack.shape[1] in (1, 3, 4):
-            # (T, C, Y, X)
-            frame = stack[i].transpose(1, 2, 0) if is_color else stack[i, 0]
-        else:
-            # (T, Y, X, C)
-            frame = stack[i]
+        with profiling.span("decode") as s:
+            _, frame = next(frames)
+            if stack.ndim == 4 and stack.shape[1] in (1, 3, 4):
+                # (T, C, Y, X)
+                frame = frame.transpose(1, 2, 0) if is_color else frame[0]
+            s.add(bytes_read=frame.nbytes)
 
-        # Ensure frame is 2D (grayscale) or 3D (BGR)
-        if is_color and frame.ndim == 2:
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-        elif not is_color and frame.ndim == 3:
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        with profiling.span("convert"):
+            frame = to_uint8(frame, value_range)
 
-        video_writer.write(frame)
+            # Ensure frame is 2D (grayscale) or 3D (BGR)
+            if is_color and frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            elif not is_color and frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+
+        with profiling.span("encode"):
+            video_writer.write(frame)
 
         if (i + 1) % 100 == 0:
             print(f"  Progress: {i+1}/{n_frames} frames")
 
-    video_writer.release()
+    with profiling.span("finalize") as s:
+        video_writer.release()
+        s.add(bytes_written=output_file.stat().st_size if output_file.exists() else 0)
     print(f"Saved video: {output_file}")
     return output_file
 
@@ -115,7 +134,7 @@ def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="Convert a multi-frame TIFF stack to MP4/MOV video."
     )
-    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie")
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
     p.add_argument("--output", "-o", required=True, help="Path to output video file")
 
     p.add_argument(
@@ -135,19 +154,34 @@ def _build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Disable automatic 16-bit to 8-bit normalization",
     )
+    p.add_argument(
+        "--preview-size",
+        type=int,
+        default=None,
+        help="Quick-look mode: read from the coarsest pyramid level with at least this many pixels",
+    )
+    p.add_argument(
+        "--profile", default=None, metavar="TRACE_JSON",
+        help="Write a per-stage timing/memory trace (Chrome trace JSON) to this path",
+    )
 
     return p
 
 
 def main(argv: list[str] | None = None) -> int:
     args = _build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
     tiff_to_video(
         args.input,
         args.output,
         fps=args.fps,
         codec=args.codec,
         normalize_16bit=not args.no_normalize_16bit,
+        preview_size=args.preview_size,
     )
+    if args.profile:
+        profiling.write_trace(args.profile)
     return 0
 
 
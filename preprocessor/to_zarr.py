@@ -0,0 +1,127 @@
+"""
+Convert a multi-frame TIFF movie to a chunked, compressed Zarr store.
+
+The default (T, Y, X) chunking of (16, 256, 256) is tuned for ROI x time-range
+access: extracting a window, kymograph or frame range touches only the chunks
+that overlap it, instead of whole TIFF pages. Chunks are Blosc/zstd compressed
+with bit-shuffle, which Blosc decompresses with multiple threads.
+
+Expected TIFF shapes:
+- (T, Y, X)
+- (T, C, Y, X)  (channels are chunked individually)
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import zarr
+
+from preprocessor.frames import open_stack
+
+
+def _create_array(path: Path, shape, chunks, dtype, clevel: int):
+    """Create a Blosc/zstd bit-shuffled array with the zarr 2 or zarr 3 API."""
+    if int(zarr.__version__.split(".")[0]) >= 3:
+        from zarr.codecs import BloscCodec
+
+        return zarr.create_array(
+            str(path), shape=shape, chunks=chunks, dtype=dtype, overwrite=True,
+            compressors=BloscCodec(cname="zstd", clevel=clevel, shuffle="bitshuffle"),
+        )
+
+    from numcodecs import Blosc
+
+    return zarr.open_array(
+        str(path), mode="w", shape=shape, chunks=chunks, dtype=dtype,
+        compressor=Blosc(cname="zstd", clevel=clevel, shuffle=Blosc.BITSHUFFLE),
+    )
+
+
+def tiff_to_zarr(
+    tiff_file: str | Path,
+    output_file: str | Path | None = None,
+    *,
+    chunk_frames: int = 16,
+    chunk_rows: int = 256,
+    chunk_cols: int = 256,
+    clevel: int = 5,
+) -> Path:
+    """
+    Stream a TIFF stack into a chunked Zarr array.
+
+    Args:
+        tiff_file: Path to input TIFF stack
+        output_file: Path to output store (default: `<input stem>.zarr` next to input)
+        chunk_frames: Chunk length along T
+        chunk_rows: Chunk length along Y
+        chunk_cols: Chunk length along X
+        clevel: Blosc/zstd compression level (0-9)
+
+    Returns:
+        Path to output Zarr store
+    """
+    tiff_file = Path(tiff_file)
+    if output_file is None:
+        output_file = tiff_file.with_suffix(".zarr")
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    stack = open_stack(tiff_file)
+    if stack.ndim not in (3, 4):
+        raise ValueError(f"Expected stack shape (T,Y,X) or (T,C,Y,X); got shape={stack.shape}")
+    print(f"Loaded TIFF: shape={stack.shape}, dtype={stack.dtype}")
+
+    n_frames = stack.shape[0]
+    chunk_frames = min(chunk_frames, n_frames)
+    spatial = (min(chunk_rows, stack.shape[-2]), min(chunk_cols, stack.shape[-1]))
+    chunks = (chunk_frames,) + ((1,) if stack.ndim == 4 else ()) + spatial
+
+    out = _create_array(output_file, stack.shape, chunks, stack.dtype, clevel)
+    out.attrs.update(
+        {"axes": "TYX" if stack.ndim == 3 else "TCYX", "source": tiff_file.name}
+    )
+
+    # Write one time-chunk at a time so memory stays at chunk_frames full frames
+    for t in range(0, n_frames, chunk_frames):
+        stop = min(t + chunk_frames, n_frames)
+        out[t:stop] = np.asarray(stack[t:stop])
+        print(f"  Progress: {stop}/{n_frames} frames")
+
+    print(f"Saved Zarr store: {output_file} (chunks={chunks})")
+    return output_file
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Convert a multi-frame TIFF stack to a chunked, compressed Zarr store."
+    )
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie")
+    p.add_argument(
+        "--output", "-o", default=None,
+        help="Path to output Zarr store (default: <input>.zarr)",
+    )
+    p.add_argument("--chunk-frames", type=int, default=16, help="Chunk length along T (default: 16)")
+    p.add_argument("--chunk-rows", type=int, default=256, help="Chunk length along Y (default: 256)")
+    p.add_argument("--chunk-cols", type=int, default=256, help="Chunk length along X (default: 256)")
+    p.add_argument("--clevel", type=int, default=5, help="Compression level 0-9 (default: 5)")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    tiff_to_zarr(
+        args.input,
+        args.output,
+        chunk_frames=args.chunk_frames,
+        chunk_rows=args.chunk_rows,
+        chunk_cols=args.chunk_cols,
+        clevel=args.clevel,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
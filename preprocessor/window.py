@@ -1,6 +1,9 @@
 """
 Preprocess a multi-frame TIFF movie by extracting a temporal + spatial window.
 
+The input may also be a Zarr store written by `preprocessor.to_zarr`, in which
+case only the chunks overlapping the window are read.
+
 Expected TIFF shapes:
 - (T, Y, X)
 - (T, C, Y, X)
@@ -13,8 +16,12 @@ from datetime import datetime
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import tifffile as tif
 
+from preprocessor import profiling
+from preprocessor.frames import is_zarr, open_stack
+
 def _validate_window(
     stack_shape: Tuple[int, ...],
     start_frame: int | None,
@@ -139,18 +146,30 @@ def extract_window(
     
     output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # stack = tif.memmap(tiff_file) if use_memmap else tif.imread(tiff_file)
-    stack = tif.imread(tiff_file)
+    with profiling.span("open") as s:
+        if use_memmap:
+            stack = open_stack(tiff_file)
+        elif is_zarr(tiff_file):
+            stack = open_stack(tiff_file)[:]
+            s.add(bytes_read=stack.nbytes)
+        else:
+            stack = tif.imread(tiff_file)
+            s.add(bytes_read=stack.nbytes)
     _validate_window(
         stack.shape, start_frame, end_frame, start_row, end_row, start_col, end_col
     )
 
-    if stack.ndim == 3:
-        subset = stack[start_frame:end_frame, start_row:end_row, start_col:end_col]
-    else:
-        subset = stack[start_frame:end_frame, :, start_row:end_row, start_col:end_col]
-
-    tif.imwrite(output_file, subset)
+    with profiling.span("read_window") as s:
+        if stack.ndim == 3:
+            subset = stack[start_frame:end_frame, start_row:end_row, start_col:end_col]
+        else:
+            subset = stack[start_frame:end_frame, :, start_row:end_row, start_col:end_col]
+        subset = np.asarray(subset)
+        s.add(bytes_read=subset.nbytes)
+
+    with profiling.span("write") as s:
+        tif.imwrite(output_file, subset)
+        s.add(bytes_written=output_file.stat().st_size)
     return output_file
 
 
@@ -158,7 +177,7 @@ def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="Extract a temporal+spatial window from a multi-frame TIFF."
     )
-    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie")
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
     p.add_argument(
         "--output", "-o", default=None,
         help="Path to output TIFF movie (auto-generated if not provided)"
@@ -174,13 +193,19 @@ def _build_parser() -> argparse.ArgumentParser:
     p.add_argument(
         "--no-memmap",
         action="store_true",
-        help="Disable memory mapping (loads full TIFF into RAM).",
+        help="Disable memory mapping/lazy reads (loads full movie into RAM).",
+    )
+    p.add_argument(
+        "--profile", default=None, metavar="TRACE_JSON",
+        help="Write a per-stage timing/memory trace (Chrome trace JSON) to this path",
     )
     return p
 
 
 def main(argv: list[str] | None = None) -> int:
     args = _build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
     extract_window(
         args.input,
         args.output,
@@ -192,6 +217,8 @@ def main(argv: list[str] | None = None) -> int:
         end_col=args.end_col,
         use_memmap=not args.no_memmap,
     )
+    if args.profile:
+        profiling.write_trace(args.profile)
     return 0
 
 
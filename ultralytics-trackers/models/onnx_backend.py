@@ -0,0 +1,262 @@
+"""
+ONNX Runtime CPU backend for the YOLO cell detector.
+
+`export_onnx` exports an ultralytics `.pt` model to ONNX with a fixed input
+size and can int8-quantize its weights with ONNX Runtime's dynamic quantizer.
+The exported file is cached next to the `.pt` as `<stem>.<imgsz>.onnx` /
+`<stem>.<imgsz>.int8.onnx`, so exports with different settings never collide.
+
+`OnnxYOLO` runs the exported model in an ONNX Runtime session with a
+configurable intra-op thread count. Every frame is letterboxed into one
+preallocated input buffer that is bound to the session once, so the per-frame
+path allocates nothing but the outputs. Detections are passed to the same
+BoT-SORT / ByteTrack trackers that ultralytics uses, and `.track()` returns
+results with `.boxes` (xywh, id, ...) and `.plot()`. This lets
+`track_tiff(..., backend="onnx")` use it in place of `YOLO(model_path)`.
+
+Usage:
+    python ultralytics-trackers/models/onnx_backend.py --model yolo26n.pt --int8
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+TRACKER_DIR = Path(__file__).resolve().parents[1] / "trackers"
+
+
+def onnx_path_for(model_path: str | Path, *, imgsz: int = 640, int8: bool = False) -> Path:
+    """Cached ONNX export path for a `.pt` model at one input size / precision."""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.{imgsz}" + (".int8.onnx" if int8 else ".onnx"))
+
+
+def export_onnx(
+    model_path: str | Path,
+    *,
+    imgsz: int = 640,
+    int8: bool = False,
+    force: bool = False,
+) -> Path:
+    """
+    Export a YOLO `.pt` model to ONNX (reusing a cached export if present).
+
+    Args:
+        model_path: Path to the `.pt` model (an `.onnx` path is returned unchanged)
+        imgsz: Square input size baked into the exported graph
+        int8: Quantize weights to 8 bits with onnxruntime's dynamic quantizer
+        force: Re-export even if the cached file exists
+
+    Returns:
+        Path to the ONNX model
+    """
+    model_path = Path(model_path)
+    if model_path.suffix == ".onnx":
+        return model_path
+    output = onnx_path_for(model_path, imgsz=imgsz, int8=int8)
+    if output.exists() and not force:
+        return output
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {model_path} to ONNX (imgsz={imgsz}, int8={int8})...")
+    exported = Path(YOLO(str(model_path)).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True))
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # The CPU ConvInteger kernel only takes unsigned 8-bit weights
+        quantize_dynamic(str(exported), str(output), weight_type=QuantType.QUInt8)
+        # Keep the float export under its own cache name too
+        exported.replace(onnx_path_for(model_path, imgsz=imgsz))
+    elif exported.resolve() != output.resolve():
+        exported.replace(output)
+    print(f"Saved ONNX model: {output}")
+    return output
+
+
+def load_tracker(tracker: str | Path = "botsort.yaml", *, frame_rate: int = 30):
+    """Build an ultralytics BoT-SORT/ByteTrack tracker from a YAML config (name or path)."""
+    from ultralytics.trackers import BOTSORT, BYTETracker
+    from ultralytics.utils import IterableSimpleNamespace
+
+    path = Path(tracker)
+    if not path.exists():
+        path = TRACKER_DIR / path.name
+    cfg = yaml.safe_load(path.read_text())
+    trackers = {"bytetrack": BYTETracker, "botsort": BOTSORT}
+    if cfg["tracker_type"] not in trackers:
+        raise ValueError(f"tracker_type must be one of {list(trackers)}; got {cfg['tracker_type']!r}")
+    return trackers[cfg["tracker_type"]](args=IterableSimpleNamespace(**cfg), frame_rate=frame_rate)
+
+
+class OnnxResult:
+    """The part of ultralytics' `Results` that `track_tiff` uses: `.boxes` and `.plot()`."""
+
+    def __init__(self, orig_img: np.ndarray, boxes):
+        self.orig_img = orig_img
+        self.boxes = boxes
+
+    def plot(self) -> np.ndarray:
+        img = self.orig_img.copy()
+        data = self.boxes.data
+        data = data.numpy() if hasattr(data, "numpy") else data
+        for row in data:
+            x1, y1, x2, y2 = (int(v) for v in row[:4])
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            label = f"id:{int(row[4])} {row[-2]:.2f}" if self.boxes.is_track else f"{row[4]:.2f}"
+            cv2.putText(img, label, (x1, max(y1 - 4, 0)), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+        return img
+
+
+class OnnxYOLO:
+    """
+    YOLO detector + tracker on ONNX Runtime, with the `.predict()` / `.track()`
+    interface that `track_tiff` uses.
+
+    Args:
+        model_path: `.pt` model (exported on first use) or `.onnx` file
+        threads: ONNX Runtime intra-op threads (default: onnxruntime's choice)
+        int8: Use the int8-quantized export
+        imgsz: Square input size of the export
+        conf: Confidence threshold
+        iou: NMS IoU threshold (only for models without an end-to-end head)
+        max_det: Maximum detections per frame
+        tracker: Tracker YAML name in `ultralytics-trackers/trackers/` or a path
+    """
+
+    def __init__(
+        self,
+        model_path: str | Path,
+        *,
+        threads: int | None = None,
+        int8: bool = False,
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.7,
+        max_det: int = 300,
+        tracker: str | Path = "botsort.yaml",
+    ):
+        import onnxruntime as ort
+
+        self.onnx_file = export_onnx(model_path, imgsz=imgsz, int8=int8)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.inter_op_num_threads = 1
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(self.onnx_file), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+
+        inp = self.session.get_inputs()[0]
+        _, _, self.height, self.width = inp.shape
+        # Preallocated NCHW input, bound to the session once; frames are written into it in place
+        self.input = np.empty((1, 3, self.height, self.width), dtype=np.float32)
+        self._canvas = np.full((self.height, self.width, 3), 114, dtype=np.uint8)
+        self._letterbox = None
+        self._binding = self.session.io_binding()
+        self._binding.bind_ortvalue_input(inp.name, ort.OrtValue.ortvalue_from_numpy(self.input))
+        self._binding.bind_output(self.session.get_outputs()[0].name)
+
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.tracker_cfg = tracker
+        self.tracker = None
+
+    def _preprocess(self, frame: np.ndarray) -> None:
+        """Letterbox a BGR uint8 frame into the bound input buffer (RGB, [0, 1])."""
+        h0, w0 = frame.shape[:2]
+        if self._letterbox is None or self._letterbox[0] != (h0, w0):
+            r = min(self.height / h0, self.width / w0)
+            nh, nw = int(round(h0 * r)), int(round(w0 * r))
+            top = int(round((self.height - nh) / 2 - 0.1))
+            left = int(round((self.width - nw) / 2 - 0.1))
+            self._canvas[:] = 114
+            self._letterbox = ((h0, w0), r, top, left, nh, nw)
+        _, _, top, left, nh, nw = self._letterbox
+
+        region = self._canvas[top:top + nh, left:left + nw]
+        if (nh, nw) == (h0, w0):
+            region[:] = frame
+        else:
+            region[:] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        np.multiply(self._canvas.transpose(2, 0, 1)[::-1], 1 / 255, out=self.input[0], casting="unsafe")
+
+    def _postprocess(self, pred: np.ndarray) -> np.ndarray:
+        """Raw output -> (N, 6) [x1, y1, x2, y2, conf, cls] in original frame pixels."""
+        if pred.shape[-1] == 6:
+            # End-to-end (NMS-free) head: (max_det, 6) xyxy, conf, cls
+            det = pred[pred[:, 4] > self.conf][: self.max_det].astype(np.float32)
+        else:
+            # Raw head: (4 + n_classes, N) center xywh + class scores
+            pred = pred.T
+            cls = pred[:, 4:].argmax(axis=1)
+            conf = pred[np.arange(len(pred)), 4 + cls]
+            keep = conf > self.conf
+            xywh, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+            corners = np.column_stack([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, 2:]])
+            idx = cv2.dnn.NMSBoxesBatched(
+                corners.tolist(), conf.tolist(), cls.tolist(), self.conf, self.iou
+            )
+            idx = np.asarray(idx, dtype=np.int64).reshape(-1)[: self.max_det]
+            det = np.column_stack([
+                corners[idx, :2], corners[idx, :2] + corners[idx, 2:], conf[idx], cls[idx]
+            ]).astype(np.float32)
+
+        # Undo the letterbox
+        (h0, w0), r, top, left, _, _ = self._letterbox
+        det[:, [0, 2]] = ((det[:, [0, 2]] - left) / r).clip(0, w0)
+        det[:, [1, 3]] = ((det[:, [1, 3]] - top) / r).clip(0, h0)
+        return det
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        """Run the detector on one BGR uint8 frame; returns (N, 6) [x1, y1, x2, y2, conf, cls]."""
+        self._preprocess(frame)
+        self.session.run_with_iobinding(self._binding)
+        return self._postprocess(self._binding.copy_outputs_to_cpu()[0][0])
+
+    def predict(self, frame: np.ndarray, **kwargs) -> list:
+        from ultralytics.engine.results import Boxes
+
+        return [OnnxResult(frame, Boxes(self.detect(frame), frame.shape[:2]))]
+
+    def track(self, frame: np.ndarray, persist: bool = True, **kwargs) -> list:
+        """Detect and update the tracker; boxes carry track IDs like `YOLO.track()`."""
+        import torch
+        from ultralytics.engine.results import Boxes
+
+        if self.tracker is None or not persist:
+            self.tracker = load_tracker(self.tracker_cfg)
+        det = Boxes(self.detect(frame), frame.shape[:2])
+        tracks = self.tracker.update(det, frame)
+        # Drop the trailing detection-index column, as ultralytics does
+        data = torch.as_tensor(tracks[:, :-1] if len(tracks) else np.zeros((0, 7), np.float32))
+        return [OnnxResult(frame, Boxes(data, frame.shape[:2]))]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        description="Export a YOLO model to ONNX (optionally int8) for the CPU tracking backend."
+    )
+    p.add_argument("--model", "-m", default="yolo26n.pt", help="Path to YOLO .pt model")
+    p.add_argument("--imgsz", type=int, default=640, help="Input size baked into the export (default: 640)")
+    p.add_argument("--int8", action="store_true", help="Quantize weights to int8")
+    p.add_argument("--force", action="store_true", help="Re-export even if a cached export exists")
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    export_onnx(args.model, imgsz=args.imgsz, int8=args.int8, force=args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
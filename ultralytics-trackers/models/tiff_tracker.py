@@ -1,31 +1,68 @@
 from collections import defaultdict
 from pathlib import Path
 import argparse
+import sys
 
 import cv2
 import numpy as np
-import tifffile as tif
+import pandas as pd
 
 from ultralytics import YOLO
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "analysis"))
+
+from onnx_backend import OnnxYOLO  # noqa: E402
+from preprocessor import profiling  # noqa: E402
+from preprocessor.frames import global_range, iter_frames, open_stack, to_uint8  # noqa: E402
+from trackmate import write_trackmate_csv  # noqa: E402
+
+BACKENDS = ("torch", "onnx")
+
 
 def track_tiff(
     tiff_path: str | Path,
     model_path: str = "yolo26n.pt",
     show_display: bool = True,
+    *,
+    backend: str = "torch",
+    threads: int | None = None,
+    int8: bool = False,
 ) -> dict:
     """
     Track cells in a TIFF stack using YOLO.
+
+    Args:
+        tiff_path: Path to input TIFF stack or Zarr store
+        model_path: Path to YOLO model
+        show_display: Show the annotated frames in a window
+        backend: 'torch' (ultralytics/PyTorch) or 'onnx' (ONNX Runtime on CPU;
+            the model is exported to ONNX on first use)
+        threads: CPU threads for inference (default: library default)
+        int8: With backend='onnx', use an int8-quantized export
     
     Returns:
-        Dictionary with track_history
+        Dictionary with track_history (last 30 centres per track) and
+        detections (every tracked box as (frame, track_id, x, y, w, h, conf))
     """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}; got {backend!r}")
+
     # Load the YOLO model
-    model = YOLO(model_path)
+    with profiling.span("load_model"):
+        if backend == "onnx":
+            model = OnnxYOLO(model_path, threads=threads, int8=int8)
+        else:
+            if threads:
+                import torch
+
+                torch.set_num_threads(threads)
+            model = YOLO(model_path)
     
-    # Load the TIFF stack
+    # Open the TIFF stack (or Zarr store) lazily
     tiff_path = Path(tiff_path)
-    stack = tif.imread(tiff_path)
+    stack = open_stack(tiff_path)
     print(f"Loaded TIFF: shape={stack.shape}, dtype={stack.dtype}")
 
     # Handle different stack shapes and normalize if needed
@@ -46,66 +83,73 @@ def track_tiff(
     else:
         raise ValueError(f"Expected 3D or 4D stack, got shape={stack.shape}")
 
-    # Normalize 16-bit to 8-bit if needed (YOLO expects uint8)
+    # Normalize 16-bit to 8-bit if needed (YOLO expects uint8), one frame at a time
     if stack.dtype == np.uint16:
         print("Normalizing 16-bit to 8-bit...")
-        stack = (stack / 256).astype(np.uint8)
+        value_range = None
     elif stack.dtype != np.uint8:
-        # Convert other dtypes to uint8
-        stack_min = stack.min()
-        stack_max = stack.max()
-        if stack_max > stack_min:
-            stack = ((stack - stack_min) / (stack_max - stack_min) * 255).astype(np.uint8)
-        else:
-            stack = np.zeros_like(stack, dtype=np.uint8)
+        with profiling.span("global_range"):
+            value_range = global_range(stack)
+    else:
+        value_range = None
 
     # Store the track history
     track_history = defaultdict(lambda: [])
+    detections = []
 
-    # Loop through the TIFF frames
+    # Loop through the TIFF frames, streaming whole time-chunks from chunked stores
+    frames = iter_frames(stack, channel=None)
     for frame_idx in range(n_frames):
         # Extract frame from stack
-        if stack.ndim == 3:
-            frame = stack[frame_idx]  # (Y, X)
-        elif stack.shape[1] in (1, 3, 4):
-            # (T, C, Y, X)
-            frame = stack[frame_idx].transpose(1, 2, 0) if not is_grayscale else stack[frame_idx, 0]
-        else:
-            # (T, Y, X, C)
-            frame = stack[frame_idx]
-        
-        # Convert grayscale to BGR if needed (YOLO expects 3-channel)
-        if is_grayscale or frame.ndim == 2:
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-        elif frame.ndim == 3 and frame.shape[2] == 1:
-            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        with profiling.span("decode") as s:
+            _, frame = next(frames)  # (Y, X), (C, Y, X) or (Y, X, C)
+            if stack.ndim == 4 and stack.shape[1] in (1, 3, 4):
+                # (T, C, Y, X)
+                frame = frame.transpose(1, 2, 0) if not is_grayscale else frame[0]
+            s.add(bytes_read=frame.nbytes)
+
+        with profiling.span("convert"):
+            frame = to_uint8(frame, value_range)
+
+            # Convert grayscale to BGR if needed (YOLO expects 3-channel)
+            if is_grayscale or frame.ndim == 2:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            elif frame.ndim == 3 and frame.shape[2] == 1:
+                frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
         
         # Run YOLO26 tracking on the frame, persisting tracks between frames
-        result = model.track(frame, persist=True)[0]
+        with profiling.span("inference"):
+            result = model.track(frame, persist=True)[0]
 
         # Get the boxes and track IDs
-        if result.boxes and result.boxes.is_track:
-            boxes = result.boxes.xywh.cpu()
-            track_ids = result.boxes.id.int().cpu().tolist()
+        with profiling.span("draw"):
+            if result.boxes and result.boxes.is_track:
+                boxes = result.boxes.xywh.cpu()
+                track_ids = result.boxes.id.int().cpu().tolist()
+                confs = result.boxes.conf.cpu().tolist()
+                detections.extend(
+                    (frame_idx, tid, *map(float, box), conf) for box, tid, conf in zip(boxes, track_ids, confs)
+                )
 
-            # Visualize the result on the frame
-            frame = result.plot()
+                # Visualize the result on the frame
+                frame = result.plot()
 
-            # Plot the tracks
-            for box, track_id in zip(boxes, track_ids):
-                x, y, w, h = box
-                track = track_history[track_id]
-                track.append((float(x), float(y)))  # x, y center point
-                if len(track) > 30:  # retain 30 tracks for 30 frames
-                    track.pop(0)
+                # Plot the tracks
+                for box, track_id in zip(boxes, track_ids):
+                    x, y, w, h = box
+                    track = track_history[track_id]
+                    track.append((float(x), float(y)))  # x, y center point
+                    if len(track) > 30:  # retain 30 tracks for 30 frames
+                        track.pop(0)
 
-                # Draw the tracking lines
-                points = np.hstack(track).astype(np.int32).reshape((-1, 1, 2))
-                cv2.polylines(frame, [points], isClosed=False, color=(230, 230, 230), thickness=10)
+                    # Draw the tracking lines
+                    points = np.hstack(track).astype(np.int32).reshape((-1, 1, 2))
+                    cv2.polylines(frame, [points], isClosed=False, color=(230, 230, 230), thickness=10)
 
         # Display the annotated frame
         if show_display:
-            cv2.imshow("YOLO26 Tracking", frame)
+            with profiling.span("display"):
+                cv2.imshow("YOLO26 Tracking", frame)
         
         # Print progress
         if (frame_idx + 1) % 10 == 0:
@@ -126,35 +170,100 @@ def track_tiff(
         cv2.destroyAllWindows()
     print(f"Tracking complete! Processed {n_frames} frames.")
     
-    return {"track_history": track_history}
+    return {"track_history": track_history, "detections": detections}
+
+
+def detections_to_trackmate(detections: list) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert tracked boxes to TrackMate-schema spots and edges tables (pixels, frames).
+
+    Consecutive detections of one track id are linked; RADIUS is a quarter of
+    the box width plus height.
+
+    Args:
+        detections: (frame, track_id, x, y, w, h, conf) tuples from `track_tiff`
+
+    Returns:
+        Tuple of (spots, edges)
+    """
+    det = pd.DataFrame(detections, columns=["FRAME", "TRACK_ID", "X", "Y", "W", "H", "QUALITY"])
+    det = det.sort_values(["TRACK_ID", "FRAME"], ignore_index=True)
+    spots = pd.DataFrame({
+        "LABEL": [f"ID{i}" for i in det.index],
+        "ID": det.index,
+        "TRACK_ID": det["TRACK_ID"],
+        "QUALITY": det["QUALITY"],
+        "POSITION_X": det["X"],
+        "POSITION_Y": det["Y"],
+        "POSITION_Z": 0.0,
+        "POSITION_T": det["FRAME"].astype(float),
+        "FRAME": det["FRAME"],
+        "RADIUS": (det["W"] + det["H"]) / 4,
+    })
+    same = (det["TRACK_ID"].to_numpy()[1:] == det["TRACK_ID"].to_numpy()[:-1])
+    src = det.index.to_numpy()[:-1][same]
+    edges = pd.DataFrame({
+        "TRACK_ID": det["TRACK_ID"].to_numpy()[src],
+        "SPOT_SOURCE_ID": src,
+        "SPOT_TARGET_ID": src + 1,
+    })
+    return spots, edges
 
 
 def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="Track cells in a TIFF stack using YOLO."
     )
-    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie")
+    p.add_argument("--input", "-i", required=True, help="Path to input TIFF movie or Zarr store")
     p.add_argument(
         "--model",
         "-m",
         default="yolo26n.pt",
         help="Path to YOLO model (default: yolo26n.pt)",
     )
+    p.add_argument(
+        "--backend", choices=BACKENDS, default="torch",
+        help="Inference backend: torch or onnx (ONNX Runtime, CPU) (default: torch)",
+    )
+    p.add_argument("--threads", type=int, default=None, help="CPU threads for inference")
+    p.add_argument("--int8", action="store_true", help="With --backend onnx, use an int8-quantized model")
     p.add_argument(
         "--no-display",
         action="store_true",
         help="Disable display window (useful for headless/server runs)",
     )
+    p.add_argument(
+        "--export-dir", default=None,
+        help="Write the tracks as TrackMate-schema spots.csv/edges.csv here (e.g. for analysis/track_eval.py)",
+    )
+    p.add_argument(
+        "--profile", default=None, metavar="TRACE_JSON",
+        help="Write a per-stage timing/memory trace (Chrome trace JSON) to this path",
+    )
     return p
 
 
 def main(argv: list[str] | None = None) -> int:
     args = _build_parser().parse_args(argv)
-    track_tiff(
+    if args.profile:
+        profiling.enable()
+    result = track_tiff(
         args.input,
         model_path=args.model,
         show_display=not args.no_display,
+        backend=args.backend,
+        threads=args.threads,
+        int8=args.int8,
     )
+    if args.export_dir:
+        out = Path(args.export_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        spots, edges = detections_to_trackmate(result["detections"])
+        write_trackmate_csv(spots, out / "spots.csv")
+        write_trackmate_csv(edges, out / "edges.csv")
+        print(f"Saved {len(spots)} spots and {len(edges)} edges: {out}")
+    if args.profile:
+        profiling.write_trace(args.profile)
     return 0
 
 
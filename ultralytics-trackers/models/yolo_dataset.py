@@ -0,0 +1,359 @@
+"""
+Build a YOLO detection dataset from TrackMate spots and the source movie.
+
+Each spot becomes a box centred on its position, with half-size equal to its
+radius (times `radius_scale`). Frames are read once, in order, and converted
+to uint8 exactly as in `tiff_tracker` (16-bit divided by 256, other dtypes
+rescaled by the global range). Tiles are cut and written by a pool of worker
+processes. Frames are split into train/val by frame range: the last
+`val_fraction` of the labeled frames is held out, optionally after a gap, so
+near-identical neighbouring frames don't leak between the splits.
+
+Output follows the Ultralytics layout:
+    <output>/images/{train,val}/f00012_y0000_x0640.png
+    <output>/labels/{train,val}/f00012_y0000_x0640.txt   (class cx cy w h, normalized)
+    <output>/data.yaml
+
+Fine-tune with:
+    yolo detect train data=<output>/data.yaml model=yolo26n.pt imgsz=640
+
+Usage:
+    python ultralytics-trackers/models/yolo_dataset.py --trial results/trial_3 --output data/yolo/trial_3
+    python ultralytics-trackers/models/yolo_dataset.py --input movie.tif --spots spots.csv --output data/yolo/movie
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "analysis"))
+
+from preprocessor import profiling  # noqa: E402
+from preprocessor.frames import global_range, iter_frames, open_stack, to_uint8  # noqa: E402
+from trackmate import read_trackmate_csv  # noqa: E402
+
+CLASS_NAMES = ("cell",)
+
+
+def tile_origins(size: int, tile: int, overlap: int) -> list:
+    """Start offsets of tiles covering [0, size); the last tile is aligned to the far edge."""
+    if size <= tile:
+        return [0]
+    stride = tile - overlap
+    if stride <= 0:
+        raise ValueError(f"overlap must be smaller than tile, got tile={tile}, overlap={overlap}")
+    starts = list(range(0, size - tile, stride))
+    return starts + [size - tile]
+
+
+def spot_boxes(
+    spots: pd.DataFrame,
+    *,
+    pixel_size: float = 1.0,
+    offset_x: float = 0.0,
+    offset_y: float = 0.0,
+    frame_offset: int = 0,
+    radius_scale: float = 1.0,
+    default_radius: float = 5.0,
+) -> pd.DataFrame:
+    """
+    Movie-pixel boxes for every spot.
+
+    Returns:
+        DataFrame with MOVIE_FRAME, X0, Y0, X1, Y1 (pixels), sorted by frame
+    """
+    radius = spots["RADIUS"].to_numpy(np.float64) if "RADIUS" in spots.columns else np.full(len(spots), default_radius)
+    r = radius / pixel_size * radius_scale
+    x = spots["POSITION_X"].to_numpy(np.float64) / pixel_size + offset_x
+    y = spots["POSITION_Y"].to_numpy(np.float64) / pixel_size + offset_y
+    boxes = pd.DataFrame({
+        "MOVIE_FRAME": spots["FRAME"].to_numpy(np.int64) + frame_offset,
+        "X0": x - r, "Y0": y - r, "X1": x + r, "Y1": y + r,
+    })
+    return boxes.dropna().sort_values("MOVIE_FRAME", kind="stable").reset_index(drop=True)
+
+
+def split_frames(frames: np.ndarray, *, val_fraction: float = 0.2, gap: int = 0) -> dict:
+    """
+    Assign frames to train/val by range: the last `val_fraction` of the frame
+    span is val, and `gap` frames before it are dropped.
+
+    Returns:
+        Dict frame -> 'train' or 'val' (dropped frames are absent)
+    """
+    frames = np.unique(frames)
+    if len(frames) == 0:
+        return {}
+    first, last = int(frames[0]), int(frames[-1])
+    val_start = last + 1 - int(round((last - first + 1) * val_fraction))
+    split = {}
+    for f in frames.tolist():
+        if f >= val_start:
+            split[f] = "val"
+        elif f < val_start - gap:
+            split[f] = "train"
+    return split
+
+
+def _write_tiles(
+    frame_idx: int,
+    image: np.ndarray,
+    boxes: np.ndarray,
+    split: str,
+    output_dir: str,
+    *,
+    tile: int,
+    overlap: int,
+    roi: tuple,
+    min_visible: float,
+    empty_fraction: float,
+    image_format: str,
+) -> tuple:
+    """Worker: cut one frame into tiles and write images and YOLO labels."""
+    x0, y0, x1, y1 = roi
+    rng = np.random.default_rng(frame_idx)
+    images, labels = Path(output_dir) / "images" / split, Path(output_dir) / "labels" / split
+    area = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1) if len(boxes) else np.empty(0)
+
+    n_tiles = n_labels = 0
+    for ty in tile_origins(y1 - y0, tile, overlap):
+        for tx in tile_origins(x1 - x0, tile, overlap):
+            left, top = x0 + tx, y0 + ty
+            right, bottom = min(left + tile, x1), min(top + tile, y1)
+            clipped = np.column_stack([
+                np.clip(boxes[:, 0], left, right), np.clip(boxes[:, 1], top, bottom),
+                np.clip(boxes[:, 2], left, right), np.clip(boxes[:, 3], top, bottom),
+            ]) if len(boxes) else np.empty((0, 4))
+            visible = np.prod(clipped[:, 2:] - clipped[:, :2], axis=1)
+            keep = visible >= min_visible * np.maximum(area, 1e-9)
+            if not keep.any() and rng.random() >= empty_fraction:
+                continue
+
+            w, h = right - left, bottom - top
+            c = clipped[keep]
+            rows = np.column_stack([
+                np.zeros(len(c)),
+                ((c[:, 0] + c[:, 2]) / 2 - left) / w, ((c[:, 1] + c[:, 3]) / 2 - top) / h,
+                (c[:, 2] - c[:, 0]) / w, (c[:, 3] - c[:, 1]) / h,
+            ])
+            stem = f"f{frame_idx:05d}_y{top:04d}_x{left:04d}"
+            cv2.imwrite(str(images / f"{stem}.{image_format}"), image[top:bottom, left:right])
+            with open(labels / f"{stem}.txt", "w") as f:
+                for r in rows:
+                    f.write(f"{int(r[0])} {r[1]:.6f} {r[2]:.6f} {r[3]:.6f} {r[4]:.6f}\n")
+            n_tiles += 1
+            n_labels += len(rows)
+    return n_tiles, n_labels
+
+
+def write_data_yaml(output_dir: str | Path, names: tuple = CLASS_NAMES) -> Path:
+    """Write the Ultralytics dataset config for `output_dir`."""
+    output_dir = Path(output_dir)
+    lines = [f"path: {output_dir.resolve()}", "train: images/train", "val: images/val", "names:"]
+    lines += [f"  {i}: {n}" for i, n in enumerate(names)]
+    path = output_dir / "data.yaml"
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def build_dataset(
+    movie: str | Path,
+    spots: pd.DataFrame,
+    output_dir: str | Path,
+    *,
+    tile: int = 640,
+    overlap: int = 64,
+    val_fraction: float = 0.2,
+    gap: int = 0,
+    frame_step: int = 1,
+    roi: tuple | None = None,
+    pixel_size: float = 1.0,
+    offset_x: float = 0.0,
+    offset_y: float = 0.0,
+    frame_offset: int = 0,
+    radius_scale: float = 1.0,
+    min_visible: float = 0.5,
+    empty_fraction: float = 0.1,
+    image_format: str = "png",
+    workers: int | None = None,
+) -> dict:
+    """
+    Write YOLO tiles and labels for every labeled frame of a movie.
+
+    Args:
+        movie: Source TIFF stack or Zarr store
+        spots: TrackMate spots table (POSITION_X/Y, FRAME, RADIUS)
+        output_dir: Dataset folder (images/, labels/, data.yaml)
+        tile: Tile size in pixels (the YOLO imgsz)
+        overlap: Overlap between neighbouring tiles
+        val_fraction: Fraction of the labeled frame range held out (at the end) for val
+        gap: Frames dropped between train and val
+        frame_step: Use every n-th labeled frame (neighbouring frames are near duplicates)
+        roi: (x0, y0, x1, y1) region that was tracked (default: whole frame).
+            Tiles outside it would contain unlabeled cells.
+        pixel_size, offset_x, offset_y, frame_offset: Map table coordinates to movie pixels/frames
+        radius_scale: Box half-size as a multiple of the spot radius
+        min_visible: Keep a box in a tile when at least this fraction of it is inside
+        empty_fraction: Fraction of tiles without boxes to keep as background
+        image_format: 'png' (lossless) or 'jpg'
+        workers: Tile-writing processes (default: one per CPU)
+
+    Returns:
+        Summary dict with frames/tiles/labels per split
+    """
+    stack = open_stack(movie)
+    n_frames, height, width = stack.shape[0], stack.shape[-2], stack.shape[-1]
+    if roi is None:
+        roi = (0, 0, width, height)
+    roi = tuple(int(v) for v in roi)
+
+    boxes = spot_boxes(
+        spots, pixel_size=pixel_size, offset_x=offset_x, offset_y=offset_y,
+        frame_offset=frame_offset, radius_scale=radius_scale,
+    )
+    boxes = boxes[(boxes["MOVIE_FRAME"] >= 0) & (boxes["MOVIE_FRAME"] < n_frames)]
+    labeled = np.unique(boxes["MOVIE_FRAME"].to_numpy())[::frame_step]
+    split = split_frames(labeled, val_fraction=val_fraction, gap=gap)
+    if not split:
+        raise ValueError(f"No spots fall inside the movie's {n_frames} frames; check frame_offset")
+    frame_col = boxes["MOVIE_FRAME"].to_numpy()
+    coords = boxes[["X0", "Y0", "X1", "Y1"]].to_numpy()
+
+    output_dir = Path(output_dir)
+    for kind in ("images", "labels"):
+        for s in ("train", "val"):
+            (output_dir / kind / s).mkdir(parents=True, exist_ok=True)
+
+    # Same normalization as tiff_tracker
+    value_range = None if stack.dtype in (np.uint8, np.uint16) else global_range(stack)
+    summary = {s: {"frames": 0, "tiles": 0, "labels": 0} for s in ("train", "val")}
+    wanted = sorted(split)
+    options = dict(
+        tile=tile, overlap=overlap, roi=roi, min_visible=min_visible,
+        empty_fraction=empty_fraction, image_format=image_format,
+    )
+    print(f"Writing {len(wanted)} frames ({sum(v == 'val' for v in split.values())} val) to {output_dir}...")
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        done = 0
+
+        def collect(futures):
+            nonlocal done
+            for future in futures:
+                s = pending.pop(future)
+                n_tiles, n_labels = future.result()
+                summary[s]["frames"] += 1
+                summary[s]["tiles"] += n_tiles
+                summary[s]["labels"] += n_labels
+                done += 1
+                if done % 50 == 0 or done == len(wanted):
+                    print(f"  Progress: {done}/{len(wanted)} frames")
+
+        for frame_idx, frame in iter_frames(movie, start_frame=wanted[0], end_frame=wanted[-1] + 1):
+            if frame_idx not in split:
+                continue
+            with profiling.span("convert"):
+                image = to_uint8(np.asarray(frame), value_range)
+            lo, hi = np.searchsorted(frame_col, [frame_idx, frame_idx + 1])
+            future = pool.submit(
+                _write_tiles, frame_idx, image, coords[lo:hi], split[frame_idx], str(output_dir), **options
+            )
+            pending[future] = split[frame_idx]
+            if len(pending) >= 2 * workers:  # bound frames held in memory
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(list(pending))
+
+    data_yaml = write_data_yaml(output_dir)
+    print(f"Saved dataset config: {data_yaml}")
+    return summary
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Build a YOLO training set from TrackMate spots and the source movie.")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--trial", help="Trial folder (spots export, movie and offsets from analysis/catalog.py)")
+    src.add_argument("--input", "-i", help="Path to input TIFF movie or Zarr store (requires --spots)")
+    p.add_argument("--spots", "-s", help="Path to TrackMate spots CSV")
+    p.add_argument("--output", "-o", required=True, help="Dataset folder")
+    p.add_argument("--tile", type=int, default=640, help="Tile size in pixels (default: 640)")
+    p.add_argument("--overlap", type=int, default=64, help="Tile overlap in pixels (default: 64)")
+    p.add_argument("--val-fraction", type=float, default=0.2, help="Fraction of frames for val (default: 0.2)")
+    p.add_argument("--gap", type=int, default=0, help="Frames dropped between train and val (default: 0)")
+    p.add_argument("--frame-step", type=int, default=1, help="Use every n-th labeled frame (default: 1)")
+    p.add_argument("--roi", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), default=None,
+                   help="Tracked region in movie pixels (default: whole frame)")
+    p.add_argument("--pixel-size", type=float, default=None, help="Table units per pixel (default: 1)")
+    p.add_argument("--offset-x", type=float, default=None, help="Window x offset in the movie (pixels)")
+    p.add_argument("--offset-y", type=float, default=None, help="Window y offset in the movie (pixels)")
+    p.add_argument("--frame-offset", type=int, default=None, help="Movie frame of spot FRAME 0")
+    p.add_argument("--radius-scale", type=float, default=1.0, help="Box half-size / spot radius (default: 1)")
+    p.add_argument("--empty-fraction", type=float, default=0.1, help="Fraction of empty tiles kept (default: 0.1)")
+    p.add_argument("--format", choices=("png", "jpg"), default="png", help="Tile image format (default: png)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    p.add_argument(
+        "--profile", default=None, metavar="TRACE_JSON",
+        help="Write a per-stage timing/memory trace (Chrome trace JSON) to this path",
+    )
+    return p
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    mapping = {"pixel_size": 1.0, "offset_x": 0.0, "offset_y": 0.0, "frame_offset": 0}
+    if args.trial:
+        from catalog import load_trial
+
+        trial = load_trial(args.trial)
+        if "spots" not in trial.exports or trial.movie is None:
+            raise ValueError(f"Trial {trial.name} needs a spots export and a source movie")
+        # The cataloged movie is the one TrackMate ran on, so only the calibration applies
+        movie, spots_file = trial.movie, trial.exports["spots"]
+        mapping["pixel_size"] = trial.pixel_size or 1.0
+    else:
+        if not args.spots:
+            raise ValueError("--input requires --spots")
+        movie, spots_file = args.input, args.spots
+    for key in mapping:
+        if getattr(args, key) is not None:
+            mapping[key] = getattr(args, key)
+
+    summary = build_dataset(
+        movie,
+        read_trackmate_csv(spots_file),
+        args.output,
+        tile=args.tile,
+        overlap=args.overlap,
+        val_fraction=args.val_fraction,
+        gap=args.gap,
+        frame_step=args.frame_step,
+        roi=args.roi,
+        radius_scale=args.radius_scale,
+        empty_fraction=args.empty_fraction,
+        image_format=args.format,
+        workers=args.workers,
+        **mapping,
+    )
+    for s, counts in summary.items():
+        print(f"  {s}: {counts['frames']} frames, {counts['tiles']} tiles, {counts['labels']} boxes")
+    if args.profile:
+        profiling.write_trace(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())